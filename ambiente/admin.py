@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Ambiente, AmbienteInvitations, Role, Participante, Notificacao
+from .models import Ambiente, AmbienteInvitations, Role, Participante, Notificacao, EventoNotificacao
 
 # Register your models here.
 
@@ -35,3 +35,9 @@ class NotificacaoAdmin(admin.ModelAdmin):
     list_filter = ['tipo', 'lida', 'criada_em']
     search_fields = ['usuario__username', 'titulo', 'mensagem']
     raw_id_fields = ['usuario', 'atividade', 'ambiente']
+
+@admin.register(EventoNotificacao)
+class EventoNotificacaoAdmin(admin.ModelAdmin):
+    list_display = ['id', 'tipo', 'status', 'tentativas', 'criado_em', 'disponivel_em', 'processado_em']
+    list_filter = ['tipo', 'status']
+    readonly_fields = ['criado_em', 'processado_em']
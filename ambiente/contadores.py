@@ -0,0 +1,87 @@
+from collections import defaultdict
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .eventos import publicar
+from .models import ContadorNotificacoes, Notificacao
+from .pendencias import invalidar_pendencias, ler_nao_lidas  # noqa: F401
+
+
+def ajustar_nao_lidas(deltas):
+    """
+    Soma a cada contador o delta de {usuario_id: delta} com UPDATE ... SET
+    nao_lidas = nao_lidas + delta, agrupando usuários com o mesmo delta.
+    Contadores que ainda não existem são criados.
+    """
+    por_delta = defaultdict(list)
+    for usuario_id, delta in deltas.items():
+        if delta:
+            por_delta[delta].append(usuario_id)
+    if not por_delta:
+        return
+
+    agora = timezone.now()
+    for delta, usuario_ids in por_delta.items():
+        contadores = ContadorNotificacoes.objects.filter(usuario_id__in=usuario_ids)
+        alterar = {'nao_lidas': Greatest(F('nao_lidas') + delta, 0), 'atualizado_em': agora}
+        if contadores.update(**alterar) < len(usuario_ids):
+            existentes = set(contadores.values_list('usuario_id', flat=True))
+            faltando = [usuario_id for usuario_id in usuario_ids if usuario_id not in existentes]
+            # ignore_conflicts cobre a criação concorrente; o UPDATE seguinte aplica o delta
+            ContadorNotificacoes.objects.bulk_create(
+                [ContadorNotificacoes(usuario_id=usuario_id) for usuario_id in faltando],
+                ignore_conflicts=True,
+            )
+            ContadorNotificacoes.objects.filter(usuario_id__in=faltando).update(**alterar)
+    invalidar_pendencias(*deltas)
+    publicar(deltas, 'notificacao')
+
+
+def reconciliar_contadores(batch_size=1000):
+    """
+    Recalcula os contadores a partir das notificações, percorrendo os
+    usuários em lotes. Retorna a quantidade de contadores corrigidos.
+    """
+    corrigidos = 0
+    ultimo_id = 0
+    while True:
+        usuario_ids = list(
+            User.objects.filter(id__gt=ultimo_id).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not usuario_ids:
+            return corrigidos
+        ultimo_id = usuario_ids[-1]
+
+        with transaction.atomic():
+            reais = dict(
+                Notificacao.objects.filter(usuario_id__in=usuario_ids, lida=False)
+                .order_by().values('usuario_id').annotate(total=Count('id'))
+                .values_list('usuario_id', 'total')
+            )
+            atuais = {
+                contador.usuario_id: contador
+                for contador in ContadorNotificacoes.objects.select_for_update().filter(usuario_id__in=usuario_ids)
+            }
+            novos, alterados = [], []
+            for usuario_id in usuario_ids:
+                real = reais.get(usuario_id, 0)
+                contador = atuais.get(usuario_id)
+                if contador is None:
+                    if real:
+                        novos.append(ContadorNotificacoes(usuario_id=usuario_id, nao_lidas=real))
+                elif contador.nao_lidas != real:
+                    contador.nao_lidas = real
+                    contador.atualizado_em = timezone.now()
+                    alterados.append(contador)
+            ContadorNotificacoes.objects.bulk_create(novos, ignore_conflicts=True)
+            ContadorNotificacoes.objects.bulk_update(alterados, ['nao_lidas', 'atualizado_em'])
+
+        if novos or alterados:
+            corrigidos_ids = [contador.usuario_id for contador in novos + alterados]
+            invalidar_pendencias(*corrigidos_ids)
+            publicar(corrigidos_ids, 'contagem')
+        corrigidos += len(novos) + len(alterados)
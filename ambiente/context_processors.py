@@ -1,27 +1,60 @@
+from django.utils.functional import SimpleLazyObject
+
+from .eventos import sse_disponivel
 from .models import AmbienteInvitations, Notificacao
+from .pendencias import contar_pendencias
 
-def invitations_processor(request):
-    if request.user.is_authenticated:
-        invitations = AmbienteInvitations.objects.filter(guest=request.user, accepted=False).select_related('inviter', 'ambiente')
-        return {
-            'pending_invitations': invitations,
-            'invitations_count': invitations.count()
-        }
-    return {
-        'pending_invitations': [],
-        'invitations_count': 0
-    }
 
+class _Pendencias:
+    """Contagens do usuário, consultadas (ou lidas do cache) no primeiro acesso"""
+
+    def __init__(self, user):
+        self.user = user
+        self._contagens = None
 
-def notificacoes_processor(request):
-    """Context processor para adicionar notificações não lidas ao contexto"""
-    if request.user.is_authenticated:
-        notificacoes = Notificacao.objects.filter(usuario=request.user, lida=False).select_related('atividade', 'ambiente')[:10]
+    def contagem(self, nome):
+        if self._contagens is None:
+            self._contagens = contar_pendencias(self.user.pk)
+        return self._contagens[nome]
+
+    def convites(self):
+        if not self.contagem('convites'):
+            return []
+        return list(
+            AmbienteInvitations.objects.filter(guest=self.user, accepted=False).select_related('inviter', 'ambiente')
+        )
+
+    def notificacoes(self):
+        if not self.contagem('notificacoes'):
+            return []
+        return list(
+            Notificacao.objects.filter(usuario=self.user, lida=False)
+            .select_related('atividade', 'ambiente').order_by('-criada_em', '-id')[:10]
+        )
+
+
+def pendencias_processor(request):
+    """
+    Convites pendentes e notificações não lidas do usuário. Os valores são
+    preguiçosos: páginas que não os exibem não consultam o banco, e as duas
+    contagens vêm de uma única consulta; depois, os convites saem do cache e
+    as notificações do contador. `notificacoes_sse` diz se
+    a página deve abrir o stream de notificações.
+    """
+    if not request.user.is_authenticated:
         return {
-            'notificacoes_nao_lidas': notificacoes,
-            'notificacoes_nao_lidas_count': notificacoes.count()
+            'pending_invitations': [],
+            'invitations_count': 0,
+            'notificacoes_nao_lidas': [],
+            'notificacoes_nao_lidas_count': 0,
+            'notificacoes_sse': False,
         }
+
+    pendencias = _Pendencias(request.user)
     return {
-        'notificacoes_nao_lidas': [],
-        'notificacoes_nao_lidas_count': 0
+        'pending_invitations': SimpleLazyObject(pendencias.convites),
+        'invitations_count': SimpleLazyObject(lambda: pendencias.contagem('convites')),
+        'notificacoes_nao_lidas': SimpleLazyObject(pendencias.notificacoes),
+        'notificacoes_nao_lidas_count': SimpleLazyObject(lambda: pendencias.contagem('notificacoes')),
+        'notificacoes_sse': sse_disponivel(request),
     }
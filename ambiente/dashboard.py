@@ -0,0 +1,77 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .permissoes import ambientes_acessiveis
+
+
+# Tempo, em segundos, que a lista de ambientes de cada usuário fica no cache
+TEMPO_CACHE_DASHBOARD = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300)
+
+
+def _chave_ambiente(ambiente_id):
+    return f'dashboard:versao:ambiente:{ambiente_id}'
+
+
+def _chave_usuario(usuario_id):
+    return f'dashboard:versao:usuario:{usuario_id}'
+
+
+def _versoes(chaves):
+    """Versões atuais das chaves, criando as que ainda não existem."""
+    versoes = cache.get_many(chaves)
+    faltando = {chave: uuid.uuid4().hex for chave in chaves if chave not in versoes}
+    if faltando:
+        for chave, versao in faltando.items():
+            cache.add(chave, versao, None)
+        versoes.update(cache.get_many(list(faltando)))
+    return versoes
+
+
+def _trocar_versoes(chaves):
+    def trocar():
+        cache.set_many({chave: uuid.uuid4().hex for chave in chaves}, None)
+
+    if chaves:
+        trocar()
+        transaction.on_commit(trocar)
+
+
+def invalidar_dashboard_ambiente(*ambiente_ids):
+    """Descarta, para todos os usuários, as listas que incluem estes ambientes."""
+    _trocar_versoes([_chave_ambiente(ambiente_id) for ambiente_id in ambiente_ids])
+
+
+def invalidar_dashboard_usuarios(*usuario_ids):
+    """Descarta a lista destes usuários (passaram a ver ou deixaram de ver um ambiente)."""
+    _trocar_versoes([_chave_usuario(usuario_id) for usuario_id in usuario_ids])
+
+
+def ambientes_do_dashboard(user):
+    """
+    Ambientes que `user` administra ou dos quais participa, com as
+    contagens por status, como usados em ambiente/home.html.
+
+    A lista fica no cache por usuário junto com a versão de cada ambiente;
+    ela é descartada quando um desses ambientes ou suas atividades mudam
+    (versão do ambiente) ou quando o usuário entra ou sai de um ambiente
+    (versão do usuário).
+    """
+    from atividade.resumo import anotar_contagens_status
+
+    versao_usuario = _versoes([_chave_usuario(user.pk)])[_chave_usuario(user.pk)]
+    chave = f'dashboard:{user.pk}:{versao_usuario}'
+    entrada = cache.get(chave)
+    if entrada is not None:
+        ambientes, versoes = entrada
+        if not versoes or cache.get_many(list(versoes)) == versoes:
+            return ambientes
+
+    ambientes = list(anotar_contagens_status(ambientes_acessiveis(user).order_by('id')))
+    # Lidas depois da consulta: uma mudança ainda não commitada durante ela
+    # troca a versão de novo no commit, descartando o que for guardado agora
+    versoes = _versoes([_chave_ambiente(ambiente.id) for ambiente in ambientes])
+    cache.set(chave, (ambientes, versoes), TEMPO_CACHE_DASHBOARD)
+    return ambientes
@@ -0,0 +1,297 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Max
+from django.utils.module_loading import import_string
+
+from .models import AmbienteInvitations, Notificacao
+from .pendencias import consultar_pendencias
+
+
+logger = logging.getLogger(__name__)
+
+# Canal do LISTEN/NOTIFY usado por BarramentoPostgres
+CANAL = 'planit_eventos'
+
+# Avisos pendentes por conexão; avisos além disso são descartados porque o
+# fluxo sempre relê do banco tudo o que veio depois do seu cursor
+TAMANHO_FILA = 32
+
+# Quantidade máxima de linhas lidas por consulta ao reenviar eventos
+LIMITE_EVENTOS = 50
+
+# Intervalo, em segundos, entre comentários de heartbeat numa conexão ociosa
+TEMPO_HEARTBEAT = getattr(settings, 'EVENTOS_HEARTBEAT', 15)
+
+# Espera sugerida ao navegador antes de reconectar, em milissegundos
+TEMPO_RECONEXAO = 5000
+
+
+def sse_disponivel(request):
+    """
+    Stream ativo (NOTIFICACOES_SSE) e requisição servida por ASGI. Sob WSGI
+    o Django consumiria o fluxo infinito de forma síncrona, prendendo uma
+    thread por aba aberta sem nunca enviar nada.
+    """
+    return getattr(settings, 'NOTIFICACOES_SSE', True) and isinstance(request, ASGIRequest)
+
+
+def _avisar(fila, tipo):
+    try:
+        fila.put_nowait(tipo)
+    except asyncio.QueueFull:
+        pass
+
+
+class BarramentoLocal:
+    """
+    Pub/sub em memória do processo. `publicar` pode ser chamado de qualquer
+    thread; os avisos chegam às filas asyncio das conexões do usuário no
+    event loop de cada uma. Só alcança conexões do mesmo processo.
+    """
+
+    def __init__(self):
+        self._assinantes = {}
+        self._lock = threading.Lock()
+
+    def assinar(self, usuario_id):
+        fila = asyncio.Queue(maxsize=TAMANHO_FILA)
+        with self._lock:
+            self._assinantes.setdefault(usuario_id, {})[fila] = asyncio.get_running_loop()
+        return fila
+
+    def cancelar(self, usuario_id, fila):
+        with self._lock:
+            filas = self._assinantes.get(usuario_id, {})
+            filas.pop(fila, None)
+            if not filas:
+                self._assinantes.pop(usuario_id, None)
+
+    def assinantes(self):
+        with self._lock:
+            return sum(len(filas) for filas in self._assinantes.values())
+
+    def publicar(self, usuario_id, tipo):
+        self.entregar(usuario_id, tipo)
+
+    def entregar(self, usuario_id, tipo):
+        with self._lock:
+            destinos = list(self._assinantes.get(usuario_id, {}).items())
+        for fila, loop in destinos:
+            try:
+                loop.call_soon_threadsafe(_avisar, fila, tipo)
+            except RuntimeError:
+                # Event loop já encerrado; a conexão será cancelada
+                pass
+
+
+class BarramentoPostgres(BarramentoLocal):
+    """
+    Distribui os avisos entre processos com LISTEN/NOTIFY do PostgreSQL
+    (por exemplo, do worker de notificações para os processos web). Uma
+    thread por processo escuta o canal e entrega aos assinantes locais.
+    """
+
+    def __init__(self, alias='default'):
+        super().__init__()
+        self.alias = alias
+        self._escuta = None
+
+    def publicar(self, usuario_id, tipo):
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [CANAL, json.dumps([usuario_id, tipo])])
+
+    def assinar(self, usuario_id):
+        with self._lock:
+            if self._escuta is None or not self._escuta.is_alive():
+                self._escuta = threading.Thread(target=self._escutar, name='planit-eventos', daemon=True)
+                self._escuta.start()
+        return super().assinar(usuario_id)
+
+    def _escutar(self):
+        wrapper = connections[self.alias]
+        while True:
+            conexao = None
+            try:
+                conexao = wrapper.get_new_connection(wrapper.get_connection_params())
+                conexao.autocommit = True
+                with conexao.cursor() as cursor:
+                    cursor.execute(f'LISTEN {CANAL}')
+                while True:
+                    if select.select([conexao], [], [], 30) == ([], [], []):
+                        continue
+                    conexao.poll()
+                    while conexao.notifies:
+                        usuario_id, tipo = json.loads(conexao.notifies.pop(0).payload)
+                        self.entregar(usuario_id, tipo)
+            except Exception:
+                logger.exception('Escuta do canal %s interrompida; reconectando', CANAL)
+                time.sleep(5)
+            finally:
+                if conexao is not None:
+                    conexao.close()
+
+
+_barramento = None
+_barramento_lock = threading.Lock()
+
+
+def barramento():
+    """Instância do barramento configurado em settings.EVENTOS_BARRAMENTO."""
+    global _barramento
+    if _barramento is None:
+        with _barramento_lock:
+            if _barramento is None:
+                caminho = getattr(settings, 'EVENTOS_BARRAMENTO', 'ambiente.eventos.BarramentoLocal')
+                _barramento = import_string(caminho)()
+    return _barramento
+
+
+def publicar(usuario_ids, tipo):
+    """Avisa as conexões dos usuários depois do commit da transação atual."""
+    usuario_ids = list(dict.fromkeys(usuario_ids))
+
+    def enviar():
+        for usuario_id in usuario_ids:
+            try:
+                barramento().publicar(usuario_id, tipo)
+            except Exception:
+                logger.exception('Falha ao publicar evento %s para o usuário %s', tipo, usuario_id)
+
+    if usuario_ids:
+        transaction.on_commit(enviar)
+
+
+def codificar_cursor(cursor):
+    return f'{cursor[0]}-{cursor[1]}'
+
+
+def decodificar_cursor(valor):
+    """Converte o Last-Event-ID "<notificacao_id>-<convite_id>" ou levanta ValueError."""
+    notificacao_id, convite_id = (int(parte) for parte in valor.split('-'))
+    if notificacao_id < 0 or convite_id < 0:
+        raise ValueError(valor)
+    return notificacao_id, convite_id
+
+
+def cursor_atual(usuario_id):
+    """Cursor posicionado depois da última notificação e do último convite do usuário."""
+    notificacao_id = Notificacao.objects.filter(usuario_id=usuario_id).aggregate(ultimo=Max('id'))['ultimo']
+    convite_id = AmbienteInvitations.objects.filter(guest_id=usuario_id).aggregate(ultimo=Max('id'))['ultimo']
+    return notificacao_id or 0, convite_id or 0
+
+
+def buscar_eventos(usuario_id, cursor, limite=LIMITE_EVENTOS):
+    """
+    Notificações e convites pendentes do usuário criados depois de `cursor`.
+    Retorna (eventos, cursor, tem_mais), com eventos no formato
+    (id, nome, dados) e o id de cada um sendo o cursor logo depois dele.
+    """
+    notificacao_id, convite_id = cursor
+    notificacoes = list(
+        Notificacao.objects.filter(usuario_id=usuario_id, id__gt=notificacao_id)
+        .order_by('id').values('id', 'titulo', 'mensagem', 'link', 'lida', 'criada_em')[:limite]
+    )
+    convites = list(
+        AmbienteInvitations.objects.filter(guest_id=usuario_id, id__gt=convite_id, accepted=False)
+        .order_by('id').values('id', 'ambiente__nome', 'inviter__username')[:limite]
+    )
+
+    eventos = []
+    for notificacao in notificacoes:
+        notificacao_id = notificacao['id']
+        notificacao['criada_em'] = notificacao['criada_em'].isoformat()
+        eventos.append((codificar_cursor((notificacao_id, convite_id)), 'notificacao', notificacao))
+    for convite in convites:
+        convite_id = convite['id']
+        dados = {'id': convite_id, 'ambiente': convite['ambiente__nome'], 'convidado_por': convite['inviter__username']}
+        eventos.append((codificar_cursor((notificacao_id, convite_id)), 'convite', dados))
+
+    tem_mais = len(notificacoes) == limite or len(convites) == limite
+    return eventos, (notificacao_id, convite_id), tem_mais
+
+
+def formatar_evento(nome, dados, id=None):
+    linhas = []
+    if id is not None:
+        linhas.append(f'id: {id}')
+    linhas.append(f'event: {nome}')
+    linhas.append(f'data: {json.dumps(dados, ensure_ascii=False)}')
+    return '\n'.join(linhas) + '\n\n'
+
+
+def novidades(usuario_id, cursor, contagens=None, buscar=True):
+    """
+    Eventos posteriores a `cursor` (se `buscar`) seguidos de um evento
+    'contagem' quando as contagens de pendências mudaram.
+    Retorna (eventos, cursor, contagens).
+    """
+    eventos = []
+    tem_mais = buscar
+    while tem_mais:
+        lote, cursor, tem_mais = buscar_eventos(usuario_id, cursor)
+        eventos.extend(lote)
+    atuais = consultar_pendencias(usuario_id)
+    if atuais != contagens:
+        eventos.append((codificar_cursor(cursor), 'contagem', atuais))
+    return eventos, cursor, atuais
+
+
+def _sem_contexto(funcao):
+    """
+    Executa `funcao` no pool de threads compartilhado, e não numa thread
+    dedicada à requisição, para que conexões ociosas não prendam threads.
+    """
+    def executar(*args):
+        try:
+            return funcao(*args)
+        finally:
+            close_old_connections()
+    return sync_to_async(executar, thread_sensitive=False)
+
+
+async def fluxo_eventos(usuario_id, ultimo_id=None):
+    """
+    Gera o corpo text/event-stream de um usuário: reenvia o que aconteceu
+    depois de `ultimo_id` (o Last-Event-ID da reconexão), envia as contagens
+    e, a cada aviso do barramento, relê as novidades do banco. Sem avisos,
+    envia um heartbeat a cada TEMPO_HEARTBEAT segundos.
+    """
+    fila = barramento().assinar(usuario_id)
+    try:
+        yield f'retry: {TEMPO_RECONEXAO}\n\n'
+
+        cursor = None
+        if ultimo_id:
+            try:
+                cursor = decodificar_cursor(ultimo_id)
+            except ValueError:
+                cursor = None
+        reenviar = cursor is not None
+        if cursor is None:
+            cursor = await _sem_contexto(cursor_atual)(usuario_id)
+
+        eventos, cursor, contagens = await _sem_contexto(novidades)(usuario_id, cursor, None, reenviar)
+        while True:
+            for id, nome, dados in eventos:
+                yield formatar_evento(nome, dados, id)
+            try:
+                await asyncio.wait_for(fila.get(), TEMPO_HEARTBEAT)
+            except asyncio.TimeoutError:
+                eventos = []
+                yield ': heartbeat\n\n'
+                continue
+            # Vários avisos acumulados viram uma única leitura
+            while not fila.empty():
+                fila.get_nowait()
+            eventos, cursor, contagens = await _sem_contexto(novidades)(usuario_id, cursor, contagens)
+    finally:
+        barramento().cancelar(usuario_id, fila)
@@ -0,0 +1,155 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from .models import EventoNotificacao, Participante
+from .notificacoes import notificar_alocacao_atividade
+
+
+logger = logging.getLogger(__name__)
+
+MAXIMO_TENTATIVAS = getattr(settings, 'NOTIFICACOES_MAXIMO_TENTATIVAS', 5)
+
+# Tempo que um worker tem para concluir os eventos reservados antes que
+# outro worker possa pegá-los de novo (caso o primeiro tenha morrido)
+TEMPO_RESERVA = timedelta(minutes=5)
+
+ABERTOS = (EventoNotificacao.STATUS_PENDENTE, EventoNotificacao.STATUS_PROCESSANDO)
+
+
+class ReservaPerdida(Exception):
+    """A reserva do evento expirou e outro worker o pegou."""
+
+
+def enfileirar_alocacao_atividade(atividade, participantes):
+    """Registra no outbox que `participantes` foram alocados em `atividade`"""
+    return EventoNotificacao.objects.create(
+        tipo=EventoNotificacao.TIPO_ALOCACAO_ATIVIDADE,
+        dados={
+            'atividade_id': atividade.pk,
+            'participante_ids': [participante.pk for participante in participantes],
+        },
+    )
+
+
+def _processar_alocacao(dados):
+    from atividade.models import Atividade
+
+    atividade = Atividade.objects.select_related('ambiente').filter(pk=dados['atividade_id']).first()
+    if atividade is None:
+        return
+    # Quem saiu do ambiente depois da alocação não é notificado
+    participantes = Participante.objects.filter(
+        id__in=dados['participante_ids'], ambiente_id=atividade.ambiente_id,
+        usuario__ambientes_participantes=atividade.ambiente_id
+    ).only('id', 'usuario_id')
+    notificar_alocacao_atividade(atividade, participantes)
+
+
+PROCESSADORES = {
+    EventoNotificacao.TIPO_ALOCACAO_ATIVIDADE: _processar_alocacao,
+}
+
+
+def espera_nova_tentativa(tentativas):
+    """Backoff exponencial: 30s, 1min, 2min, ... até 1h"""
+    return timedelta(seconds=min(30 * 2 ** (tentativas - 1), 3600))
+
+
+def reservar_eventos(limite):
+    """
+    Marca até `limite` eventos disponíveis como em processamento e os retorna.
+    No PostgreSQL usa SELECT ... FOR UPDATE SKIP LOCKED, então vários
+    workers podem drenar a fila sem pegar o mesmo evento.
+    """
+    agora = timezone.now()
+    with transaction.atomic():
+        disponiveis = EventoNotificacao.objects.filter(
+            status__in=ABERTOS, disponivel_em__lte=agora
+        ).order_by('disponivel_em', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            disponiveis = disponiveis.select_for_update(skip_locked=True)
+        ids = list(disponiveis.values_list('id', flat=True)[:limite])
+        if not ids:
+            return []
+        EventoNotificacao.objects.filter(id__in=ids).update(
+            status=EventoNotificacao.STATUS_PROCESSANDO,
+            disponivel_em=agora + TEMPO_RESERVA,
+            tentativas=F('tentativas') + 1,
+        )
+    return list(EventoNotificacao.objects.filter(id__in=ids).order_by('id'))
+
+
+def processar_evento(evento):
+    """
+    Cria as notificações do evento e o marca como concluído na mesma
+    transação. Em caso de erro o evento volta para a fila com backoff, ou
+    fica como falhou depois de MAXIMO_TENTATIVAS. Retorna True se concluiu.
+
+    As atualizações só valem enquanto a reserva deste worker é a atual: se
+    ela expirou e outro worker pegou o evento, as notificações criadas
+    aqui são desfeitas e o evento fica com o outro worker.
+    """
+    eventos = EventoNotificacao.objects.filter(
+        pk=evento.pk, status=EventoNotificacao.STATUS_PROCESSANDO, disponivel_em=evento.disponivel_em
+    )
+    try:
+        with transaction.atomic():
+            PROCESSADORES[evento.tipo](evento.dados)
+            if not eventos.update(status=EventoNotificacao.STATUS_CONCLUIDO, processado_em=timezone.now(), erro=''):
+                raise ReservaPerdida(evento.pk)
+        return True
+    except ReservaPerdida:
+        logger.warning('Reserva do evento de notificação %s expirou antes da conclusão', evento.pk)
+        return False
+    except Exception as erro:
+        logger.exception('Falha ao processar o evento de notificação %s', evento.pk)
+        if evento.tentativas >= MAXIMO_TENTATIVAS:
+            eventos.update(status=EventoNotificacao.STATUS_FALHOU, erro=repr(erro))
+        else:
+            eventos.update(
+                status=EventoNotificacao.STATUS_PENDENTE,
+                disponivel_em=timezone.now() + espera_nova_tentativa(evento.tentativas),
+                erro=repr(erro),
+            )
+        return False
+
+
+def _processar_em_thread(evento):
+    try:
+        return processar_evento(evento)
+    finally:
+        # Cada thread abre a própria conexão; fecha ao terminar
+        connections.close_all()
+
+
+def processar_lote(limite=100, workers=1):
+    """
+    Reserva e processa um lote de eventos, em paralelo quando `workers` > 1.
+    Retorna (concluídos, falhas).
+    """
+    eventos = reservar_eventos(limite)
+    if workers > 1 and len(eventos) > 1:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='notificacoes') as executor:
+            resultados = list(executor.map(_processar_em_thread, eventos))
+    else:
+        resultados = [processar_evento(evento) for evento in eventos]
+    concluidos = sum(resultados)
+    return concluidos, len(resultados) - concluidos
+
+
+def estatisticas_fila():
+    """Tamanho da fila, falhas definitivas e atraso (segundos) do evento aberto mais antigo"""
+    dados = EventoNotificacao.objects.aggregate(
+        pendentes=Count('id', filter=Q(status__in=ABERTOS)),
+        falhas=Count('id', filter=Q(status=EventoNotificacao.STATUS_FALHOU)),
+        mais_antigo=Min('criado_em', filter=Q(status__in=ABERTOS)),
+    )
+    mais_antigo = dados.pop('mais_antigo')
+    dados['atraso'] = (timezone.now() - mais_antigo).total_seconds() if mais_antigo else 0.0
+    return dados
@@ -0,0 +1,123 @@
+import time as relogio
+from datetime import time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ambiente.models import Ambiente
+from ambiente.permissoes import ambientes_acessiveis
+from atividade.models import STATUS_CHOICES, Atividade
+from atividade.resumo import anotar_contagens_status, reconstruir_resumo
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _lista(valor):
+    try:
+        return [int(item) for item in valor.split(',') if item.strip()]
+    except ValueError:
+        raise CommandError(f'Lista de inteiros inválida: {valor!r}')
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara a consulta antiga da lista de ambientes (OR sobre o JOIN com os '
+        'participantes + DISTINCT + Count das atividades) com a atual (UNION dos '
+        'ids acessíveis + contagens do resumo diário), para cada combinação de '
+        'ambientes por usuário × atividades por ambiente. Os dados de teste são '
+        'criados dentro de uma transação desfeita no final: rode em um banco de '
+        'benchmark, nunca em produção.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ambientes', type=_lista, default=[1, 10, 50],
+                            help='Ambientes por usuário, separados por vírgula.')
+        parser.add_argument('--atividades', type=_lista, default=[10, 100, 1000],
+                            help='Atividades por ambiente, separadas por vírgula.')
+        parser.add_argument('--participantes', type=int, default=5,
+                            help='Outros participantes em cada ambiente (multiplicam as linhas do JOIN).')
+        parser.add_argument('--repeticoes', type=int, default=5, help='Execuções medidas de cada consulta.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'ambientes':>9} {'atividades':>10} {'antiga (ms)':>12} {'atual (ms)':>11} "
+            f"{'consultas':>9} {'contagens antigas':>18}"
+        )
+        for num_ambientes in options['ambientes']:
+            for num_atividades in options['atividades']:
+                linha = self.medir_cenario(num_ambientes, num_atividades, options['participantes'],
+                                           options['repeticoes'])
+                self.stdout.write(
+                    f"{num_ambientes:>9} {num_atividades:>10} {linha['antiga']:>12.2f} {linha['atual']:>11.2f} "
+                    f"{linha['consultas']:>9} {'corretas' if linha['corretas'] else 'multiplicadas':>18}"
+                )
+
+    def medir_cenario(self, num_ambientes, num_atividades, num_participantes, repeticoes):
+        resultado = {}
+        try:
+            with transaction.atomic():
+                usuario = self.popular(num_ambientes, num_atividades, num_participantes)
+                antiga = lambda: list(self.consulta_antiga(usuario))  # noqa: E731
+                atual = lambda: list(anotar_contagens_status(ambientes_acessiveis(usuario).order_by('id')))  # noqa: E731
+
+                resultado['antiga'] = self.cronometrar(antiga, repeticoes)
+                resultado['atual'] = self.cronometrar(atual, repeticoes)
+                with CaptureQueriesContext(connection) as consultas:
+                    esperado = {ambiente.id: ambiente.num_atividades for ambiente in atual()}
+                resultado['consultas'] = len(consultas)
+                resultado['corretas'] = esperado == {ambiente.id: ambiente.num_atividades for ambiente in antiga()}
+                raise _Rollback
+        except _Rollback:
+            pass
+        return resultado
+
+    def cronometrar(self, consulta, repeticoes):
+        consulta()
+        inicio = relogio.perf_counter()
+        for _ in range(repeticoes):
+            consulta()
+        return (relogio.perf_counter() - inicio) * 1000 / repeticoes
+
+    def consulta_antiga(self, usuario):
+        return Ambiente.objects.filter(
+            Q(usuario_administrador=usuario) | Q(usuarios_participantes=usuario)
+        ).distinct().annotate(
+            num_atividades=Count('atividade'),
+            num_pendentes=Count('atividade', filter=Q(atividade__status='Pendente')),
+            num_concluidas=Count('atividade', filter=Q(atividade__status='Concluído')),
+            num_atrasadas=Count('atividade', filter=Q(atividade__status='Atrasado'))
+        )
+
+    def popular(self, num_ambientes, num_atividades, num_participantes):
+        usuario = User.objects.create(username='benchmark_lista')
+        outros = User.objects.bulk_create(
+            [User(username=f'benchmark_lista_{i}') for i in range(num_participantes)]
+        )
+        status = [valor for valor, _ in STATUS_CHOICES]
+        hoje = timezone.localdate()
+        for i in range(num_ambientes):
+            # Metade administrada pelo usuário, metade em que ele só participa
+            administrador = usuario if i % 2 == 0 else outros[0] if outros else usuario
+            ambiente = Ambiente.objects.create(nome=f'Benchmark lista {i}', usuario_administrador=administrador)
+            ambiente.usuarios_participantes.add(usuario, *outros)
+            Atividade.objects.bulk_create(
+                Atividade(
+                    valor=Decimal('10.00'),
+                    ambiente=ambiente,
+                    data_prevista=hoje + timedelta(days=j % 60),
+                    hora_prevista=time(j % 24, 0),
+                    status=status[j % len(status)],
+                    descricao='Atividade de benchmark',
+                )
+                for j in range(num_atividades)
+            )
+            # bulk_create não dispara os signals do resumo diário
+            reconstruir_resumo(ambiente.id)
+        return usuario
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ambiente.fila_notificacoes import estatisticas_fila, processar_lote
+
+
+class Command(BaseCommand):
+    help = 'Processa o outbox de notificações (EventoNotificacao), criando as Notificacao em lotes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Threads que processam os eventos de um lote.')
+        parser.add_argument('--lote', type=int, default=100, help='Eventos reservados por vez.')
+        parser.add_argument('--intervalo', type=float, default=2.0,
+                            help='Segundos de espera quando a fila está vazia.')
+        parser.add_argument('--uma-vez', action='store_true', help='Esvazia a fila e termina.')
+        parser.add_argument('--estatisticas', action='store_true', help='Mostra o estado da fila e termina.')
+
+    def relatar(self, concluidos=None, falhas=None):
+        estado = estatisticas_fila()
+        prefixo = f'{concluidos} processado(s), {falhas} falha(s); ' if concluidos is not None else ''
+        self.stdout.write(
+            f"{prefixo}fila: {estado['pendentes']} pendente(s), "
+            f"{estado['falhas']} com falha definitiva, atraso de {estado['atraso']:.1f}s"
+        )
+
+    def handle(self, *args, **options):
+        if options['estatisticas']:
+            self.relatar()
+            return
+
+        try:
+            while True:
+                concluidos, falhas = processar_lote(options['lote'], options['workers'])
+                if concluidos or falhas:
+                    self.relatar(concluidos, falhas)
+                elif options['uma_vez']:
+                    break
+                else:
+                    time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            pass
+        self.relatar()
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from ambiente.retencao import (
+    MAXIMO_POR_USUARIO, RETENCAO_EVENTOS_DIAS, RETENCAO_LIDAS_DIAS, purgar_eventos_antigos, purgar_excedentes,
+    purgar_lidas_antigas,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Aplica as políticas de retenção de notificações: apaga as lidas mais '
+        'antigas que o prazo, o histórico além do máximo por usuário e os eventos '
+        'já processados do outbox, em lotes pequenos de chaves primárias com '
+        'pausas entre eles.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias-lidas', type=int, default=RETENCAO_LIDAS_DIAS,
+                            help='Apaga notificações lidas criadas há mais dias que isso (0 desativa).')
+        parser.add_argument('--maximo-por-usuario', type=int, default=MAXIMO_POR_USUARIO,
+                            help='Notificações mantidas por usuário, das mais recentes (0 desativa).')
+        parser.add_argument('--dias-eventos', type=int, default=RETENCAO_EVENTOS_DIAS,
+                            help='Apaga eventos concluídos ou que falharam criados há mais dias que isso (0 desativa).')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Linhas apagadas por DELETE.')
+        parser.add_argument('--pausa', type=float, default=0.5, help='Segundos de espera entre os lotes.')
+
+    def handle(self, *args, **options):
+        lote = {'batch_size': options['batch_size'], 'pausa': options['pausa']}
+        politicas = [
+            (f"lidas há mais de {options['dias_lidas']} dias",
+             purgar_lidas_antigas(options['dias_lidas'], **lote)),
+            (f"além de {options['maximo_por_usuario']} por usuário",
+             purgar_excedentes(options['maximo_por_usuario'], **lote)),
+        ]
+
+        total = 0
+        for descricao, lotes in politicas:
+            for numero, removidas in enumerate(lotes, start=1):
+                total += removidas
+                self.stdout.write(f'{descricao}: lote {numero}, {removidas} removida(s)')
+        self.stdout.write(self.style.SUCCESS(f'Notificações removidas: {total}.'))
+
+        eventos = 0
+        descricao = f"eventos processados há mais de {options['dias_eventos']} dias"
+        for numero, removidos in enumerate(purgar_eventos_antigos(options['dias_eventos'], **lote), start=1):
+            eventos += removidos
+            self.stdout.write(f'{descricao}: lote {numero}, {removidos} removido(s)')
+        self.stdout.write(self.style.SUCCESS(f'Eventos de notificação removidos: {eventos}.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from ambiente.contadores import reconciliar_contadores
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os contadores de notificações não lidas e corrige os que divergirem.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Usuários conferidos por lote.')
+
+    def handle(self, *args, **options):
+        corrigidos = reconciliar_contadores(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Contadores de notificações conferidos: {corrigidos} corrigido(s).'))
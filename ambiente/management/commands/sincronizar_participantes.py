@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from ambiente.participantes import sincronizar_participantes
+
+
+class Command(BaseCommand):
+    help = 'Cria os Participante (role Leitor) que faltam para os usuários em usuarios_participantes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ambiente', type=int, help='Sincroniza apenas o ambiente informado.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Linhas por INSERT em lote.')
+
+    def handle(self, *args, **options):
+        criados = sincronizar_participantes(options['ambiente'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Participantes sincronizados: {criados} criado(s).'))
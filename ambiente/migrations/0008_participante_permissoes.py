@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:29
+
+from django.db import migrations, models
+
+
+CAMPOS = (
+    (1, 'pode_visualizar_atividades'),
+    (2, 'pode_criar_atividades'),
+    (4, 'pode_editar_atividades'),
+    (8, 'pode_deletar_atividades'),
+)
+
+
+def popular_permissoes(apps, schema_editor):
+    Role = apps.get_model('ambiente', 'Role')
+    Participante = apps.get_model('ambiente', 'Participante')
+    for role in Role.objects.iterator():
+        mascara = sum(bit for bit, campo in CAMPOS if getattr(role, campo))
+        Participante.objects.filter(role=role).update(permissoes=mascara)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ambiente', '0007_notificacao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='participante',
+            name='permissoes',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(popular_permissoes, migrations.RunPython.noop),
+    ]
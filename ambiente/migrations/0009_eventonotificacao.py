@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:33
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ambiente', '0008_participante_permissoes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoNotificacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('alocacao_atividade', 'Participantes alocados em atividade')], max_length=30)),
+                ('dados', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('concluido', 'Concluído'), ('falhou', 'Falhou')], default='pendente', max_length=12)),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('disponivel_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('processado_em', models.DateTimeField(blank=True, null=True)),
+                ('erro', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'Evento de notificação',
+                'verbose_name_plural': 'Eventos de notificação',
+                'indexes': [models.Index(fields=['status', 'disponivel_em'], name='evento_notif_fila_idx')],
+            },
+        ),
+    ]
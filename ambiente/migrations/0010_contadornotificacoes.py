@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def popular_contadores(apps, schema_editor):
+    Notificacao = apps.get_model('ambiente', 'Notificacao')
+    ContadorNotificacoes = apps.get_model('ambiente', 'ContadorNotificacoes')
+    totais = (
+        Notificacao.objects.filter(lida=False).order_by()
+        .values('usuario_id').annotate(nao_lidas=Count('id'))
+    )
+    ContadorNotificacoes.objects.bulk_create(
+        (ContadorNotificacoes(**linha) for linha in totais.iterator()),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ambiente', '0009_eventonotificacao'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorNotificacoes',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='contador_notificacoes', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('nao_lidas', models.PositiveIntegerField(default=0)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Contador de notificações',
+                'verbose_name_plural': 'Contadores de notificações',
+            },
+        ),
+        migrations.RunPython(popular_contadores, migrations.RunPython.noop),
+    ]
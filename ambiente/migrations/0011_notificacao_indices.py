@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+from planit.db_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY não roda dentro de transação
+    atomic = False
+
+    dependencies = [
+        ('ambiente', '0010_contadornotificacoes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='notificacao',
+            index=models.Index(fields=['usuario', '-criada_em', '-id'], name='notificacao_caixa_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='notificacao',
+            index=models.Index(condition=models.Q(('lida', False)), fields=['usuario', '-criada_em', '-id'], name='notificacao_nao_lidas_idx'),
+        ),
+    ]
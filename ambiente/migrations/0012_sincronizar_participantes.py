@@ -0,0 +1,55 @@
+from django.db import migrations
+from django.db.models import Exists, OuterRef
+
+
+CAMPOS = (
+    (1, 'pode_visualizar_atividades'),
+    (2, 'pode_criar_atividades'),
+    (4, 'pode_editar_atividades'),
+    (8, 'pode_deletar_atividades'),
+)
+
+TAMANHO_LOTE = 1000
+
+
+def criar_participantes_faltantes(apps, schema_editor):
+    """Participante com a role Leitor para os membros anteriores ao signal de usuarios_participantes"""
+    Ambiente = apps.get_model('ambiente', 'Ambiente')
+    Participante = apps.get_model('ambiente', 'Participante')
+    Role = apps.get_model('ambiente', 'Role')
+    Membro = Ambiente.usuarios_participantes.through
+    faltando = Membro.objects.filter(
+        ~Exists(Participante.objects.filter(ambiente_id=OuterRef('ambiente_id'), usuario_id=OuterRef('user_id')))
+    ).order_by('id')
+
+    ultimo_id = 0
+    while True:
+        lote = list(faltando.filter(id__gt=ultimo_id).values_list('id', 'ambiente_id', 'user_id')[:TAMANHO_LOTE])
+        if not lote:
+            return
+        roles_leitor = {
+            role.ambiente_id: role
+            for role in Role.objects.filter(ambiente_id__in={ambiente_id for _, ambiente_id, _ in lote}, nome='leitor')
+        }
+        participantes = []
+        for _, ambiente_id, usuario_id in lote:
+            role = roles_leitor.get(ambiente_id)
+            participantes.append(Participante(
+                ambiente_id=ambiente_id,
+                usuario_id=usuario_id,
+                role=role,
+                permissoes=sum(bit for bit, campo in CAMPOS if getattr(role, campo)) if role else 0,
+            ))
+        Participante.objects.bulk_create(participantes, ignore_conflicts=True)
+        ultimo_id = lote[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ambiente', '0011_notificacao_indices'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_participantes_faltantes, migrations.RunPython.noop),
+    ]
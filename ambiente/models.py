@@ -1,5 +1,9 @@
+from enum import IntFlag
+
 from django.db import models
 from django.core.validators import RegexValidator
+from django.db.models import F
+from django.utils import timezone
 
 # Create your models here.
 
@@ -38,6 +42,37 @@ class AmbienteInvitations(models.Model):
         return f'Invitation to {self.email} for {self.ambiente.nome}'
 
 
+class PermissaoAtividade(IntFlag):
+    """Bits da máscara de permissões efetivas de um Participante"""
+    VISUALIZAR = 1
+    CRIAR = 2
+    EDITAR = 4
+    DELETAR = 8
+
+    @classmethod
+    def campos(cls):
+        """Pares (bit, campo booleano correspondente em Role)"""
+        return (
+            (cls.VISUALIZAR, 'pode_visualizar_atividades'),
+            (cls.CRIAR, 'pode_criar_atividades'),
+            (cls.EDITAR, 'pode_editar_atividades'),
+            (cls.DELETAR, 'pode_deletar_atividades'),
+        )
+
+    @classmethod
+    def de_valores(cls, valores):
+        """Máscara a partir de um objeto ou dicionário com os campos pode_*_atividades"""
+        mascara = cls(0)
+        for bit, campo in cls.campos():
+            valor = valores.get(campo) if isinstance(valores, dict) else getattr(valores, campo)
+            if valor:
+                mascara |= bit
+        return mascara
+
+    def como_dicionario(self):
+        return {campo: bool(self & bit) for bit, campo in self.campos()}
+
+
 class Role(models.Model):
     """
     Define roles com permissões específicas para um ambiente.
@@ -72,6 +107,18 @@ class Role(models.Model):
     def __str__(self):
         return f"{self.get_nome_display()} - {self.ambiente.nome}"
 
+    @property
+    def mascara_permissoes(self):
+        return PermissaoAtividade.de_valores(self)
+
+
+class ParticipanteQuerySet(models.QuerySet):
+
+    def com_permissao(self, permissao):
+        """Participantes cuja máscara contém todos os bits de `permissao` (sem join com Role)"""
+        permissao = int(permissao)
+        return self.alias(_bits_permissao=F('permissoes').bitand(permissao)).filter(_bits_permissao=permissao)
+
 
 class Participante(models.Model):
     """
@@ -82,6 +129,11 @@ class Participante(models.Model):
     ambiente = models.ForeignKey(Ambiente, on_delete=models.CASCADE, related_name='participantes')
     role = models.ForeignKey(Role, on_delete=models.SET_NULL, null=True, blank=True, related_name='participantes')
     data_entrada = models.DateTimeField(auto_now_add=True)
+    # Cópia das permissões da role (PermissaoAtividade), mantida em sincronia
+    # no save() e pelos signals de Role
+    permissoes = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    objects = ParticipanteQuerySet.as_manager()
     
     class Meta:
         unique_together = ['usuario', 'ambiente']
@@ -92,6 +144,20 @@ class Participante(models.Model):
         role_nome = self.role.get_nome_display() if self.role else 'Sem role'
         return f"{self.usuario.username} - {self.ambiente.nome} ({role_nome})"
 
+    def save(self, *args, **kwargs):
+        self.permissoes = self.role.mascara_permissoes if self.role_id else 0
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'role' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'permissoes'}
+        super().save(*args, **kwargs)
+
+    @property
+    def flags(self):
+        return PermissaoAtividade(self.permissoes)
+
+    def tem_permissao(self, permissao):
+        return permissao in self.flags
+
 
 class Notificacao(models.Model):
     """
@@ -118,6 +184,82 @@ class Notificacao(models.Model):
         ordering = ['-criada_em']
         verbose_name = 'Notificação'
         verbose_name_plural = 'Notificações'
+        indexes = [
+            # Caixa de notificações paginada por cursor
+            models.Index(fields=['usuario', '-criada_em', '-id'], name='notificacao_caixa_idx'),
+            # Apenas as não lidas: menu do cabeçalho e filtro "não lidas"
+            models.Index(fields=['usuario', '-criada_em', '-id'], condition=models.Q(lida=False),
+                         name='notificacao_nao_lidas_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.usuario.username} - {self.titulo}"
\ No newline at end of file
+        return f"{self.usuario.username} - {self.titulo}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Guarda o valor carregado para os signals saberem se `lida` mudou
+        if 'lida' in field_names:
+            instance._lida_carregada = instance.lida
+        return instance
+
+class ContadorNotificacoes(models.Model):
+    """
+    Quantidade de notificações não lidas de cada usuário, mantida com
+    expressões F a cada criação, leitura ou remoção de notificação e
+    conferida periodicamente pelo comando reconciliar_contadores_notificacoes.
+    """
+    usuario = models.OneToOneField('auth.User', on_delete=models.CASCADE, primary_key=True,
+                                   related_name='contador_notificacoes')
+    nao_lidas = models.PositiveIntegerField(default=0)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Contador de notificações'
+        verbose_name_plural = 'Contadores de notificações'
+
+    def __str__(self):
+        return f"{self.usuario_id}: {self.nao_lidas} não lida(s)"
+
+
+class EventoNotificacao(models.Model):
+    """
+    Outbox de notificações: as views apenas registram o evento na mesma
+    transação da alteração e o comando processar_notificacoes cria as
+    Notificacao em segundo plano.
+    """
+    TIPO_ALOCACAO_ATIVIDADE = 'alocacao_atividade'
+    TIPO_CHOICES = [
+        (TIPO_ALOCACAO_ATIVIDADE, 'Participantes alocados em atividade'),
+    ]
+
+    STATUS_PENDENTE = 'pendente'
+    STATUS_PROCESSANDO = 'processando'
+    STATUS_CONCLUIDO = 'concluido'
+    STATUS_FALHOU = 'falhou'
+    STATUS_CHOICES = [
+        (STATUS_PENDENTE, 'Pendente'),
+        (STATUS_PROCESSANDO, 'Processando'),
+        (STATUS_CONCLUIDO, 'Concluído'),
+        (STATUS_FALHOU, 'Falhou'),
+    ]
+
+    tipo = models.CharField(max_length=30, choices=TIPO_CHOICES)
+    dados = models.JSONField(default=dict)
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=STATUS_PENDENTE)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    # Quando o evento pode ser (re)tentado; enquanto processando, fim da reserva do worker
+    disponivel_em = models.DateTimeField(default=timezone.now)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    processado_em = models.DateTimeField(null=True, blank=True)
+    erro = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = 'Evento de notificação'
+        verbose_name_plural = 'Eventos de notificação'
+        indexes = [
+            models.Index(fields=['status', 'disponivel_em'], name='evento_notif_fila_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.pk} ({self.get_status_display()})"
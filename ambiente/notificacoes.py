@@ -0,0 +1,53 @@
+from django.db import transaction
+from django.urls import reverse
+
+from .contadores import ajustar_nao_lidas
+from .models import Notificacao
+
+
+def criar_notificacoes(usuarios, tipo, titulo, mensagem, link='', atividade=None, ambiente=None, batch_size=500):
+    """
+    Cria a mesma notificação para vários usuários com um único bulk_create
+    (em lotes de `batch_size`). `usuarios` aceita instâncias de User ou ids;
+    ids repetidos recebem uma só notificação. Retorna as notificações criadas.
+    """
+    usuario_ids = dict.fromkeys(getattr(usuario, 'pk', usuario) for usuario in usuarios)
+    notificacoes = [
+        Notificacao(
+            usuario_id=usuario_id,
+            tipo=tipo,
+            titulo=titulo,
+            mensagem=mensagem,
+            link=link,
+            atividade=atividade,
+            ambiente=ambiente,
+        )
+        for usuario_id in usuario_ids
+    ]
+    if not notificacoes:
+        return []
+    with transaction.atomic():
+        criadas = Notificacao.objects.bulk_create(notificacoes, batch_size=batch_size)
+        # bulk_create não dispara post_save: os contadores são ajustados aqui
+        ajustar_nao_lidas(dict.fromkeys(usuario_ids, 1))
+    return criadas
+
+
+def resumir_descricao(descricao, limite=50):
+    if not descricao:
+        return 'Sem descrição'
+    return descricao[:limite] + '...' if len(descricao) > limite else descricao
+
+
+def notificar_alocacao_atividade(atividade, participantes):
+    """Avisa os participantes recém-alocados em `atividade`"""
+    ambiente = atividade.ambiente
+    return criar_notificacoes(
+        (participante.usuario_id for participante in participantes),
+        tipo=Notificacao.TIPO_ALOCACAO_ATIVIDADE,
+        titulo='Você foi alocado em uma atividade',
+        mensagem=f'Você foi alocado na atividade "{resumir_descricao(atividade.descricao)}" no ambiente "{ambiente.nome}".',
+        link=reverse('detalhe_atividade', kwargs={'atividade_id': atividade.id}),
+        atividade=atividade,
+        ambiente=ambiente,
+    )
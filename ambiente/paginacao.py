@@ -0,0 +1,49 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+from atividade.paginacao import PaginaCursor
+
+
+# Ordenação da caixa de notificações; coincide com os índices
+# (usuario_id, -criada_em, -id) de Notificacao
+ORDENACAO_NOTIFICACOES = ('-criada_em', '-id')
+
+
+def codificar_cursor(notificacao):
+    valor = f'{notificacao.criada_em.isoformat()}|{notificacao.pk}'
+    return base64.urlsafe_b64encode(valor.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Retorna (criada_em, id) ou levanta ValueError."""
+    try:
+        preenchimento = '=' * (-len(cursor) % 4)
+        valor = base64.urlsafe_b64decode(cursor + preenchimento).decode()
+        criada_em_str, pk = valor.split('|')
+        return datetime.fromisoformat(criada_em_str), int(pk)
+    except (UnicodeDecodeError, ValueError, TypeError) as erro:
+        raise ValueError('Cursor inválido') from erro
+
+
+def paginar_notificacoes(queryset, cursor, tamanho):
+    """
+    Busca as `tamanho` notificações seguintes ao cursor, da mais recente
+    para a mais antiga, com um seek em (criada_em, id) em vez de OFFSET.
+    Um cursor vazio ou inválido retorna a primeira página.
+    """
+    if cursor:
+        try:
+            criada_em, pk = decodificar_cursor(cursor)
+        except ValueError:
+            pass
+        else:
+            queryset = queryset.filter(criada_em__lte=criada_em).filter(
+                Q(criada_em__lt=criada_em) | Q(criada_em=criada_em, id__lt=pk)
+            )
+
+    itens = list(queryset.order_by(*ORDENACAO_NOTIFICACOES)[:tamanho + 1])
+    tem_mais = len(itens) > tamanho
+    itens = itens[:tamanho]
+    return PaginaCursor(itens, proximo_cursor=codificar_cursor(itens[-1]) if tem_mais else None)
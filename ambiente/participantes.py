@@ -0,0 +1,58 @@
+from django.db.models import Exists, OuterRef
+
+from .models import Ambiente, Participante, Role
+
+
+def criar_participantes(pares):
+    """
+    Cria, com a role Leitor do ambiente, os Participante que faltam para os
+    pares (ambiente_id, usuario_id). Participantes existentes não são alterados.
+    Retorna a quantidade de pares enviados ao banco.
+    """
+    pares = list(pares)
+    if not pares:
+        return 0
+    roles_leitor = {
+        role.ambiente_id: role
+        for role in Role.objects.filter(ambiente_id__in={ambiente_id for ambiente_id, _ in pares}, nome=Role.LEITOR)
+    }
+    participantes = []
+    for ambiente_id, usuario_id in pares:
+        role = roles_leitor.get(ambiente_id)
+        participantes.append(Participante(
+            ambiente_id=ambiente_id,
+            usuario_id=usuario_id,
+            role=role,
+            permissoes=int(role.mascara_permissoes) if role else 0,
+        ))
+    # bulk_create não chama save(): a máscara de permissões é preenchida acima
+    Participante.objects.bulk_create(participantes, ignore_conflicts=True)
+    return len(participantes)
+
+
+def sincronizar_participantes(ambiente_id=None, batch_size=1000):
+    """
+    Cria os Participante que faltam para os usuários em usuarios_participantes,
+    em lotes percorridos pela chave da tabela da relação. A migration
+    0012_sincronizar_participantes já cobre os dados anteriores ao signal;
+    aqui fica para membros gravados sem signals (loaddata, SQL direto).
+    Retorna a quantidade de participantes criados.
+    """
+    Membro = Ambiente.usuarios_participantes.through
+    faltando = Membro.objects.filter(
+        ~Exists(Participante.objects.filter(ambiente_id=OuterRef('ambiente_id'), usuario_id=OuterRef('user_id')))
+    )
+    if ambiente_id is not None:
+        faltando = faltando.filter(ambiente_id=ambiente_id)
+
+    criados = 0
+    ultimo_id = 0
+    while True:
+        lote = list(
+            faltando.filter(id__gt=ultimo_id).order_by('id')
+            .values_list('id', 'ambiente_id', 'user_id')[:batch_size]
+        )
+        if not lote:
+            return criados
+        criados += criar_participantes((ambiente, usuario) for _, ambiente, usuario in lote)
+        ultimo_id = lote[-1][0]
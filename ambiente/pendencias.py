@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import AmbienteInvitations, ContadorNotificacoes
+
+
+# Tempo, em segundos, que a contagem de convites fica no cache. A de
+# notificações não é guardada: muda no worker e é uma leitura pela chave
+# primária de ContadorNotificacoes
+TEMPO_CACHE_PENDENCIAS = getattr(settings, 'PENDENCIAS_CACHE_TIMEOUT', 300)
+
+
+def _chave(usuario_id):
+    return f'pendencias:{usuario_id}'
+
+
+def ler_nao_lidas(usuario_id):
+    """Quantidade de notificações não lidas, lida do contador pela chave primária"""
+    return ContadorNotificacoes.objects.filter(pk=usuario_id).values_list('nao_lidas', flat=True).first() or 0
+
+
+def _contagem(queryset, campo_usuario):
+    total = (
+        queryset.filter(**{campo_usuario: OuterRef('pk')})
+        .order_by().values(campo_usuario)
+        .annotate(total=Count('id')).values('total')
+    )
+    return Coalesce(Subquery(total), 0)
+
+
+def consultar_pendencias(usuario_id):
+    """
+    Retorna {'convites': n, 'notificacoes': n} (convites pendentes e
+    notificações não lidas, lidas de ContadorNotificacoes) com uma única
+    consulta, sem passar pelo cache.
+    """
+    linha = User.objects.filter(pk=usuario_id).values_list(
+        _contagem(AmbienteInvitations.objects.filter(accepted=False), 'guest'),
+        Coalesce(Subquery(
+            ContadorNotificacoes.objects.filter(pk=OuterRef('pk')).values('nao_lidas')[:1]
+        ), 0),
+    ).first() or (0, 0)
+    return {'convites': linha[0], 'notificacoes': linha[1]}
+
+
+def contar_pendencias(usuario_id):
+    """
+    Como consultar_pendencias, mas com os convites guardados no cache. As
+    notificações são sempre lidas do contador, que o worker atualiza sem
+    passar pelo cache deste processo.
+    """
+    convites = cache.get(_chave(usuario_id))
+    if convites is None:
+        contagens = consultar_pendencias(usuario_id)
+        cache.set(_chave(usuario_id), contagens['convites'], TEMPO_CACHE_PENDENCIAS)
+        return contagens
+    return {'convites': convites, 'notificacoes': ler_nao_lidas(usuario_id)}
+
+
+def invalidar_pendencias(*usuario_ids):
+    cache.delete_many([_chave(usuario_id) for usuario_id in usuario_ids])
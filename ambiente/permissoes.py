@@ -0,0 +1,160 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, FilteredRelation, OuterRef, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+
+from .models import Ambiente, PermissaoAtividade
+
+
+CAMPOS_PERMISSAO = tuple(campo for _, campo in PermissaoAtividade.campos())
+
+SEM_PERMISSOES = dict.fromkeys(CAMPOS_PERMISSAO, False)
+TODAS_PERMISSOES = dict.fromkeys(CAMPOS_PERMISSAO, True)
+
+# Tempo, em segundos, que as permissões resolvidas ficam no cache entre requisições
+TEMPO_CACHE_PERMISSOES = getattr(settings, 'PERMISSOES_CACHE_TIMEOUT', 300)
+
+
+def _chave_versao(ambiente_id):
+    return f'permissoes:versao:{ambiente_id}'
+
+
+def _versao(ambiente_id):
+    versao = cache.get(_chave_versao(ambiente_id))
+    if versao is None:
+        versao = uuid.uuid4().hex
+        cache.add(_chave_versao(ambiente_id), versao, None)
+        versao = cache.get(_chave_versao(ambiente_id), versao)
+    return versao
+
+
+def invalidar_permissoes(ambiente_id):
+    """
+    Descarta as permissões em cache de todos os usuários do ambiente,
+    agora e de novo no commit (para não guardar leituras anteriores a ele).
+    """
+    def trocar_versao():
+        cache.set(_chave_versao(ambiente_id), uuid.uuid4().hex, None)
+
+    trocar_versao()
+    transaction.on_commit(trocar_versao)
+
+
+def _consultar(usuario_id, ambiente_id):
+    membros = Ambiente.usuarios_participantes.through.objects.filter(
+        ambiente_id=OuterRef('pk'), user_id=usuario_id
+    )
+    linha = (
+        Ambiente.objects.filter(pk=ambiente_id)
+        .annotate(
+            participacao=FilteredRelation('participantes', condition=Q(participantes__usuario_id=usuario_id)),
+            participa=Exists(membros),
+        )
+        .values('usuario_administrador_id', 'participa', 'participacao__permissoes')
+        .first()
+    )
+    if linha is None:
+        return {'existe': False, 'acesso': False, **SEM_PERMISSOES}
+
+    if linha['usuario_administrador_id'] == usuario_id:
+        return {'existe': True, 'acesso': True, **TODAS_PERMISSOES}
+
+    permissoes = PermissaoAtividade(linha['participacao__permissoes'] or 0).como_dicionario()
+    return {'existe': True, 'acesso': linha['participa'], **permissoes}
+
+
+def resolver_permissoes(user, ambiente, request=None):
+    """
+    Resolve o acesso e as permissões de atividades de `user` em `ambiente`
+    (instância ou id). O resultado é memorizado na requisição e guardado no
+    cache por (usuário, ambiente); na falta dos dois, custa uma consulta.
+
+    Retorna um dicionário com 'existe', 'acesso' e os campos de CAMPOS_PERMISSAO.
+    """
+    ambiente_id = ambiente.pk if isinstance(ambiente, Ambiente) else int(ambiente)
+    if not user.is_authenticated:
+        return {'existe': True, 'acesso': False, **SEM_PERMISSOES}
+
+    if isinstance(ambiente, Ambiente) and ambiente.usuario_administrador_id == user.pk:
+        return {'existe': True, 'acesso': True, **TODAS_PERMISSOES}
+
+    memo = None
+    if request is not None:
+        memo = getattr(request, '_permissoes_ambiente', None)
+        if memo is None:
+            memo = request._permissoes_ambiente = {}
+        if (user.pk, ambiente_id) in memo:
+            return memo[(user.pk, ambiente_id)]
+
+    chave = f'permissoes:{ambiente_id}:{_versao(ambiente_id)}:{user.pk}'
+    resultado = cache.get(chave)
+    if resultado is None:
+        resultado = _consultar(user.pk, ambiente_id)
+        cache.set(chave, resultado, TEMPO_CACHE_PERMISSOES)
+
+    if memo is not None:
+        memo[(user.pk, ambiente_id)] = resultado
+    return resultado
+
+
+def ids_ambientes_acessiveis(usuario_id):
+    """
+    Subconsulta com os ids dos ambientes que o usuário administra UNION os
+    em que participa. Cada lado usa seu próprio índice, sem o JOIN com a
+    tabela de participantes que um OR exigiria (e o DISTINCT para desfazê-lo).
+    """
+    administrados = Ambiente.objects.filter(usuario_administrador_id=usuario_id).values('pk')
+    participados = Ambiente.usuarios_participantes.through.objects.filter(user_id=usuario_id).values('ambiente_id')
+    return administrados.union(participados)
+
+
+def ambientes_acessiveis(user):
+    """Queryset dos ambientes que `user` administra ou dos quais participa."""
+    return Ambiente.objects.filter(pk__in=ids_ambientes_acessiveis(user.pk))
+
+
+def permissoes_atividades(user, ambiente, request=None):
+    """Apenas os quatro campos pode_*_atividades."""
+    resultado = resolver_permissoes(user, ambiente, request)
+    return {campo: resultado[campo] for campo in CAMPOS_PERMISSAO}
+
+
+class PodeAcessarAmbiente(BasePermission):
+    """
+    Permissão DRF para endpoints com `ambiente_id` na URL: métodos seguros
+    exigem acesso ao ambiente; POST, PUT/PATCH e DELETE exigem as permissões
+    de criar, editar e deletar atividades. Ambiente inexistente gera 404.
+    """
+    message = 'Você não tem permissão para acessar este ambiente.'
+    permissao_por_metodo = {
+        'POST': 'pode_criar_atividades',
+        'PUT': 'pode_editar_atividades',
+        'PATCH': 'pode_editar_atividades',
+        'DELETE': 'pode_deletar_atividades',
+    }
+
+    def has_permission(self, request, view):
+        ambiente_id = view.kwargs.get('ambiente_id')
+        if ambiente_id is None:
+            return True
+        return self._verificar(request, ambiente_id)
+
+    def has_object_permission(self, request, view, obj):
+        ambiente_id = obj.pk if isinstance(obj, Ambiente) else getattr(obj, 'ambiente_id', None)
+        if ambiente_id is None:
+            return True
+        return self._verificar(request, ambiente_id)
+
+    def _verificar(self, request, ambiente_id):
+        resultado = resolver_permissoes(request.user, ambiente_id, request)
+        if not resultado['existe']:
+            raise NotFound('Ambiente não encontrado.')
+        if not resultado['acesso']:
+            return False
+        if request.method in SAFE_METHODS:
+            return True
+        return resultado[self.permissao_por_metodo.get(request.method, 'pode_editar_atividades')]
@@ -0,0 +1,148 @@
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .contadores import ajustar_nao_lidas
+from .models import EventoNotificacao, Notificacao
+
+
+# Notificações lidas são apagadas depois deste número de dias (0 desativa)
+RETENCAO_LIDAS_DIAS = getattr(settings, 'NOTIFICACOES_RETENCAO_LIDAS_DIAS', 90)
+
+# Eventos do outbox concluídos ou que falharam são apagados depois deste número de dias (0 desativa)
+RETENCAO_EVENTOS_DIAS = getattr(settings, 'NOTIFICACOES_RETENCAO_EVENTOS_DIAS', 30)
+
+# Histórico máximo por usuário; as mais antigas além disso são apagadas (0 desativa)
+MAXIMO_POR_USUARIO = getattr(settings, 'NOTIFICACOES_MAXIMO_POR_USUARIO', 1000)
+
+
+def _apagar_retornando(ids):
+    """
+    DELETE ... RETURNING (PostgreSQL, SQLite 3.35+): (usuario_id, lida) de
+    cada notificação que o DELETE de fato apagou.
+    """
+    qn = connection.ops.quote_name
+    marcadores = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {qn(Notificacao._meta.db_table)} WHERE {qn("id")} IN ({marcadores}) '
+            f'RETURNING {qn("usuario_id")}, {qn("lida")}',
+            list(ids)
+        )
+        return cursor.fetchall()
+
+
+def _apagar_com_lock(ids):
+    """Sem RETURNING: trava as linhas com SELECT ... FOR UPDATE antes de lê-las e apagá-las."""
+    linhas = list(Notificacao.objects.select_for_update().filter(pk__in=ids).values_list('usuario_id', 'lida'))
+    tabela = connection.ops.quote_name(Notificacao._meta.db_table)
+    marcadores = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {tabela} WHERE id IN ({marcadores})', list(ids))
+    return linhas
+
+
+def apagar_notificacoes(ids):
+    """
+    Apaga as notificações `ids` com um único DELETE e desconta dos contadores
+    as que não estavam lidas no momento do DELETE, e não numa leitura
+    anterior que uma marcação concorrente poderia invalidar. Retorna a
+    quantidade apagada.
+    """
+    if not ids:
+        return 0
+    with transaction.atomic():
+        # DELETE direto: QuerySet.delete() carregaria cada linha para os
+        # signals de post_delete, que ajustariam o contador uma a uma
+        if connection.features.can_return_columns_from_insert:
+            apagadas = _apagar_retornando(ids)
+        else:
+            apagadas = _apagar_com_lock(ids)
+        nao_lidas = Counter(usuario_id for usuario_id, lida in apagadas if not lida)
+        ajustar_nao_lidas({usuario_id: -total for usuario_id, total in nao_lidas.items()})
+    return len(apagadas)
+
+
+def _em_lotes(selecionar, pausa):
+    """Apaga em lotes os ids devolvidos por `selecionar()` até acabarem, pausando entre eles."""
+    while True:
+        ids = selecionar()
+        if not ids:
+            return
+        yield apagar_notificacoes(ids)
+        if pausa:
+            time.sleep(pausa)
+
+
+def purgar_lidas_antigas(dias=RETENCAO_LIDAS_DIAS, batch_size=1000, pausa=0.5):
+    """Apaga as notificações lidas criadas há mais de `dias` dias, gerando o total de cada lote."""
+    if not dias:
+        return
+    limite = timezone.now() - timedelta(days=dias)
+    ultimo_id = 0
+
+    def selecionar():
+        nonlocal ultimo_id
+        ids = list(
+            Notificacao.objects.filter(lida=True, criada_em__lt=limite, id__gt=ultimo_id)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if ids:
+            ultimo_id = ids[-1]
+        return ids
+
+    yield from _em_lotes(selecionar, pausa)
+
+
+def purgar_excedentes(maximo=MAXIMO_POR_USUARIO, batch_size=1000, pausa=0.5):
+    """
+    Mantém apenas as `maximo` notificações mais recentes de cada usuário,
+    gerando o total de cada lote apagado.
+    """
+    if not maximo:
+        return
+    usuario_ids = list(
+        Notificacao.objects.order_by().values('usuario_id')
+        .annotate(total=Count('id')).filter(total__gt=maximo)
+        .values_list('usuario_id', flat=True)
+    )
+    for usuario_id in usuario_ids:
+        notificacoes = Notificacao.objects.filter(usuario_id=usuario_id)
+        corte = list(notificacoes.order_by('-criada_em', '-id').values_list('criada_em', 'id')[maximo - 1:maximo])
+        if not corte:
+            continue
+        criada_em, pk = corte[0]
+        antigas = notificacoes.filter(Q(criada_em__lt=criada_em) | Q(criada_em=criada_em, id__lt=pk))
+
+        def selecionar(antigas=antigas):
+            return list(antigas.order_by('criada_em', 'id').values_list('id', flat=True)[:batch_size])
+
+        yield from _em_lotes(selecionar, pausa)
+
+
+def purgar_eventos_antigos(dias=RETENCAO_EVENTOS_DIAS, batch_size=1000, pausa=0.5):
+    """
+    Apaga os eventos de notificação concluídos ou que falharam criados há
+    mais de `dias` dias, gerando o total de cada lote. Eventos ainda na
+    fila não são tocados.
+    """
+    if not dias:
+        return
+    limite = timezone.now() - timedelta(days=dias)
+    antigos = EventoNotificacao.objects.filter(
+        status__in=(EventoNotificacao.STATUS_CONCLUIDO, EventoNotificacao.STATUS_FALHOU), criado_em__lt=limite
+    )
+    ultimo_id = 0
+    while True:
+        ids = list(antigos.filter(id__gt=ultimo_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return
+        ultimo_id = ids[-1]
+        yield EventoNotificacao.objects.filter(id__in=ids).delete()[0]
+        if pausa:
+            time.sleep(pausa)
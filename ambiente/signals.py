@@ -1,6 +1,12 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from .models import Ambiente, Role
+from .contadores import ajustar_nao_lidas
+from .dashboard import invalidar_dashboard_ambiente, invalidar_dashboard_usuarios
+from .eventos import publicar
+from .models import Ambiente, AmbienteInvitations, Notificacao, Participante, Role
+from .pendencias import invalidar_pendencias
+from .participantes import criar_participantes
+from .permissoes import invalidar_permissoes
 
 
 @receiver(post_save, sender=Ambiente)
@@ -41,3 +47,116 @@ def criar_roles_padrao(sender, instance, created, **kwargs):
             pode_editar_atividades=True,
             pode_deletar_atividades=True
         )
+
+
+@receiver(post_save, sender=Role)
+def sincronizar_permissoes_participantes(sender, instance, created, raw=False, **kwargs):
+    """Copia as permissões da role para a máscara dos participantes que a usam"""
+    if not created and not raw:
+        Participante.objects.filter(role=instance).update(permissoes=int(instance.mascara_permissoes))
+
+
+@receiver(pre_delete, sender=Role)
+def zerar_permissoes_participantes(sender, instance, **kwargs):
+    """A role será removida e os participantes ficam sem role (SET_NULL)"""
+    Participante.objects.filter(role=instance).update(permissoes=0)
+
+
+@receiver(post_save, sender=Ambiente)
+@receiver(post_delete, sender=Ambiente)
+def invalidar_permissoes_ambiente(sender, instance, **kwargs):
+    """O administrador do ambiente pode ter mudado"""
+    invalidar_permissoes(instance.pk)
+    invalidar_dashboard_ambiente(instance.pk)
+    invalidar_dashboard_usuarios(instance.usuario_administrador_id)
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+@receiver(post_save, sender=Participante)
+@receiver(post_delete, sender=Participante)
+def invalidar_permissoes_participantes(sender, instance, **kwargs):
+    invalidar_permissoes(instance.ambiente_id)
+
+
+@receiver(m2m_changed, sender=Ambiente.usuarios_participantes.through)
+def sincronizar_participantes(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Cria um Participante para cada usuário adicionado a usuarios_participantes,
+    pelos dois lados da relação (ambiente.usuarios_participantes e
+    user.ambientes_participantes), e invalida o cache de permissões e as
+    listas de ambientes dos usuários envolvidos.
+
+    Ao remover, o Participante é mantido: apagá-lo levaria junto (CASCADE)
+    as alocações do usuário nas atividades e a role dele. O acesso vem de
+    usuarios_participantes, então quem saiu não enxerga mais o ambiente; se
+    voltar, reencontra a mesma role.
+    """
+    if action == 'pre_clear':
+        if reverse:
+            pk_set = set(instance.ambientes_participantes.values_list('pk', flat=True))
+        else:
+            pk_set = set(instance.usuarios_participantes.values_list('pk', flat=True))
+        action = 'remove'
+    elif action in ('post_add', 'post_remove'):
+        action = action[len('post_'):]
+    else:
+        return
+
+    if reverse:
+        pares = [(ambiente_id, instance.pk) for ambiente_id in pk_set]
+    else:
+        pares = [(instance.pk, usuario_id) for usuario_id in pk_set]
+
+    if action == 'add':
+        criar_participantes(pares)
+
+    for ambiente_id in {ambiente_id for ambiente_id, _ in pares}:
+        invalidar_permissoes(ambiente_id)
+    invalidar_dashboard_usuarios(*{usuario_id for _, usuario_id in pares})
+
+
+@receiver(post_save, sender=AmbienteInvitations)
+@receiver(post_delete, sender=AmbienteInvitations)
+def invalidar_pendencias_convite(sender, instance, **kwargs):
+    invalidar_pendencias(instance.guest_id)
+    publicar([instance.guest_id], 'convite')
+
+
+@receiver(pre_save, sender=Notificacao)
+def guardar_lida_anterior(sender, instance, raw=False, **kwargs):
+    """Busca o valor anterior de `lida` quando a instância não veio do banco."""
+    if raw or instance.pk is None or hasattr(instance, '_lida_carregada'):
+        return
+    instance._lida_carregada = (
+        Notificacao.objects.filter(pk=instance.pk).values_list('lida', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Notificacao)
+def atualizar_contador_notificacao(sender, instance, created, raw=False, **kwargs):
+    """
+    Mantém ContadorNotificacoes: +1 para notificação criada não lida e
+    +1/-1 quando `lida` muda. Alterações sem efeito no contador apenas
+    invalidam as pendências em cache.
+    """
+    anterior = None if created else getattr(instance, '_lida_carregada', None)
+    instance._lida_carregada = instance.lida
+    if raw:
+        return
+    if anterior is None:
+        delta = 0 if instance.lida else 1
+    else:
+        delta = int(anterior) - int(instance.lida)
+    if delta:
+        ajustar_nao_lidas({instance.usuario_id: delta})
+    else:
+        invalidar_pendencias(instance.usuario_id)
+
+
+@receiver(post_delete, sender=Notificacao)
+def descontar_notificacao_removida(sender, instance, **kwargs):
+    if instance.lida:
+        invalidar_pendencias(instance.usuario_id)
+    else:
+        ajustar_nao_lidas({instance.usuario_id: -1})
@@ -0,0 +1,71 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from io import StringIO
+
+from ambiente.models import Ambiente, ContadorNotificacoes, Notificacao, Participante, PermissaoAtividade, Role
+
+
+class SincronizarParticipantesCommandTestCase(TestCase):
+    """Testes para o comando sincronizar_participantes"""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='cmd_sinc_admin', password='123456')
+        self.ambiente = Ambiente.objects.create(nome='Amb Cmd', usuario_administrador=self.admin)
+        self.outro = Ambiente.objects.create(nome='Amb Cmd 2', usuario_administrador=self.admin)
+        self.usuarios = [
+            User.objects.create_user(username=f'cmd_sinc_{i}', password='123456') for i in range(5)
+        ]
+        self.ambiente.usuarios_participantes.add(*self.usuarios)
+        self.outro.usuarios_participantes.add(*self.usuarios[:2])
+        # Simula dados anteriores ao signal
+        Participante.objects.all().delete()
+
+    def test_cria_participantes_faltantes(self):
+        out = StringIO()
+        call_command('sincronizar_participantes', batch_size=2, stdout=out)
+        self.assertIn('7 criado(s)', out.getvalue())
+        self.assertEqual(Participante.objects.filter(ambiente=self.ambiente).count(), 5)
+        self.assertEqual(Participante.objects.filter(ambiente=self.outro).count(), 2)
+        participante = Participante.objects.filter(ambiente=self.ambiente).first()
+        self.assertEqual(participante.role.nome, Role.LEITOR)
+        self.assertEqual(participante.flags, PermissaoAtividade.VISUALIZAR)
+
+    def test_apenas_um_ambiente(self):
+        call_command('sincronizar_participantes', ambiente=self.outro.id, stdout=StringIO())
+        self.assertEqual(Participante.objects.count(), 2)
+
+    def test_idempotente(self):
+        call_command('sincronizar_participantes', stdout=StringIO())
+        out = StringIO()
+        call_command('sincronizar_participantes', stdout=out)
+        self.assertIn('0 criado(s)', out.getvalue())
+        self.assertEqual(Participante.objects.count(), 7)
+
+
+class ReconciliarContadoresNotificacoesCommandTestCase(TestCase):
+    """Testes para o comando reconciliar_contadores_notificacoes"""
+
+    def test_corrige_contadores(self):
+        usuario = User.objects.create_user(username='cmd_contador', password='123456')
+        Notificacao.objects.create(usuario=usuario, tipo=Notificacao.TIPO_ALOCACAO_ATIVIDADE, titulo='T', mensagem='M')
+        ContadorNotificacoes.objects.filter(pk=usuario.pk).update(nao_lidas=5)
+
+        out = StringIO()
+        call_command('reconciliar_contadores_notificacoes', stdout=out)
+        self.assertIn('1 corrigido(s)', out.getvalue())
+        self.assertEqual(ContadorNotificacoes.objects.get(pk=usuario.pk).nao_lidas, 1)
+
+
+class BenchmarkListaAmbientesCommandTestCase(TestCase):
+    """Testes para o comando benchmark_lista_ambientes"""
+
+    def test_mede_cenarios_e_desfaz_os_dados(self):
+        out = StringIO()
+        call_command('benchmark_lista_ambientes', ambientes=[1, 2], atividades=[3],
+                     participantes=2, repeticoes=1, stdout=out)
+        linhas = out.getvalue().strip().splitlines()
+        self.assertEqual(len(linhas), 3)
+        self.assertIn('multiplicadas', linhas[1])
+        self.assertFalse(Ambiente.objects.exists())
+        self.assertFalse(User.objects.filter(username__startswith='benchmark_lista').exists())
@@ -0,0 +1,100 @@
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.test import AsyncRequestFactory, RequestFactory, TestCase
+from django.urls import reverse
+
+from ambiente.context_processors import pendencias_processor
+from ambiente.models import Ambiente, AmbienteInvitations, ContadorNotificacoes, Notificacao
+from ambiente.notificacoes import criar_notificacoes
+
+
+class PendenciasProcessorTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='pend_admin', password='123456')
+        self.user = User.objects.create_user(username='pend_user', password='123456')
+        self.ambiente = Ambiente.objects.create(nome='Amb Pendências', usuario_administrador=self.admin)
+        AmbienteInvitations.objects.create(
+            ambiente=self.ambiente, email='pend@email.com', token='pend-token',
+            inviter=self.admin, guest=self.user
+        )
+        Notificacao.objects.create(
+            usuario=self.user, tipo=Notificacao.TIPO_ALOCACAO_ATIVIDADE, titulo='T', mensagem='M'
+        )
+
+    def contexto(self, user=None):
+        request = RequestFactory().get('/')
+        request.user = user or self.user
+        return pendencias_processor(request)
+
+    def test_sem_consultas_se_nao_usado(self):
+        with self.assertNumQueries(0):
+            self.contexto()
+
+    def test_contagens_em_uma_consulta_e_cache(self):
+        contexto = self.contexto()
+        with self.assertNumQueries(1):
+            self.assertEqual(str(contexto['invitations_count']), '1')
+            self.assertTrue(contexto['notificacoes_nao_lidas_count'] > 0)
+        with self.assertNumQueries(1):
+            contexto = self.contexto()
+            self.assertEqual(contexto['invitations_count'], 1)
+            self.assertEqual(contexto['notificacoes_nao_lidas_count'], 1)
+
+    def test_notificacoes_nao_dependem_do_cache(self):
+        # Contador alterado em outro processo, sem invalidar o cache deste
+        self.assertEqual(self.contexto()['notificacoes_nao_lidas_count'], 1)
+        ContadorNotificacoes.objects.filter(pk=self.user.pk).update(nao_lidas=0)
+        self.assertEqual(self.contexto()['notificacoes_nao_lidas_count'], 0)
+        ContadorNotificacoes.objects.filter(pk=self.user.pk).update(nao_lidas=1)
+        contexto = self.contexto()
+        self.assertEqual(contexto['notificacoes_nao_lidas_count'], 1)
+        self.assertEqual(len(contexto['notificacoes_nao_lidas']), 1)
+
+    def test_listas(self):
+        contexto = self.contexto()
+        self.assertEqual(len(contexto['pending_invitations']), 1)
+        self.assertEqual(len(contexto['notificacoes_nao_lidas']), 1)
+
+    def test_lista_vazia_sem_consulta(self):
+        contexto = self.contexto(self.admin)
+        self.assertEqual(contexto['invitations_count'], 0)
+        with self.assertNumQueries(0):
+            self.assertFalse(contexto['pending_invitations'])
+            self.assertFalse(contexto['notificacoes_nao_lidas'])
+
+    def test_stream_apenas_sob_asgi(self):
+        self.assertFalse(self.contexto()['notificacoes_sse'])
+        request = AsyncRequestFactory().get('/')
+        request.user = self.user
+        self.assertTrue(pendencias_processor(request)['notificacoes_sse'])
+        with self.settings(NOTIFICACOES_SSE=False):
+            self.assertFalse(pendencias_processor(request)['notificacoes_sse'])
+
+    def test_anonimo(self):
+        contexto = self.contexto(AnonymousUser())
+        self.assertEqual(contexto['invitations_count'], 0)
+
+    def test_invalida_ao_criar_notificacao(self):
+        self.assertEqual(self.contexto()['notificacoes_nao_lidas_count'], 1)
+        criar_notificacoes([self.user], tipo=Notificacao.TIPO_ALOCACAO_ATIVIDADE, titulo='T', mensagem='M')
+        self.assertEqual(self.contexto()['notificacoes_nao_lidas_count'], 2)
+
+    def test_invalida_ao_ler_notificacao(self):
+        self.assertEqual(self.contexto()['notificacoes_nao_lidas_count'], 1)
+        Notificacao.objects.filter(usuario=self.user).first().delete()
+        self.assertEqual(self.contexto()['notificacoes_nao_lidas_count'], 0)
+
+    def test_invalida_ao_marcar_todas_lidas(self):
+        self.assertEqual(self.contexto()['notificacoes_nao_lidas_count'], 1)
+        self.client.login(username='pend_user', password='123456')
+        self.client.post(reverse('marcar_todas_lidas'))
+        self.assertEqual(self.contexto()['notificacoes_nao_lidas_count'], 0)
+
+    def test_invalida_ao_aceitar_convite(self):
+        self.assertEqual(self.contexto()['invitations_count'], 1)
+        convite = AmbienteInvitations.objects.get()
+        convite.accepted = True
+        convite.save()
+        self.assertEqual(self.contexto()['invitations_count'], 0)
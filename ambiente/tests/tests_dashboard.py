@@ -0,0 +1,94 @@
+from datetime import date, time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ambiente.dashboard import ambientes_do_dashboard
+from ambiente.models import Ambiente
+from atividade.models import Atividade
+
+
+class DashboardAmbientesTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user(username='dashboard_user', password='123456')
+        self.outro = User.objects.create_user(username='dashboard_outro', password='123456')
+        self.ambiente = Ambiente.objects.create(nome='Meu', usuario_administrador=self.usuario)
+        self.alheio = Ambiente.objects.create(nome='Alheio', usuario_administrador=self.outro)
+
+    def criar_atividade(self, ambiente, status='Pendente'):
+        return Atividade.objects.create(
+            valor=Decimal('10'), ambiente=ambiente, status=status,
+            data_prevista=date.today(), hora_prevista=time(10, 0)
+        )
+
+    def nomes(self):
+        return [ambiente.nome for ambiente in ambientes_do_dashboard(self.usuario)]
+
+    def test_segunda_leitura_vem_do_cache(self):
+        self.assertEqual(self.nomes(), ['Meu'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.nomes(), ['Meu'])
+
+    def test_atividade_invalida_contagens(self):
+        ambientes_do_dashboard(self.usuario)
+        atividade = self.criar_atividade(self.ambiente)
+        self.assertEqual(ambientes_do_dashboard(self.usuario)[0].num_pendentes, 1)
+
+        atividade.status = 'Concluído'
+        atividade.save()
+        ambiente = ambientes_do_dashboard(self.usuario)[0]
+        self.assertEqual((ambiente.num_pendentes, ambiente.num_concluidas), (0, 1))
+
+    def test_marcar_atrasadas_invalida_contagens(self):
+        from datetime import timedelta
+        from atividade.atrasos import marcar_atrasadas
+
+        Atividade.objects.create(
+            valor=Decimal('10'), ambiente=self.ambiente,
+            data_prevista=date.today() - timedelta(days=1), hora_prevista=time(10, 0)
+        )
+        self.assertEqual(ambientes_do_dashboard(self.usuario)[0].num_pendentes, 1)
+        marcar_atrasadas()
+        ambiente = ambientes_do_dashboard(self.usuario)[0]
+        self.assertEqual((ambiente.num_pendentes, ambiente.num_atrasadas), (0, 1))
+
+    def test_atividade_de_outro_ambiente_nao_invalida(self):
+        ambientes_do_dashboard(self.usuario)
+        self.criar_atividade(self.alheio)
+        with self.assertNumQueries(0):
+            ambientes_do_dashboard(self.usuario)
+
+    def test_entrar_e_sair_de_ambiente(self):
+        ambientes_do_dashboard(self.usuario)
+        self.alheio.usuarios_participantes.add(self.usuario)
+        self.assertEqual(self.nomes(), ['Meu', 'Alheio'])
+        self.usuario.ambientes_participantes.remove(self.alheio)
+        self.assertEqual(self.nomes(), ['Meu'])
+
+    def test_ambiente_criado_editado_e_removido(self):
+        ambientes_do_dashboard(self.usuario)
+        novo = Ambiente.objects.create(nome='Novo', usuario_administrador=self.usuario)
+        self.assertEqual(self.nomes(), ['Meu', 'Novo'])
+
+        novo.nome = 'Renomeado'
+        novo.save()
+        self.assertEqual(self.nomes(), ['Meu', 'Renomeado'])
+
+        novo.delete()
+        self.assertEqual(self.nomes(), ['Meu'])
+
+    def test_caminhos_de_erro_usam_apenas_os_ambientes_do_usuario(self):
+        self.client.login(username='dashboard_user', password='123456')
+        respostas = [
+            self.client.post(reverse('criar_ambiente'), {'nome': ''}),
+            self.client.post(reverse('editar_ambiente', args=[self.ambiente.id]), {'nome': ''}),
+            self.client.get(reverse('editar_ambiente', args=[self.ambiente.id])),
+        ]
+        for response in respostas:
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([ambiente.nome for ambiente in response.context['ambientes']], ['Meu'])
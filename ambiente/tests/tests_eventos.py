@@ -0,0 +1,197 @@
+import asyncio
+import threading
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from ambiente.eventos import (
+    BarramentoLocal, buscar_eventos, codificar_cursor, cursor_atual,
+    decodificar_cursor, formatar_evento, novidades, publicar
+)
+from ambiente.models import Ambiente, AmbienteInvitations, Notificacao
+
+
+def criar_notificacao(usuario, titulo='T'):
+    return Notificacao.objects.create(
+        usuario=usuario, tipo=Notificacao.TIPO_ALOCACAO_ATIVIDADE, titulo=titulo, mensagem='M'
+    )
+
+
+class EventosServiceTestCase(TestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='eventos_user', password='123456')
+        self.admin = User.objects.create_user(username='eventos_admin', password='123456')
+        self.ambiente = Ambiente.objects.create(nome='Amb Eventos', usuario_administrador=self.admin)
+
+    def test_cursor_ida_e_volta(self):
+        self.assertEqual(decodificar_cursor(codificar_cursor((12, 3))), (12, 3))
+        for invalido in ('', 'abc', '1', '1-2-3', '-1-2'):
+            with self.assertRaises(ValueError):
+                decodificar_cursor(invalido)
+
+    def test_cursor_atual(self):
+        self.assertEqual(cursor_atual(self.usuario.pk), (0, 0))
+        notificacao = criar_notificacao(self.usuario)
+        convite = AmbienteInvitations.objects.create(
+            ambiente=self.ambiente, inviter=self.admin, guest=self.usuario, token='tok-eventos'
+        )
+        self.assertEqual(cursor_atual(self.usuario.pk), (notificacao.pk, convite.pk))
+
+    def test_buscar_eventos_depois_do_cursor(self):
+        antiga = criar_notificacao(self.usuario, 'Antiga')
+        nova = criar_notificacao(self.usuario, 'Nova')
+        criar_notificacao(self.admin, 'De outro usuário')
+        convite = AmbienteInvitations.objects.create(
+            ambiente=self.ambiente, inviter=self.admin, guest=self.usuario, token='tok-eventos'
+        )
+
+        eventos, cursor, tem_mais = buscar_eventos(self.usuario.pk, (antiga.pk, 0))
+        self.assertFalse(tem_mais)
+        self.assertEqual(cursor, (nova.pk, convite.pk))
+        self.assertEqual([nome for _, nome, _ in eventos], ['notificacao', 'convite'])
+        self.assertEqual(eventos[0][0], f'{nova.pk}-0')
+        self.assertEqual(eventos[0][2]['titulo'], 'Nova')
+        self.assertEqual(eventos[1][0], f'{nova.pk}-{convite.pk}')
+        self.assertEqual(eventos[1][2]['ambiente'], 'Amb Eventos')
+        self.assertEqual(buscar_eventos(self.usuario.pk, cursor)[0], [])
+
+    def test_novidades_le_todos_os_lotes(self):
+        for i in range(5):
+            criar_notificacao(self.usuario, f'N{i}')
+        with patch('ambiente.eventos.LIMITE_EVENTOS', 2):
+            eventos, cursor, contagens = novidades(self.usuario.pk, (0, 0))
+        self.assertEqual([nome for _, nome, _ in eventos], ['notificacao'] * 5 + ['contagem'])
+        self.assertEqual(contagens, {'convites': 0, 'notificacoes': 5})
+
+        eventos, _, _ = novidades(self.usuario.pk, cursor, contagens)
+        self.assertEqual(eventos, [])
+
+    def test_formatar_evento(self):
+        self.assertEqual(
+            formatar_evento('contagem', {'notificacoes': 1}, '3-0'),
+            'id: 3-0\nevent: contagem\ndata: {"notificacoes": 1}\n\n'
+        )
+
+    def test_publica_depois_do_commit(self):
+        barramento = BarramentoLocal()
+        with patch('ambiente.eventos.barramento', return_value=barramento), \
+                patch.object(barramento, 'publicar') as publicar_mock:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                criar_notificacao(self.usuario)
+                AmbienteInvitations.objects.create(
+                    ambiente=self.ambiente, inviter=self.admin, guest=self.usuario, token='tok-eventos'
+                )
+                publicar_mock.assert_not_called()
+        self.assertEqual(len(callbacks), 2)
+        publicar_mock.assert_any_call(self.usuario.pk, 'notificacao')
+        publicar_mock.assert_any_call(self.usuario.pk, 'convite')
+
+    def test_publicar_sem_usuarios(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            publicar([], 'notificacao')
+        self.assertEqual(callbacks, [])
+
+
+class BarramentoLocalTestCase(TestCase):
+
+    async def test_entrega_a_partir_de_outra_thread(self):
+        barramento = BarramentoLocal()
+        fila = barramento.assinar(1)
+        outra = barramento.assinar(2)
+
+        thread = threading.Thread(target=barramento.publicar, args=(1, 'notificacao'))
+        thread.start()
+        thread.join()
+
+        self.assertEqual(await asyncio.wait_for(fila.get(), 1), 'notificacao')
+        self.assertTrue(outra.empty())
+
+        barramento.cancelar(1, fila)
+        barramento.cancelar(2, outra)
+        self.assertEqual(barramento.assinantes(), 0)
+
+    async def test_fila_cheia_descarta_avisos(self):
+        barramento = BarramentoLocal()
+        fila = barramento.assinar(1)
+        for _ in range(fila.maxsize + 5):
+            barramento.publicar(1, 'notificacao')
+        await asyncio.sleep(0)
+        self.assertEqual(fila.qsize(), fila.maxsize)
+
+
+class StreamNotificacoesTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='stream_user', password='123456')
+
+    async def ler(self, conteudo):
+        chunk = await asyncio.wait_for(anext(conteudo), 5)
+        return chunk.decode() if isinstance(chunk, bytes) else chunk
+
+    async def test_exige_login(self):
+        response = await self.async_client.get(reverse('stream_notificacoes'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_sem_asgi_responde_204(self):
+        self.client.force_login(self.usuario)
+        response = self.client.get(reverse('stream_notificacoes'))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(response.streaming)
+
+    async def test_desligado_responde_204(self):
+        await self.async_client.aforce_login(self.usuario)
+        with self.settings(NOTIFICACOES_SSE=False):
+            response = await self.async_client.get(reverse('stream_notificacoes'))
+        self.assertEqual(response.status_code, 204)
+
+    async def test_envia_contagem_e_novas_notificacoes(self):
+        await self.async_client.aforce_login(self.usuario)
+        response = await self.async_client.get(reverse('stream_notificacoes'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        conteudo = aiter(response.streaming_content)
+        try:
+            self.assertTrue((await self.ler(conteudo)).startswith('retry:'))
+            self.assertIn('event: contagem', await self.ler(conteudo))
+
+            notificacao = await sync_to_async(criar_notificacao)(self.usuario, 'Ao vivo')
+            chunk = await self.ler(conteudo)
+            self.assertIn(f'id: {notificacao.pk}-0', chunk)
+            self.assertIn('event: notificacao', chunk)
+            self.assertIn('Ao vivo', chunk)
+            chunk = await self.ler(conteudo)
+            self.assertIn('event: contagem', chunk)
+            self.assertIn('"notificacoes": 1', chunk)
+        finally:
+            await conteudo.aclose()
+
+    async def test_reenvia_depois_do_last_event_id(self):
+        primeira = await sync_to_async(criar_notificacao)(self.usuario, 'Já vista')
+        await sync_to_async(criar_notificacao)(self.usuario, 'Perdida')
+        await self.async_client.aforce_login(self.usuario)
+        response = await self.async_client.get(
+            reverse('stream_notificacoes'), headers={'Last-Event-ID': f'{primeira.pk}-0'}
+        )
+        conteudo = aiter(response.streaming_content)
+        try:
+            await self.ler(conteudo)
+            chunk = await self.ler(conteudo)
+            self.assertIn('Perdida', chunk)
+            self.assertNotIn('Já vista', chunk)
+        finally:
+            await conteudo.aclose()
+
+    async def test_heartbeat(self):
+        await self.async_client.aforce_login(self.usuario)
+        with patch('ambiente.eventos.TEMPO_HEARTBEAT', 0.05):
+            response = await self.async_client.get(reverse('stream_notificacoes'))
+            conteudo = aiter(response.streaming_content)
+            try:
+                await self.ler(conteudo)
+                await self.ler(conteudo)
+                self.assertEqual(await self.ler(conteudo), ': heartbeat\n\n')
+            finally:
+                await conteudo.aclose()
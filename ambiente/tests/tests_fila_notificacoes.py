@@ -0,0 +1,120 @@
+from datetime import date, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from ambiente.fila_notificacoes import (
+    MAXIMO_TENTATIVAS,
+    enfileirar_alocacao_atividade,
+    estatisticas_fila,
+    processar_evento,
+    processar_lote,
+    reservar_eventos,
+)
+from ambiente.models import Ambiente, EventoNotificacao, Notificacao, Participante
+from atividade.models import Atividade
+
+
+class FilaNotificacoesTestCase(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='fila_admin', password='123456')
+        self.ambiente = Ambiente.objects.create(nome='Amb Fila', usuario_administrador=self.admin)
+        self.ambiente.usuarios_participantes.add(*[
+            User.objects.create_user(username=f'fila_{i}', password='123456') for i in range(3)
+        ])
+        self.participantes = list(Participante.objects.filter(ambiente=self.ambiente))
+        self.atividade = Atividade.objects.create(
+            descricao='Atividade fila', valor=Decimal('10'), ambiente=self.ambiente,
+            data_prevista=date.today(), hora_prevista=time(9, 0)
+        )
+
+    def test_processa_evento(self):
+        enfileirar_alocacao_atividade(self.atividade, self.participantes)
+        self.assertEqual(processar_lote(), (1, 0))
+        self.assertEqual(Notificacao.objects.filter(atividade=self.atividade).count(), 3)
+        evento = EventoNotificacao.objects.get()
+        self.assertEqual(evento.status, EventoNotificacao.STATUS_CONCLUIDO)
+        self.assertIsNotNone(evento.processado_em)
+
+    def test_evento_reservado_nao_e_reservado_de_novo(self):
+        enfileirar_alocacao_atividade(self.atividade, self.participantes)
+        self.assertEqual(len(reservar_eventos(10)), 1)
+        self.assertEqual(reservar_eventos(10), [])
+
+    def test_reserva_expirada_volta_para_fila(self):
+        enfileirar_alocacao_atividade(self.atividade, self.participantes)
+        reservar_eventos(10)
+        EventoNotificacao.objects.update(disponivel_em=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(len(reservar_eventos(10)), 1)
+
+    def test_reserva_perdida_desfaz_as_notificacoes(self):
+        enfileirar_alocacao_atividade(self.atividade, self.participantes)
+        evento, = reservar_eventos(10)
+        outra_reserva = evento.disponivel_em + timedelta(minutes=1)
+        # A reserva expirou e outro worker pegou o evento
+        EventoNotificacao.objects.filter(pk=evento.pk).update(disponivel_em=outra_reserva)
+
+        with self.assertLogs('ambiente.fila_notificacoes', 'WARNING'):
+            self.assertFalse(processar_evento(evento))
+        self.assertFalse(Notificacao.objects.exists())
+        evento.refresh_from_db()
+        self.assertEqual(evento.status, EventoNotificacao.STATUS_PROCESSANDO)
+        self.assertEqual(evento.disponivel_em, outra_reserva)
+        self.assertEqual(evento.erro, '')
+
+    def test_atividade_removida(self):
+        enfileirar_alocacao_atividade(self.atividade, self.participantes)
+        self.atividade.delete()
+        self.assertEqual(processar_lote(), (1, 0))
+        self.assertFalse(Notificacao.objects.exists())
+
+    @patch('ambiente.fila_notificacoes.notificar_alocacao_atividade', side_effect=RuntimeError('falhou'))
+    def test_falha_reagenda_com_backoff(self, _):
+        enfileirar_alocacao_atividade(self.atividade, self.participantes)
+        with self.assertLogs('ambiente.fila_notificacoes', 'ERROR'):
+            self.assertEqual(processar_lote(), (0, 1))
+        evento = EventoNotificacao.objects.get()
+        self.assertEqual(evento.status, EventoNotificacao.STATUS_PENDENTE)
+        self.assertEqual(evento.tentativas, 1)
+        self.assertGreater(evento.disponivel_em, timezone.now())
+        self.assertIn('falhou', evento.erro)
+        self.assertEqual(processar_lote(), (0, 0))
+
+    @patch('ambiente.fila_notificacoes.notificar_alocacao_atividade', side_effect=RuntimeError('falhou'))
+    def test_falha_definitiva(self, _):
+        evento = enfileirar_alocacao_atividade(self.atividade, self.participantes)
+        EventoNotificacao.objects.filter(pk=evento.pk).update(tentativas=MAXIMO_TENTATIVAS - 1)
+        with self.assertLogs('ambiente.fila_notificacoes', 'ERROR'):
+            processar_lote()
+        evento.refresh_from_db()
+        self.assertEqual(evento.status, EventoNotificacao.STATUS_FALHOU)
+        self.assertEqual(estatisticas_fila()['falhas'], 1)
+
+    def test_estatisticas(self):
+        self.assertEqual(estatisticas_fila(), {'pendentes': 0, 'falhas': 0, 'atraso': 0.0})
+        enfileirar_alocacao_atividade(self.atividade, self.participantes)
+        EventoNotificacao.objects.update(criado_em=timezone.now() - timedelta(minutes=1))
+        estado = estatisticas_fila()
+        self.assertEqual(estado['pendentes'], 1)
+        self.assertGreaterEqual(estado['atraso'], 60)
+
+    def test_comando_uma_vez(self):
+        enfileirar_alocacao_atividade(self.atividade, self.participantes)
+        enfileirar_alocacao_atividade(self.atividade, self.participantes[:1])
+        out = StringIO()
+        call_command('processar_notificacoes', uma_vez=True, workers=1, lote=1, stdout=out)
+        self.assertEqual(Notificacao.objects.count(), 4)
+        self.assertIn('fila: 0 pendente(s)', out.getvalue())
+
+    def test_comando_estatisticas(self):
+        enfileirar_alocacao_atividade(self.atividade, self.participantes)
+        out = StringIO()
+        call_command('processar_notificacoes', estatisticas=True, stdout=out)
+        self.assertIn('fila: 1 pendente(s)', out.getvalue())
+        self.assertFalse(Notificacao.objects.exists())
@@ -8,6 +8,7 @@ from ambiente.models import (
     AmbienteInvitations,
     Role,
     Participante,
+    PermissaoAtividade,
     Notificacao
 )
 
@@ -416,3 +417,144 @@ class AmbienteModelsAdicionaisTestCase(TestCase):
         c_id = c.id
         c.delete()
         self.assertFalse(AmbienteInvitations.objects.filter(id=c_id).exists())
+
+
+class ParticipantePermissoesTestCase(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='mascara_admin', password='123456')
+        self.user = User.objects.create_user(username='mascara_user', password='123456')
+        self.ambiente = Ambiente.objects.create(nome='Amb Máscara', usuario_administrador=self.admin)
+        self.leitor = Role.objects.get(ambiente=self.ambiente, nome=Role.LEITOR)
+        self.editor = Role.objects.get(ambiente=self.ambiente, nome=Role.EDITOR)
+        self.participante = Participante.objects.create(usuario=self.user, ambiente=self.ambiente, role=self.leitor)
+
+    def test_mascara_copiada_da_role(self):
+        self.assertEqual(self.participante.flags, PermissaoAtividade.VISUALIZAR)
+        self.assertTrue(self.participante.tem_permissao(PermissaoAtividade.VISUALIZAR))
+        self.assertFalse(self.participante.tem_permissao(PermissaoAtividade.CRIAR))
+
+    def test_troca_de_role(self):
+        self.participante.role = self.editor
+        self.participante.save(update_fields=['role'])
+        self.participante.refresh_from_db()
+        self.assertEqual(
+            self.participante.flags,
+            PermissaoAtividade.VISUALIZAR | PermissaoAtividade.CRIAR | PermissaoAtividade.EDITAR
+        )
+
+    def test_alteracao_da_role_propaga(self):
+        self.leitor.pode_deletar_atividades = True
+        self.leitor.save()
+        self.participante.refresh_from_db()
+        self.assertTrue(self.participante.tem_permissao(PermissaoAtividade.DELETAR))
+
+    def test_remocao_da_role_zera(self):
+        self.leitor.delete()
+        self.participante.refresh_from_db()
+        self.assertIsNone(self.participante.role)
+        self.assertEqual(self.participante.permissoes, 0)
+
+    def test_sem_role(self):
+        outro = User.objects.create_user(username='mascara_sem_role', password='123456')
+        participante = Participante.objects.create(usuario=outro, ambiente=self.ambiente)
+        self.assertEqual(participante.permissoes, 0)
+
+    def test_com_permissao(self):
+        outro = User.objects.create_user(username='mascara_editor', password='123456')
+        editor = Participante.objects.create(usuario=outro, ambiente=self.ambiente, role=self.editor)
+        self.assertEqual(list(Participante.objects.com_permissao(PermissaoAtividade.EDITAR)), [editor])
+        self.assertEqual(
+            Participante.objects.com_permissao(PermissaoAtividade.VISUALIZAR).count(), 2
+        )
+        self.assertFalse(Participante.objects.com_permissao(
+            PermissaoAtividade.EDITAR | PermissaoAtividade.DELETAR
+        ).exists())
+
+    def test_como_dicionario(self):
+        self.assertEqual(self.participante.flags.como_dicionario(), {
+            'pode_visualizar_atividades': True,
+            'pode_criar_atividades': False,
+            'pode_editar_atividades': False,
+            'pode_deletar_atividades': False,
+        })
+
+
+class ParticipanteSincronizacaoTestCase(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='sinc_admin', password='123456')
+        self.user = User.objects.create_user(username='sinc_user', password='123456')
+        self.user2 = User.objects.create_user(username='sinc_user2', password='123456')
+        self.ambiente = Ambiente.objects.create(nome='Amb Sinc', usuario_administrador=self.admin)
+        self.leitor = Role.objects.get(ambiente=self.ambiente, nome=Role.LEITOR)
+
+    def test_add_cria_participante_leitor(self):
+        self.ambiente.usuarios_participantes.add(self.user, self.user2)
+        participantes = Participante.objects.filter(ambiente=self.ambiente)
+        self.assertEqual(participantes.count(), 2)
+        for participante in participantes:
+            self.assertEqual(participante.role, self.leitor)
+            self.assertEqual(participante.flags, PermissaoAtividade.VISUALIZAR)
+
+    def test_add_nao_altera_participante_existente(self):
+        editor = Role.objects.get(ambiente=self.ambiente, nome=Role.EDITOR)
+        Participante.objects.create(usuario=self.user, ambiente=self.ambiente, role=editor)
+        self.ambiente.usuarios_participantes.add(self.user)
+        self.assertEqual(Participante.objects.get(usuario=self.user, ambiente=self.ambiente).role, editor)
+
+    def test_add_pelo_usuario(self):
+        outro = Ambiente.objects.create(nome='Amb Sinc 2', usuario_administrador=self.admin)
+        self.user.ambientes_participantes.add(self.ambiente, outro)
+        self.assertEqual(Participante.objects.filter(usuario=self.user).count(), 2)
+        self.assertEqual(
+            Participante.objects.get(usuario=self.user, ambiente=outro).role.ambiente, outro
+        )
+
+    def test_remove_preserva_participante_role_e_alocacoes(self):
+        from datetime import date, time
+        from atividade.models import Atividade
+
+        self.ambiente.usuarios_participantes.add(self.user, self.user2)
+        participante = Participante.objects.get(usuario=self.user, ambiente=self.ambiente)
+        participante.role = Role.objects.get(ambiente=self.ambiente, nome=Role.EDITOR)
+        participante.save()
+        atividade = Atividade.objects.create(
+            valor=10, ambiente=self.ambiente, data_prevista=date.today(), hora_prevista=time(10, 0)
+        )
+        atividade.participantes_alocados.add(participante)
+
+        self.ambiente.usuarios_participantes.remove(self.user)
+        self.assertEqual(Participante.objects.filter(ambiente=self.ambiente).count(), 2)
+        self.assertEqual(list(atividade.participantes_alocados.all()), [participante])
+
+        self.ambiente.usuarios_participantes.add(self.user)
+        self.assertEqual(Participante.objects.get(pk=participante.pk).role.nome, Role.EDITOR)
+
+    def test_clear_preserva_participantes(self):
+        self.ambiente.usuarios_participantes.add(self.user, self.user2)
+        self.ambiente.usuarios_participantes.clear()
+        self.assertEqual(Participante.objects.filter(ambiente=self.ambiente).count(), 2)
+
+    def test_clear_pelo_usuario(self):
+        self.user.ambientes_participantes.add(self.ambiente)
+        self.user.ambientes_participantes.clear()
+        self.assertTrue(Participante.objects.filter(usuario=self.user).exists())
+        self.assertFalse(self.user.ambientes_participantes.exists())
+
+    def test_migration_cria_participantes_faltantes(self):
+        from importlib import import_module
+        from django.apps import apps
+        migration = import_module('ambiente.migrations.0012_sincronizar_participantes')
+
+        self.ambiente.usuarios_participantes.add(self.user, self.user2)
+        editor = Role.objects.get(ambiente=self.ambiente, nome=Role.EDITOR)
+        Participante.objects.filter(usuario=self.user).update(role=editor)
+        # Simula um membro anterior ao signal
+        Participante.objects.filter(usuario=self.user2).delete()
+
+        migration.criar_participantes_faltantes(apps, None)
+        self.assertEqual(Participante.objects.get(usuario=self.user).role, editor)
+        novo = Participante.objects.get(usuario=self.user2, ambiente=self.ambiente)
+        self.assertEqual(novo.role, self.leitor)
+        self.assertEqual(novo.flags, PermissaoAtividade.VISUALIZAR)
@@ -0,0 +1,265 @@
+from datetime import date, time
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ambiente.contadores import ler_nao_lidas, reconciliar_contadores
+from ambiente.models import Ambiente, ContadorNotificacoes, Notificacao, Participante
+from ambiente.notificacoes import criar_notificacoes, notificar_alocacao_atividade, resumir_descricao
+from atividade.models import Atividade
+
+
+class NotificacoesServiceTestCase(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='notif_admin', password='123456')
+        self.usuarios = [User.objects.create_user(username=f'notif_{i}', password='123456') for i in range(4)]
+        self.ambiente = Ambiente.objects.create(nome='Amb Notif', usuario_administrador=self.admin)
+        self.ambiente.usuarios_participantes.add(*self.usuarios)
+        self.atividade = Atividade.objects.create(
+            descricao='x' * 60, valor=Decimal('10'), ambiente=self.ambiente,
+            data_prevista=date.today(), hora_prevista=time(9, 0)
+        )
+
+    def test_criar_notificacoes_um_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            criadas = criar_notificacoes(
+                self.usuarios, tipo=Notificacao.TIPO_ALOCACAO_ATIVIDADE, titulo='T', mensagem='M'
+            )
+        inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "ambiente_notificacao"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(len(criadas), 4)
+        self.assertEqual(Notificacao.objects.count(), 4)
+
+    def test_criar_notificacoes_contador_existente_um_update(self):
+        criar_notificacoes(self.usuarios, tipo=Notificacao.TIPO_ALOCACAO_ATIVIDADE, titulo='T', mensagem='M')
+        with CaptureQueriesContext(connection) as queries:
+            criar_notificacoes(self.usuarios, tipo=Notificacao.TIPO_ALOCACAO_ATIVIDADE, titulo='T', mensagem='M')
+        updates = [q for q in queries if q['sql'].startswith('UPDATE "ambiente_contadornotificacoes"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(ler_nao_lidas(self.usuarios[0].id), 2)
+
+    def test_criar_notificacoes_aceita_ids_e_remove_repetidos(self):
+        ids = [self.usuarios[0].id, self.usuarios[0].id, self.usuarios[1]]
+        criar_notificacoes(ids, tipo=Notificacao.TIPO_ALOCACAO_ATIVIDADE, titulo='T', mensagem='M')
+        self.assertEqual(Notificacao.objects.count(), 2)
+
+    def test_criar_notificacoes_vazio(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(criar_notificacoes([], tipo='x', titulo='T', mensagem='M'), [])
+
+    def test_notificar_alocacao(self):
+        participantes = list(Participante.objects.filter(ambiente=self.ambiente))
+        ContadorNotificacoes.objects.bulk_create([ContadorNotificacoes(usuario=u) for u in self.usuarios])
+        # savepoint, INSERT das notificações, UPDATE dos contadores e release
+        with self.assertNumQueries(4):
+            notificar_alocacao_atividade(self.atividade, participantes)
+        notificacao = Notificacao.objects.get(usuario=self.usuarios[0])
+        self.assertEqual(notificacao.atividade, self.atividade)
+        self.assertEqual(notificacao.ambiente, self.ambiente)
+        self.assertIn('x' * 50 + '...', notificacao.mensagem)
+        self.assertEqual(notificacao.link, reverse('detalhe_atividade', kwargs={'atividade_id': self.atividade.id}))
+
+    def test_resumir_descricao(self):
+        self.assertEqual(resumir_descricao(''), 'Sem descrição')
+        self.assertEqual(resumir_descricao('curta'), 'curta')
+
+
+class ContadorNotificacoesTestCase(TestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='contador_user', password='123456')
+        self.outro = User.objects.create_user(username='contador_outro', password='123456')
+
+    def criar(self, usuario=None, **kwargs):
+        return Notificacao.objects.create(
+            usuario=usuario or self.usuario, tipo=Notificacao.TIPO_ALOCACAO_ATIVIDADE,
+            titulo='T', mensagem='M', **kwargs
+        )
+
+    def test_criacao_incrementa(self):
+        self.criar()
+        self.criar()
+        self.criar(lida=True)
+        self.assertEqual(ler_nao_lidas(self.usuario.id), 2)
+        self.assertEqual(ler_nao_lidas(self.outro.id), 0)
+
+    def test_marcar_lida_e_nao_lida(self):
+        notificacao = self.criar()
+        notificacao.lida = True
+        notificacao.save()
+        self.assertEqual(ler_nao_lidas(self.usuario.id), 0)
+        notificacao.save()
+        self.assertEqual(ler_nao_lidas(self.usuario.id), 0)
+
+        recarregada = Notificacao.objects.get(pk=notificacao.pk)
+        recarregada.lida = False
+        recarregada.save()
+        self.assertEqual(ler_nao_lidas(self.usuario.id), 1)
+
+    def test_instancia_nao_carregada_do_banco(self):
+        notificacao = self.criar()
+        copia = Notificacao(pk=notificacao.pk, usuario=self.usuario, tipo=notificacao.tipo,
+                            titulo='T', mensagem='M', lida=True, criada_em=notificacao.criada_em)
+        copia.save()
+        self.assertEqual(ler_nao_lidas(self.usuario.id), 0)
+
+    def test_remocao_decrementa(self):
+        nao_lida = self.criar()
+        lida = self.criar(lida=True)
+        lida.delete()
+        self.assertEqual(ler_nao_lidas(self.usuario.id), 1)
+        nao_lida.delete()
+        self.assertEqual(ler_nao_lidas(self.usuario.id), 0)
+
+    def test_nao_fica_negativo(self):
+        self.criar()
+        ContadorNotificacoes.objects.filter(pk=self.usuario.pk).update(nao_lidas=0)
+        Notificacao.objects.get(usuario=self.usuario).delete()
+        self.assertEqual(ler_nao_lidas(self.usuario.id), 0)
+
+    def test_marcar_todas_lidas(self):
+        for _ in range(3):
+            self.criar()
+        self.client.login(username='contador_user', password='123456')
+        self.client.post(reverse('marcar_todas_lidas'))
+        self.assertEqual(ler_nao_lidas(self.usuario.id), 0)
+
+        response = self.client.get(reverse('contagem_notificacoes'))
+        self.assertEqual(response.json()['count'], 0)
+
+    def test_marcar_a_mesma_notificacao_duas_vezes(self):
+        notificacao = self.criar()
+        self.criar()
+        self.client.login(username='contador_user', password='123456')
+        url = reverse('marcar_notificacao_lida', args=[notificacao.id])
+        self.client.post(url)
+        self.client.post(url)
+        self.assertEqual(ler_nao_lidas(self.usuario.id), 1)
+        self.assertTrue(Notificacao.objects.get(pk=notificacao.pk).lida)
+
+    def test_marcar_lida_concorrente_desconta_uma_vez(self):
+        from ambiente.contadores import ajustar_nao_lidas
+        from django.shortcuts import get_object_or_404
+
+        notificacao = self.criar()
+        self.criar()
+
+        def outra_aba_marca_antes(*args, **kwargs):
+            carregada = get_object_or_404(*args, **kwargs)
+            # Outra requisição marca a mesma notificação depois da leitura desta
+            Notificacao.objects.filter(pk=notificacao.pk, lida=False).update(lida=True)
+            ajustar_nao_lidas({self.usuario.pk: -1})
+            return carregada
+
+        self.client.login(username='contador_user', password='123456')
+        with patch('ambiente.views.get_object_or_404', side_effect=outra_aba_marca_antes):
+            self.client.post(reverse('marcar_notificacao_lida', args=[notificacao.id]))
+        self.assertEqual(ler_nao_lidas(self.usuario.id), 1)
+
+    def test_contagem_notificacoes_busca_pela_chave(self):
+        self.criar()
+        self.client.login(username='contador_user', password='123456')
+        response = self.client.get(reverse('contagem_notificacoes'))
+        self.assertEqual(response.json()['count'], 1)
+
+    def test_reconciliar_corrige_divergencias(self):
+        self.criar()
+        self.criar()
+        self.criar(usuario=self.outro)
+        ContadorNotificacoes.objects.filter(pk=self.usuario.pk).update(nao_lidas=7)
+        ContadorNotificacoes.objects.filter(pk=self.outro.pk).delete()
+        Notificacao.objects.filter(usuario=self.usuario).update(lida=True)
+
+        self.assertEqual(reconciliar_contadores(batch_size=1), 2)
+        self.assertEqual(ler_nao_lidas(self.usuario.id), 0)
+        self.assertEqual(ler_nao_lidas(self.outro.id), 1)
+        self.assertEqual(reconciliar_contadores(), 0)
+
+
+class CaixaNotificacoesTestCase(TestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='caixa_user', password='123456')
+        self.outro = User.objects.create_user(username='caixa_outro', password='123456')
+        self.notificacoes = [
+            Notificacao.objects.create(
+                usuario=self.usuario, tipo=Notificacao.TIPO_ALOCACAO_ATIVIDADE, titulo=f'Notif {i}', mensagem='M'
+            )
+            for i in range(5)
+        ]
+        self.client.login(username='caixa_user', password='123456')
+
+    def titulos(self, response):
+        return [notificacao.titulo for notificacao in response.context['notificacoes']]
+
+    def test_primeira_pagina(self):
+        response = self.client.get(reverse('notificacoes'), {'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'ambiente/notificacoes.html')
+        self.assertEqual(self.titulos(response), ['Notif 4', 'Notif 3'])
+        self.assertEqual(response.context['nao_lidas_count'], 5)
+        self.assertTrue(response.context['pagina'].tem_proxima)
+
+    def test_paginas_seguintes_em_fragmento(self):
+        # Mesma criada_em para todas: o desempate é feito pelo id
+        Notificacao.objects.filter(usuario=self.usuario).update(criada_em=self.notificacoes[0].criada_em)
+        vistos = []
+        cursor = None
+        while True:
+            parametros = {'page_size': 2, 'parcial': 1}
+            if cursor:
+                parametros['cursor'] = cursor
+            response = self.client.get(reverse('notificacoes'), parametros)
+            self.assertTemplateNotUsed(response, 'global/base.html')
+            vistos += self.titulos(response)
+            cursor = response.context['pagina'].proximo_cursor
+            if cursor is None:
+                break
+            self.assertContains(response, 'inbox-sentinela')
+        self.assertEqual(vistos, [f'Notif {i}' for i in range(4, -1, -1)])
+
+    def test_filtro_nao_lidas(self):
+        Notificacao.objects.filter(pk=self.notificacoes[4].pk).update(lida=True)
+        response = self.client.get(reverse('notificacoes'), {'filtro': 'nao_lidas'})
+        self.assertEqual(self.titulos(response), ['Notif 3', 'Notif 2', 'Notif 1', 'Notif 0'])
+
+    def test_cursor_invalido_volta_para_o_inicio(self):
+        response = self.client.get(reverse('notificacoes'), {'cursor': 'invalido', 'page_size': 1})
+        self.assertEqual(self.titulos(response), ['Notif 4'])
+
+    def test_nao_lista_notificacoes_de_outros(self):
+        Notificacao.objects.create(usuario=self.outro, tipo=Notificacao.TIPO_ALOCACAO_ATIVIDADE, titulo='Outro', mensagem='M')
+        response = self.client.get(reverse('notificacoes'))
+        self.assertNotIn('Outro', self.titulos(response))
+
+    def test_marcar_lidas_um_update(self):
+        alheia = Notificacao.objects.create(
+            usuario=self.outro, tipo=Notificacao.TIPO_ALOCACAO_ATIVIDADE, titulo='Outro', mensagem='M'
+        )
+        ids = [self.notificacoes[0].pk, self.notificacoes[1].pk, alheia.pk]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse('marcar_notificacoes_lidas'), data={'ids': ids}, content_type='application/json'
+            )
+        self.assertEqual(response.json(), {'success': True, 'marcadas': 2})
+        updates = [q for q in queries if q['sql'].startswith('UPDATE "ambiente_notificacao"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Notificacao.objects.filter(usuario=self.usuario, lida=True).count(), 2)
+        self.assertFalse(Notificacao.objects.get(pk=alheia.pk).lida)
+        self.assertEqual(ler_nao_lidas(self.usuario.pk), 3)
+        self.assertEqual(ler_nao_lidas(self.outro.pk), 1)
+
+    def test_marcar_lidas_payload_invalido(self):
+        for corpo in ('{}', '{"ids": "abc"}', 'nao-json', '{"ids": [1, "x"]}'):
+            response = self.client.post(reverse('marcar_notificacoes_lidas'), data=corpo, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_marcar_lidas_exige_post(self):
+        response = self.client.get(reverse('marcar_notificacoes_lidas'))
+        self.assertEqual(response.status_code, 405)
@@ -0,0 +1,136 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory
+
+from ambiente.models import Ambiente, Participante, Role
+from ambiente.permissoes import PodeAcessarAmbiente, permissoes_atividades, resolver_permissoes
+
+
+class ResolverPermissoesTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='perm_admin', password='123456')
+        self.leitor = User.objects.create_user(username='perm_leitor', password='123456')
+        self.estranho = User.objects.create_user(username='perm_estranho', password='123456')
+        self.ambiente = Ambiente.objects.create(nome='Amb Permissões', usuario_administrador=self.admin)
+        self.ambiente.usuarios_participantes.add(self.leitor)
+        self.role_leitor = Role.objects.get(ambiente=self.ambiente, nome=Role.LEITOR)
+        self.participante = Participante.objects.get(usuario=self.leitor, ambiente=self.ambiente)
+
+    def test_administrador_sem_consulta(self):
+        with self.assertNumQueries(0):
+            resultado = resolver_permissoes(self.admin, self.ambiente)
+        self.assertTrue(resultado['acesso'])
+        self.assertTrue(resultado['pode_deletar_atividades'])
+
+    def test_administrador_por_id(self):
+        resultado = resolver_permissoes(self.admin, self.ambiente.id)
+        self.assertTrue(resultado['acesso'])
+        self.assertTrue(resultado['pode_criar_atividades'])
+
+    def test_leitor(self):
+        self.assertEqual(permissoes_atividades(self.leitor, self.ambiente), {
+            'pode_visualizar_atividades': True,
+            'pode_criar_atividades': False,
+            'pode_editar_atividades': False,
+            'pode_deletar_atividades': False,
+        })
+        self.assertTrue(resolver_permissoes(self.leitor, self.ambiente)['acesso'])
+
+    def test_usuario_de_fora(self):
+        resultado = resolver_permissoes(self.estranho, self.ambiente)
+        self.assertTrue(resultado['existe'])
+        self.assertFalse(resultado['acesso'])
+        self.assertFalse(resultado['pode_visualizar_atividades'])
+
+    def test_ambiente_inexistente(self):
+        self.assertFalse(resolver_permissoes(self.leitor, 99999)['existe'])
+
+    def test_uma_consulta_depois_cache(self):
+        with self.assertNumQueries(1):
+            resolver_permissoes(self.leitor, self.ambiente)
+        with self.assertNumQueries(0):
+            resolver_permissoes(self.leitor, self.ambiente)
+
+    def test_memo_por_requisicao(self):
+        request = APIRequestFactory().get('/')
+        resolver_permissoes(self.leitor, self.ambiente, request)
+        cache.clear()
+        with self.assertNumQueries(0):
+            resolver_permissoes(self.leitor, self.ambiente, request)
+
+    def test_invalida_ao_alterar_role(self):
+        resolver_permissoes(self.leitor, self.ambiente)
+        self.role_leitor.pode_criar_atividades = True
+        self.role_leitor.save()
+        self.assertTrue(resolver_permissoes(self.leitor, self.ambiente)['pode_criar_atividades'])
+
+    def test_invalida_ao_trocar_role_do_participante(self):
+        resolver_permissoes(self.leitor, self.ambiente)
+        self.participante.role = Role.objects.get(ambiente=self.ambiente, nome=Role.EDITOR)
+        self.participante.save()
+        self.assertTrue(resolver_permissoes(self.leitor, self.ambiente)['pode_editar_atividades'])
+
+    def test_invalida_ao_remover_participante(self):
+        self.assertTrue(resolver_permissoes(self.leitor, self.ambiente)['acesso'])
+        self.ambiente.usuarios_participantes.remove(self.leitor)
+        self.assertFalse(resolver_permissoes(self.leitor, self.ambiente)['acesso'])
+
+    def test_invalida_pelo_lado_do_usuario(self):
+        self.assertFalse(resolver_permissoes(self.estranho, self.ambiente)['acesso'])
+        self.estranho.ambientes_participantes.add(self.ambiente)
+        self.assertTrue(resolver_permissoes(self.estranho, self.ambiente)['acesso'])
+        self.estranho.ambientes_participantes.clear()
+        self.assertFalse(resolver_permissoes(self.estranho, self.ambiente)['acesso'])
+
+    def test_invalida_ao_trocar_administrador(self):
+        self.assertFalse(resolver_permissoes(self.estranho, self.ambiente.id)['acesso'])
+        self.ambiente.usuario_administrador = self.estranho
+        self.ambiente.save()
+        self.assertTrue(resolver_permissoes(self.estranho, self.ambiente.id)['acesso'])
+
+    def test_view_html_sem_consultas_de_permissao_repetidas(self):
+        self.client.login(username='perm_leitor', password='123456')
+        url = reverse('atividades_por_ambiente', kwargs={'ambiente_id': self.ambiente.id})
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('"ambiente_participante"' in c['sql'] for c in consultas.captured_queries))
+
+
+class PodeAcessarAmbienteTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.admin = User.objects.create_user(username='drf_admin', password='123456')
+        self.leitor = User.objects.create_user(username='drf_leitor', password='123456')
+        self.ambiente = Ambiente.objects.create(nome='Amb DRF', usuario_administrador=self.admin)
+        self.ambiente.usuarios_participantes.add(self.leitor)
+
+    def verificar(self, metodo, user):
+        request = getattr(self.factory, metodo)('/')
+        request.user = user
+        view = type('View', (), {'kwargs': {'ambiente_id': str(self.ambiente.id)}})()
+        return PodeAcessarAmbiente().has_permission(request, view)
+
+    def test_leitor_pode_ler(self):
+        self.assertTrue(self.verificar('get', self.leitor))
+
+    def test_leitor_nao_pode_criar(self):
+        self.assertFalse(self.verificar('post', self.leitor))
+
+    def test_administrador_pode_deletar(self):
+        self.assertTrue(self.verificar('delete', self.admin))
+
+    def test_calendario_usuario_de_fora(self):
+        User.objects.create_user(username='drf_estranho', password='123456')
+        self.client.login(username='drf_estranho', password='123456')
+        url = reverse('ambiente-calendario-list', kwargs={'ambiente_id': self.ambiente.id})
+        self.assertEqual(self.client.get(url).status_code, 403)
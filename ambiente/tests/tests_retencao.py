@@ -0,0 +1,116 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from ambiente.contadores import ajustar_nao_lidas, ler_nao_lidas
+from ambiente.models import EventoNotificacao, Notificacao
+from ambiente.retencao import apagar_notificacoes, purgar_eventos_antigos, purgar_excedentes, purgar_lidas_antigas
+
+
+class RetencaoNotificacoesTestCase(TestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='retencao_user', password='123456')
+        self.outro = User.objects.create_user(username='retencao_outro', password='123456')
+
+    def criar(self, usuario=None, dias=0, lida=False, titulo='T'):
+        notificacao = Notificacao.objects.create(
+            usuario=usuario or self.usuario, tipo=Notificacao.TIPO_ALOCACAO_ATIVIDADE,
+            titulo=titulo, mensagem='M', lida=lida
+        )
+        if dias:
+            Notificacao.objects.filter(pk=notificacao.pk).update(criada_em=timezone.now() - timedelta(days=dias))
+        return notificacao
+
+    def test_apagar_desconta_nao_lidas(self):
+        nao_lida = self.criar()
+        lida = self.criar(lida=True)
+        alheia = self.criar(usuario=self.outro)
+        self.assertEqual(apagar_notificacoes([nao_lida.pk, lida.pk, alheia.pk]), 3)
+        self.assertFalse(Notificacao.objects.exists())
+        self.assertEqual(ler_nao_lidas(self.usuario.pk), 0)
+        self.assertEqual(ler_nao_lidas(self.outro.pk), 0)
+        self.assertEqual(apagar_notificacoes([]), 0)
+
+    def test_apagar_sem_returning(self):
+        nao_lida = self.criar()
+        self.criar()
+        lida = self.criar(lida=True)
+        with patch.object(connection.features, 'can_return_columns_from_insert', False):
+            self.assertEqual(apagar_notificacoes([nao_lida.pk, lida.pk]), 2)
+        self.assertEqual(ler_nao_lidas(self.usuario.pk), 1)
+
+    def test_desconta_o_estado_no_momento_do_delete(self):
+        notificacao = self.criar()
+        # Lida depois que os ids foram selecionados para o lote
+        Notificacao.objects.filter(pk=notificacao.pk).update(lida=True)
+        ajustar_nao_lidas({self.usuario.pk: -1})
+        self.assertEqual(apagar_notificacoes([notificacao.pk]), 1)
+        self.assertEqual(ler_nao_lidas(self.usuario.pk), 0)
+        self.assertEqual(apagar_notificacoes([notificacao.pk]), 0)
+
+    def test_lidas_antigas(self):
+        antigas = [self.criar(dias=100, lida=True) for _ in range(5)]
+        recente = self.criar(dias=10, lida=True)
+        nao_lida_antiga = self.criar(dias=100)
+
+        lotes = list(purgar_lidas_antigas(dias=90, batch_size=2, pausa=0))
+        self.assertEqual(lotes, [2, 2, 1])
+        restantes = set(Notificacao.objects.values_list('id', flat=True))
+        self.assertEqual(restantes, {recente.pk, nao_lida_antiga.pk})
+        self.assertFalse(restantes & {notificacao.pk for notificacao in antigas})
+
+    def test_lidas_antigas_desativada(self):
+        self.criar(dias=100, lida=True)
+        self.assertEqual(list(purgar_lidas_antigas(dias=0)), [])
+        self.assertEqual(Notificacao.objects.count(), 1)
+
+    def test_excedentes_mantem_as_mais_recentes(self):
+        for i in range(6):
+            self.criar(dias=10 - i, titulo=f'N{i}')
+        self.criar(usuario=self.outro)
+
+        lotes = list(purgar_excedentes(maximo=2, batch_size=3, pausa=0))
+        self.assertEqual(lotes, [3, 1])
+        self.assertEqual(
+            list(Notificacao.objects.filter(usuario=self.usuario).order_by('criada_em').values_list('titulo', flat=True)),
+            ['N4', 'N5']
+        )
+        self.assertEqual(Notificacao.objects.filter(usuario=self.outro).count(), 1)
+        self.assertEqual(ler_nao_lidas(self.usuario.pk), 2)
+
+    def test_eventos_antigos(self):
+        def evento(status, dias):
+            evento = EventoNotificacao.objects.create(tipo=EventoNotificacao.TIPO_ALOCACAO_ATIVIDADE, status=status)
+            EventoNotificacao.objects.filter(pk=evento.pk).update(criado_em=timezone.now() - timedelta(days=dias))
+            return evento.pk
+
+        for _ in range(2):
+            evento(EventoNotificacao.STATUS_CONCLUIDO, 40)
+        evento(EventoNotificacao.STATUS_FALHOU, 40)
+        mantidos = {
+            evento(EventoNotificacao.STATUS_CONCLUIDO, 10),
+            evento(EventoNotificacao.STATUS_PENDENTE, 40),
+            evento(EventoNotificacao.STATUS_PROCESSANDO, 40),
+        }
+        self.assertEqual(list(purgar_eventos_antigos(dias=0)), [])
+        self.assertEqual(list(purgar_eventos_antigos(dias=30, batch_size=2, pausa=0)), [2, 1])
+        self.assertEqual(set(EventoNotificacao.objects.values_list('id', flat=True)), mantidos)
+
+    def test_comando_relata_lotes(self):
+        for _ in range(3):
+            self.criar(dias=100, lida=True)
+        out = StringIO()
+        call_command('purgar_notificacoes', dias_lidas=90, maximo_por_usuario=0,
+                     batch_size=2, pausa=0, stdout=out)
+        saida = out.getvalue()
+        self.assertIn('lote 1, 2 removida(s)', saida)
+        self.assertIn('lote 2, 1 removida(s)', saida)
+        self.assertIn('Notificações removidas: 3.', saida)
+        self.assertIn('Eventos de notificação removidos: 0.', saida)
@@ -1,9 +1,13 @@
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.urls import reverse
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from rest_framework import status
 import json
+from datetime import date, time
+from decimal import Decimal
 
 from ambiente.models import (
     Ambiente,
@@ -12,6 +16,7 @@ from ambiente.models import (
     Role,
     Notificacao
 )
+from atividade.models import Atividade
 
 
 class AmbienteViewsTestCase(TestCase):
@@ -76,6 +81,42 @@ class AmbienteViewsTestCase(TestCase):
         response = self.client.get(reverse('lista_ambientes'))
         self.assertEqual(response.status_code, 200)
 
+    def test_lista_ambientes_contagens_status(self):
+        hoje = date.today()
+        for status_atividade in ['Pendente', 'Pendente', 'Concluído', 'Atrasado']:
+            Atividade.objects.create(
+                valor=Decimal('10'), ambiente=self.ambiente, status=status_atividade,
+                data_prevista=hoje, hora_prevista=time(10, 0)
+            )
+        self.client.login(username='ambiente_admin_test', password='123456')
+        response = self.client.get(reverse('lista_ambientes'))
+        ambiente = next(a for a in response.context['ambientes'] if a.id == self.ambiente.id)
+        self.assertEqual(ambiente.num_atividades, 4)
+        self.assertEqual(ambiente.num_pendentes, 2)
+        self.assertEqual(ambiente.num_concluidas, 1)
+        self.assertEqual(ambiente.num_atrasadas, 1)
+
+    def test_lista_ambientes_sem_duplicar_nem_multiplicar_contagens(self):
+        outros = [User.objects.create_user(username=f'lista_outro_{i}', password='123') for i in range(3)]
+        # Administrador que também está entre vários participantes
+        self.ambiente.usuarios_participantes.add(self.admin, self.user, *outros)
+        participado = Ambiente.objects.create(nome='Participado', usuario_administrador=outros[0])
+        participado.usuarios_participantes.add(self.admin, outros[1])
+        Ambiente.objects.create(nome='Alheio', usuario_administrador=outros[0])
+        for _ in range(2):
+            Atividade.objects.create(
+                valor=Decimal('10'), ambiente=self.ambiente, status='Pendente',
+                data_prevista=date.today(), hora_prevista=time(10, 0)
+            )
+
+        self.client.login(username='ambiente_admin_test', password='123456')
+        response = self.client.get(reverse('lista_ambientes'))
+        ambientes = list(response.context['ambientes'])
+        self.assertEqual([ambiente.nome for ambiente in ambientes], ['Ambiente Teste', 'Participado'])
+        self.assertEqual(ambientes[0].num_atividades, 2)
+        self.assertEqual(ambientes[0].num_pendentes, 2)
+        self.assertEqual(ambientes[1].num_atividades, 0)
+
     # =======================
     # AmbienteView - Criar
     # =======================
@@ -185,6 +226,17 @@ class AmbienteViewsTestCase(TestCase):
         response = self.client.get(reverse('configurar_ambiente', args=[self.ambiente.id]))
         self.assertIn('ambiente', response.context)
 
+    def test_configurar_ambiente_lista_apenas_membros_atuais(self):
+        membro = User.objects.create_user(username='config_membro', password='123456')
+        removido = User.objects.create_user(username='config_removido', password='123456')
+        self.ambiente.usuarios_participantes.add(membro, removido)
+        self.ambiente.usuarios_participantes.remove(removido)
+        self.client.login(username='ambiente_admin_test', password='123456')
+        response = self.client.get(reverse('configurar_ambiente', args=[self.ambiente.id]))
+        usuarios = [dados['user'] for dados in response.context['participantes_data']]
+        self.assertIn(membro, usuarios)
+        self.assertNotIn(removido, usuarios)
+
     def test_configurar_ambiente_sem_login(self):
         response = self.client.get(reverse('configurar_ambiente', args=[self.ambiente.id]))
         self.assertEqual(response.status_code, 302)
@@ -392,3 +444,39 @@ class AmbienteViewsAdicionaisTestCase(TestCase):
     def test_marcar_lida_sem_login(self):
         response = self.client.post(reverse('marcar_todas_lidas'))
         self.assertEqual(response.status_code, 302)
+
+
+class ConfigurarAmbienteSemEscritaTestCase(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='config_admin', password='123456')
+        self.ambiente = Ambiente.objects.create(nome='Amb Config', usuario_administrador=self.admin)
+        self.client.login(username='config_admin', password='123456')
+        self.url = reverse('configurar_ambiente', args=[self.ambiente.id])
+
+    def adicionar_usuarios(self, quantidade, inicio=0):
+        self.ambiente.usuarios_participantes.add(*[
+            User.objects.create_user(username=f'config_user_{i}', password='123456')
+            for i in range(inicio, inicio + quantidade)
+        ])
+
+    def test_get_sem_escritas(self):
+        self.adicionar_usuarios(3)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['participantes_data']), 3)
+        self.assertFalse(any(
+            consulta['sql'].startswith(('INSERT', 'UPDATE')) and 'ambiente_participante' in consulta['sql']
+            for consulta in consultas.captured_queries
+        ))
+
+    def test_consultas_constantes(self):
+        self.adicionar_usuarios(2)
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as poucos:
+            self.client.get(self.url)
+        self.adicionar_usuarios(6, inicio=2)
+        with CaptureQueriesContext(connection) as muitos:
+            self.client.get(self.url)
+        self.assertEqual(len(poucos), len(muitos))
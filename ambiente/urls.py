@@ -1,7 +1,7 @@
 from .views import (
     AmbienteView, AmbienteInvitationViewSet, editar_permissoes_participante, 
     obter_permissoes_participante, listar_notificacoes, marcar_notificacao_lida,
-    marcar_todas_lidas, contagem_notificacoes
+    marcar_todas_lidas, marcar_notificacoes_lidas, contagem_notificacoes, stream_notificacoes
 )
 from django.urls import include, path
 
@@ -33,5 +33,7 @@ urlpatterns = [
     path('notificacoes/', listar_notificacoes, name='notificacoes'),
     path('notificacoes/<int:notificacao_id>/ler/', marcar_notificacao_lida, name='marcar_notificacao_lida'),
     path('notificacoes/marcar-todas-lidas/', marcar_todas_lidas, name='marcar_todas_lidas'),
+    path('notificacoes/marcar-lidas/', marcar_notificacoes_lidas, name='marcar_notificacoes_lidas'),
     path('notificacoes/contagem/', contagem_notificacoes, name='contagem_notificacoes'),
+    path('notificacoes/stream/', stream_notificacoes, name='stream_notificacoes'),
 ]
\ No newline at end of file
@@ -4,7 +4,7 @@ from django.contrib.auth.models import User
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views import View
 from django.views.generic import DetailView, CreateView
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
@@ -14,7 +14,12 @@ import secrets
 from ambiente.forms import AmbienteForm, SendInvitationForm
 from ambiente.serializers import AmbienteInvitationSerializer
 from ambiente.models import Ambiente, AmbienteInvitations, Participante, Role
-from django.db.models import Count, Q
+from ambiente.contadores import ajustar_nao_lidas, ler_nao_lidas
+from ambiente.dashboard import ambientes_do_dashboard
+from ambiente.eventos import fluxo_eventos, sse_disponivel
+from ambiente.paginacao import paginar_notificacoes
+from ambiente.permissoes import resolver_permissoes
+from django.db import transaction
 from django.contrib.auth.decorators import login_required
 import json
 # Create your views here.
@@ -25,14 +30,7 @@ class AmbienteView:
         # Filtrar apenas ambientes onde o usuário é administrador OU participante
         invitations = AmbienteInvitations.objects.filter(guest=request.user, accepted=False)
 
-        ambientes = Ambiente.objects.filter(
-            Q(usuario_administrador=request.user) | Q(usuarios_participantes=request.user)
-        ).distinct().annotate(
-            num_atividades=Count('atividade'),
-            num_pendentes=Count('atividade', filter=Q(atividade__status='Pendente')),
-            num_concluidas=Count('atividade', filter=Q(atividade__status='Concluído')),
-            num_atrasadas=Count('atividade', filter=Q(atividade__status='Atrasado'))
-        )
+        ambientes = ambientes_do_dashboard(request.user)
         form = AmbienteForm()
         return render(request, 'ambiente/home.html', {'ambientes': ambientes, 'invitations': invitations, 'form': form})
     
@@ -40,12 +38,6 @@ class AmbienteView:
     def criar_ambiente(request):
         if request.method == 'POST':
             form = AmbienteForm(request.POST)
-            ambientes = Ambiente.objects.annotate(
-                num_atividades=Count('atividade'),
-                num_pendentes=Count('atividade', filter=Q(atividade__status='Pendente')),
-                num_concluidas=Count('atividade', filter=Q(atividade__status='Concluído')),
-                num_atrasadas=Count('atividade', filter=Q(atividade__status='Atrasado'))
-            )
             if form.is_valid():
                 ambiente = form.save(commit=False)
                 ambiente.usuario_administrador = request.user
@@ -53,6 +45,7 @@ class AmbienteView:
                 return redirect('lista_ambientes')
             else:
                 # Renderiza home.html com o form preenchido e erros
+                ambientes = ambientes_do_dashboard(request.user)
                 return render(request, 'ambiente/home.html', {'ambientes': ambientes, 'form': form})
         # Se acessar diretamente, redireciona para lista
         return redirect('lista_ambientes')
@@ -62,17 +55,12 @@ class AmbienteView:
         ambiente = Ambiente.objects.get(id=ambiente_id)
         if request.method == 'POST':
             form = AmbienteForm(request.POST, instance=ambiente)
-            ambientes = Ambiente.objects.annotate(
-                num_atividades=Count('atividade'),
-                num_pendentes=Count('atividade', filter=Q(atividade__status='Pendente')),
-                num_concluidas=Count('atividade', filter=Q(atividade__status='Concluído')),
-                num_atrasadas=Count('atividade', filter=Q(atividade__status='Atrasado'))
-            )
             if form.is_valid():
                 form.save()
                 return redirect('lista_ambientes')
             else:
                 # Renderiza home.html com o form preenchido e erros, e id do ambiente para abrir modal de editar
+                ambientes = ambientes_do_dashboard(request.user)
                 return render(request, 'ambiente/home.html', {
                     'ambientes': ambientes,
                     'form_editar': form,
@@ -80,12 +68,7 @@ class AmbienteView:
                 })
         # GET: renderiza home.html com dados do ambiente para edição
         form = AmbienteForm(instance=ambiente)
-        ambientes = Ambiente.objects.annotate(
-            num_atividades=Count('atividade'),
-            num_pendentes=Count('atividade', filter=Q(atividade__status='Pendente')),
-            num_concluidas=Count('atividade', filter=Q(atividade__status='Concluído')),
-            num_atrasadas=Count('atividade', filter=Q(atividade__status='Atrasado'))
-        )
+        ambientes = ambientes_do_dashboard(request.user)
         return render(request, 'ambiente/home.html', {
             'ambientes': ambientes,
             'form_editar': form,
@@ -105,27 +88,13 @@ class AmbienteView:
         ambiente = Ambiente.objects.get(id=ambiente_id)
         users_participantes = ambiente.usuarios_participantes.all()
         
-        # Buscar participantes com suas roles
-        participantes_data = []
-        for user in users_participantes:
-            try:
-                participante = Participante.objects.get(usuario=user, ambiente=ambiente)
-                participantes_data.append({
-                    'user': user,
-                    'participante': participante
-                })
-            except Participante.DoesNotExist:
-                # Se não existir Participante, criar com role padrão (Leitor)
-                role_leitor = Role.objects.filter(ambiente=ambiente, nome=Role.LEITOR).first()
-                participante = Participante.objects.create(
-                    usuario=user,
-                    ambiente=ambiente,
-                    role=role_leitor
-                )
-                participantes_data.append({
-                    'user': user,
-                    'participante': participante
-                })
+        # Os Participante são mantidos pelo signal de usuarios_participantes
+        participantes_data = [
+            {'user': participante.usuario, 'participante': participante}
+            for participante in Participante.objects.filter(
+                ambiente=ambiente, usuario__ambientes_participantes=ambiente
+            ).select_related('usuario', 'role').order_by('usuario__username')
+        ]
         
         return render(request, 'ambiente/configurar.html', {
             'ambiente': ambiente, 
@@ -160,7 +129,7 @@ class AmbienteInvitationViewSet(viewsets.ModelViewSet):
         """Envia um convite para o ambiente"""
         ambiente = get_object_or_404(Ambiente, id=ambiente_id)
         
-        if ambiente.usuario_administrador != request.user and not ambiente.usuarios_participantes.filter(id=request.user.id).exists():
+        if not resolver_permissoes(request.user, ambiente, request)['acesso']:
             return Response({
                 'success': False,
                 'message': 'Você não tem permissão para enviar convites neste ambiente.'
@@ -202,13 +171,6 @@ class AmbienteInvitationViewSet(viewsets.ModelViewSet):
         invitation.accepted = True
         invitation.save()
         
-        role_leitor = Role.objects.filter(ambiente=ambiente, nome=Role.LEITOR).first()
-        Participante.objects.get_or_create(
-            usuario=request.user,
-            ambiente=ambiente,
-            defaults={'role': role_leitor}
-        )
-        
         return Response({
             'success': True,
             'message': f'Você agora faz parte do ambiente "{ambiente.nome}"!'
@@ -331,8 +293,9 @@ def obter_permissoes_participante(request, ambiente_id, participante_id):
     """
     Retorna as permissões atuais de um participante.
     """
-    ambiente = get_object_or_404(Ambiente, id=ambiente_id)
-    participante = get_object_or_404(Participante, id=participante_id, ambiente=ambiente)
+    participante = get_object_or_404(
+        Participante.objects.select_related('role'), id=participante_id, ambiente_id=ambiente_id
+    )
     
     if not participante.role:
         return JsonResponse({
@@ -346,28 +309,51 @@ def obter_permissoes_participante(request, ambiente_id, participante_id):
     
     return JsonResponse({
         'success': True,
-        'pode_visualizar_atividades': participante.role.pode_visualizar_atividades,
-        'pode_criar_atividades': participante.role.pode_criar_atividades,
-        'pode_editar_atividades': participante.role.pode_editar_atividades,
-        'pode_deletar_atividades': participante.role.pode_deletar_atividades,
+        **participante.flags.como_dicionario(),
         'role': participante.role.get_nome_display()
     })
 
 
 # === Views de Notificações ===
 
+# Notificações por página da caixa de notificações
+NOTIFICACOES_POR_PAGINA = 20
+MAXIMO_NOTIFICACOES_POR_PAGINA = 50
+
+# Limite de ids aceitos por requisição em marcar_notificacoes_lidas
+MAXIMO_IDS_MARCAR_LIDAS = 500
+
+
 @login_required
 def listar_notificacoes(request):
-    """Lista todas as notificações do usuário."""
+    """
+    Caixa de notificações do usuário, paginada por cursor. Com o parâmetro
+    `parcial` (rolagem infinita) retorna apenas os itens da página seguinte.
+    """
     from ambiente.models import Notificacao
-    
-    notificacoes = Notificacao.objects.filter(usuario=request.user)
-    nao_lidas = notificacoes.filter(lida=False)
-    
-    return render(request, 'ambiente/notificacoes.html', {
-        'notificacoes': notificacoes,
-        'nao_lidas_count': nao_lidas.count()
-    })
+
+    notificacoes = Notificacao.objects.filter(usuario=request.user).select_related('atividade', 'ambiente')
+    apenas_nao_lidas = request.GET.get('filtro') == 'nao_lidas'
+    if apenas_nao_lidas:
+        notificacoes = notificacoes.filter(lida=False)
+
+    try:
+        tamanho = int(request.GET.get('page_size', NOTIFICACOES_POR_PAGINA))
+    except ValueError:
+        tamanho = NOTIFICACOES_POR_PAGINA
+    tamanho = max(1, min(tamanho, MAXIMO_NOTIFICACOES_POR_PAGINA))
+
+    pagina = paginar_notificacoes(notificacoes, request.GET.get('cursor'), tamanho)
+    contexto = {
+        'notificacoes': pagina.itens,
+        'pagina': pagina,
+        'filtro': 'nao_lidas' if apenas_nao_lidas else '',
+    }
+    if 'parcial' in request.GET:
+        return render(request, 'ambiente/notificacoes_itens.html', contexto)
+
+    contexto['nao_lidas_count'] = ler_nao_lidas(request.user.pk)
+    return render(request, 'ambiente/notificacoes.html', contexto)
 
 
 @login_required
@@ -376,8 +362,12 @@ def marcar_notificacao_lida(request, notificacao_id):
     from ambiente.models import Notificacao
     
     notificacao = get_object_or_404(Notificacao, id=notificacao_id, usuario=request.user)
-    notificacao.lida = True
-    notificacao.save()
+    # UPDATE condicional: só quem de fato trocou `lida` desconta do contador,
+    # mesmo com outra aba marcando a mesma notificação ao mesmo tempo
+    with transaction.atomic():
+        marcada = Notificacao.objects.filter(pk=notificacao.pk, usuario=request.user, lida=False).update(lida=True)
+        if marcada == 1:
+            ajustar_nao_lidas({request.user.pk: -1})
     
     if request.method == 'POST':
         return JsonResponse({
@@ -397,7 +387,9 @@ def marcar_todas_lidas(request):
     from ambiente.models import Notificacao
     
     if request.method == 'POST':
-        Notificacao.objects.filter(usuario=request.user, lida=False).update(lida=True)
+        with transaction.atomic():
+            marcadas = Notificacao.objects.filter(usuario=request.user, lida=False).update(lida=True)
+            ajustar_nao_lidas({request.user.pk: -marcadas})
         return JsonResponse({
             'success': True,
             'message': 'Todas as notificações foram marcadas como lidas.'
@@ -407,8 +399,54 @@ def marcar_todas_lidas(request):
 
 
 @login_required
-def contagem_notificacoes(request):
+def marcar_notificacoes_lidas(request):
+    """
+    Marca como lidas as notificações do usuário cujos ids vêm no JSON
+    {"ids": [...]}, com um único UPDATE.
+    """
     from ambiente.models import Notificacao
-    
-    count = Notificacao.objects.filter(usuario=request.user, lida=False).count()
-    return JsonResponse({'count': count})
\ No newline at end of file
+
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Método não permitido.'}, status=405)
+
+    try:
+        ids = json.loads(request.body).get('ids')
+        ids = list({int(notificacao_id) for notificacao_id in ids})
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'success': False, 'message': 'Informe a lista de ids das notificações.'}, status=400)
+    if len(ids) > MAXIMO_IDS_MARCAR_LIDAS:
+        return JsonResponse({
+            'success': False,
+            'message': f'Envie no máximo {MAXIMO_IDS_MARCAR_LIDAS} notificações por vez.'
+        }, status=400)
+
+    with transaction.atomic():
+        marcadas = Notificacao.objects.filter(usuario=request.user, id__in=ids, lida=False).update(lida=True)
+        ajustar_nao_lidas({request.user.pk: -marcadas})
+    return JsonResponse({'success': True, 'marcadas': marcadas})
+
+
+@login_required
+def contagem_notificacoes(request):
+    return JsonResponse({'count': ler_nao_lidas(request.user.pk)})
+
+
+@login_required
+async def stream_notificacoes(request):
+    """
+    Server-Sent Events com as novas notificações e convites do usuário.
+    Precisa ser servido por ASGI (planit/asgi.py); o navegador reconecta
+    sozinho enviando Last-Event-ID, e o que foi perdido é reenviado. Sem
+    ASGI (ou com NOTIFICACOES_SSE desligado) responde 204, que faz o
+    EventSource parar de reconectar.
+    """
+    if not sse_disponivel(request):
+        return HttpResponse(status=204)
+    user = await request.auser()
+    response = StreamingHttpResponse(
+        fluxo_eventos(user.pk, request.headers.get('Last-Event-ID')),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,3 +1,61 @@
-from django.contrib import admin
+import csv
+
+from django import forms
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import redirect, render
+from django.urls import path
+
+from .importacao import ErroImportacao, ResumoImportacao, abrir_csv, importar_clientes
+from .models import Cliente
 
 # Register your models here.
+
+
+class ImportarClientesForm(forms.Form):
+    arquivo = forms.FileField(
+        label='Arquivo CSV',
+        help_text='Colunas nome e email, e opcionalmente telefone, sobre, rua, numero, cidade, estado, cep e complemento.'
+    )
+    delimitador = forms.ChoiceField(label='Separador', choices=[(',', 'Vírgula (,)'), (';', 'Ponto e vírgula (;)')])
+
+
+@admin.register(Cliente)
+class ClienteAdmin(admin.ModelAdmin):
+    list_display = ['nome', 'email', 'telefone']
+    search_fields = ['nome', 'email']
+    change_list_template = 'admin/atividade/cliente/change_list.html'
+
+    def get_urls(self):
+        urls = [
+            path('importar/', self.admin_site.admin_view(self.importar_view), name='atividade_cliente_importar'),
+        ]
+        return urls + super().get_urls()
+
+    def importar_view(self, request):
+        """Upload de um CSV de clientes, importado em lotes como em manage.py importar_clientes."""
+        if not (self.has_add_permission(request) and self.has_change_permission(request)):
+            raise PermissionDenied
+        form = ImportarClientesForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            total = ResumoImportacao()
+            try:
+                arquivo = abrir_csv(form.cleaned_data['arquivo'].file)
+                for lote in importar_clientes(arquivo, delimitador=form.cleaned_data['delimitador']):
+                    total.somar(lote)
+            except (UnicodeDecodeError, csv.Error, ErroImportacao) as erro:
+                # Os lotes anteriores ao erro já foram gravados
+                self.message_user(request, f'Importação interrompida: {erro} ({total})', messages.ERROR)
+            else:
+                self.message_user(request, f'Importação concluída: {total}', messages.SUCCESS)
+            for erro in total.erros:
+                self.message_user(request, erro, messages.WARNING)
+            return redirect('admin:atividade_cliente_changelist')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Importar clientes',
+            'form': form,
+        }
+        return render(request, 'admin/atividade/cliente/importar.html', context)
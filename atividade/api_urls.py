@@ -1,10 +1,11 @@
 from django.urls import path, include
-from .views import ClienteViewSet, EnderecoViewSet
+from .views import CalendarioAmbienteViewSet, ClienteViewSet, EnderecoViewSet
 from rest_framework.routers import SimpleRouter
 
 router = SimpleRouter()
 router.register(r'clientes', ClienteViewSet, basename='cliente')
 router.register(r'clientes/(?P<cliente_id>\d+)/enderecos', EnderecoViewSet, basename='cliente-enderecos')
+router.register(r'ambientes/(?P<ambiente_id>\d+)/calendario', CalendarioAmbienteViewSet, basename='ambiente-calendario')
 
 urlpatterns=[
     path('', include(router.urls)),
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AtividadeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'atividade'
+
+    def ready(self):
+        """Importa signals quando a app estiver pronta"""
+        import atividade.signals
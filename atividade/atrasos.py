@@ -0,0 +1,99 @@
+import logging
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Atividade
+from .resumo import ajustar_resumo
+
+
+logger = logging.getLogger(__name__)
+
+
+def pendentes_vencidas(agora=None):
+    """Atividades pendentes cuja data/hora prevista já passou (índice parcial atividade_pendente_prev_idx)."""
+    agora = timezone.localtime(agora)
+    hoje, hora = agora.date(), agora.time()
+    return Atividade.objects.filter(status='Pendente').filter(
+        Q(data_prevista__lt=hoje) | Q(data_prevista=hoje, hora_prevista__lt=hora)
+    )
+
+
+def _atualizar_retornando(agora, ids):
+    """
+    UPDATE ... RETURNING (PostgreSQL, SQLite 3.35+): (ambiente_id, data_prevista)
+    de cada atividade que o UPDATE de fato mudou.
+    """
+    qn = connection.ops.quote_name
+    subconsulta, params = pendentes_vencidas(agora).filter(pk__in=ids).values('id').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {qn(Atividade._meta.db_table)} SET {qn("status")} = %s '
+            f'WHERE {qn("id")} IN ({subconsulta}) RETURNING {qn("ambiente_id")}, {qn("data_prevista")}',
+            ['Atrasado', *params]
+        )
+        linhas = cursor.fetchall()
+    campo_data = Atividade._meta.get_field('data_prevista')
+    return Counter((ambiente_id, campo_data.to_python(data)) for ambiente_id, data in linhas)
+
+
+def _atualizar_por_grupo(agora, linhas):
+    """Sem RETURNING: um UPDATE por (ambiente, dia), cuja contagem de linhas é o delta exato."""
+    grupos = {}
+    for pk, ambiente_id, data_prevista in linhas:
+        grupos.setdefault((ambiente_id, data_prevista), []).append(pk)
+    return Counter({
+        (ambiente_id, data_prevista): pendentes_vencidas(agora).filter(
+            pk__in=ids, ambiente_id=ambiente_id, data_prevista=data_prevista
+        ).update(status='Atrasado')
+        for (ambiente_id, data_prevista), ids in grupos.items()
+    })
+
+
+def marcar_lote_atrasado(agora=None, batch_size=1000):
+    """
+    Passa um lote de pendentes vencidas para Atrasado e ajusta o resumo
+    diário por (ambiente, dia) na mesma transação. Retorna a quantidade de
+    atividades atualizadas.
+
+    O resumo é ajustado pelas linhas que o UPDATE mudou, e não pelas lidas
+    antes dele: uma atividade editada entre o SELECT e o UPDATE (concluída,
+    remarcada) fica de fora em vez de ser contada duas vezes.
+    """
+    agora = agora or timezone.now()
+    with transaction.atomic():
+        vencidas = pendentes_vencidas(agora).order_by('data_prevista', 'hora_prevista')
+        if connection.features.has_select_for_update_skip_locked:
+            vencidas = vencidas.select_for_update(skip_locked=True)
+        linhas = list(vencidas.values_list('id', 'ambiente_id', 'data_prevista')[:batch_size])
+        if not linhas:
+            return 0
+
+        if connection.features.can_return_columns_from_insert:
+            mudadas = _atualizar_retornando(agora, [pk for pk, _, _ in linhas])
+        else:
+            mudadas = _atualizar_por_grupo(agora, linhas)
+
+        # UPDATE em lote não dispara os signals que mantêm o resumo
+        for (ambiente_id, data_prevista), total in mudadas.items():
+            ajustar_resumo(ambiente_id, data_prevista, 'Pendente', -total)
+            ajustar_resumo(ambiente_id, data_prevista, 'Atrasado', total)
+    return sum(mudadas.values())
+
+
+def marcar_atrasadas(agora=None, batch_size=1000):
+    """
+    Passa para Atrasado todas as pendentes vencidas em `agora`, em lotes de
+    `batch_size`. Retorna a lista com a quantidade atualizada em cada lote.
+    """
+    agora = agora or timezone.now()
+    lotes = []
+    while True:
+        atualizadas = marcar_lote_atrasado(agora, batch_size)
+        if not atualizadas:
+            break
+        lotes.append(atualizadas)
+    logger.info('Atividades marcadas como atrasadas: %s em %s lote(s)', sum(lotes), len(lotes))
+    return lotes
@@ -0,0 +1,130 @@
+import re
+import unicodedata
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection
+from django.db.models import Case, CharField, F, FloatField, Func, Q, Value, When
+from django.db.models.functions import Greatest, Lower
+
+from .models import Cliente, Endereco
+
+
+# Campos devolvidos pelo autocomplete de clientes
+CAMPOS_CLIENTE = ('id', 'nome', 'email', 'telefone', 'sobre')
+CAMPOS_ENDERECO = ('id', 'rua', 'numero', 'cidade', 'estado', 'cep', 'complemento')
+
+# Tabela FTS5 (SQLite) e função imutável de unaccent (PostgreSQL) criadas
+# pela migration 0014_busca_clientes
+TABELA_FTS = 'atividade_cliente_busca'
+FUNCAO_UNACCENT = 'planit_unaccent'
+
+# Termos mais curtos que um trigrama não usam o índice GIN; para eles a busca
+# fica restrita ao começo do nome/email
+TAMANHO_MINIMO_TRIGRAMA = 3
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos: 'João' -> 'joao'."""
+    decomposto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def buscar_clientes(termo, limite=10, usar_indice=None):
+    """
+    Clientes cujo nome ou email combinam com `termo`, dos mais relevantes para
+    os menos relevantes, como dicts com CAMPOS_CLIENTE.
+
+    A busca ignora acentos e maiúsculas ('jose' encontra 'José') e usa o
+    índice de cada banco: trigramas (pg_trgm) no PostgreSQL e FTS5 no SQLite.
+    Com o índice de prefixos em memória ativo (CLIENTES_INDICE_PREFIXOS), ele
+    responde primeiro e o banco só é consultado quando nenhum nome, email ou
+    palavra do nome começa com o termo.
+    """
+    from .indice_clientes import ATIVO, indice
+
+    termo = termo.strip()
+    if not termo:
+        return []
+    if ATIVO if usar_indice is None else usar_indice:
+        ids = indice.buscar(termo, limite)
+        if ids:
+            return clientes_por_ids(ids)
+    if connection.vendor == 'postgresql':
+        return _buscar_postgres(termo, limite)
+    if connection.vendor == 'sqlite':
+        return _buscar_sqlite(termo, limite)
+    return list(
+        Cliente.objects.filter(Q(nome__icontains=termo) | Q(email__icontains=termo))
+        .values(*CAMPOS_CLIENTE).order_by('nome', 'id')[:limite]
+    )
+
+
+def _buscar_postgres(termo, limite):
+    termo = normalizar(termo)
+    clientes = Cliente.objects.annotate(
+        # Mesmas expressões dos índices cliente_nome_trgm_idx/cliente_email_trgm_idx
+        nome_busca=Func(Lower('nome'), function=FUNCAO_UNACCENT, output_field=CharField()),
+        email_busca=Lower('email'),
+    )
+    prefixo = Q(nome_busca__startswith=termo) | Q(email_busca__startswith=termo)
+    if len(termo) < TAMANHO_MINIMO_TRIGRAMA:
+        return list(clientes.filter(prefixo).values(*CAMPOS_CLIENTE).order_by('nome', 'id')[:limite])
+
+    clientes = clientes.filter(
+        Q(nome_busca__contains=termo)
+        | Q(email_busca__contains=termo)
+        # Tolera erros de digitação: 'silvia' encontra 'Sílvia' e 'Silva'
+        | Q(nome_busca__trigram_word_similar=termo)
+    ).annotate(
+        comeca=Case(When(prefixo, then=Value(1)), default=Value(0)),
+        relevancia=Greatest(
+            TrigramWordSimilarity(termo, F('nome_busca')),
+            TrigramWordSimilarity(termo, F('email_busca')),
+            output_field=FloatField(),
+        ),
+    )
+    return list(clientes.values(*CAMPOS_CLIENTE).order_by('-comeca', '-relevancia', 'nome', 'id')[:limite])
+
+
+def consulta_fts(termo):
+    """
+    Consulta FTS5 em que cada palavra do termo é um prefixo obrigatório:
+    'ana sou' -> '"ana"* "sou"*'. Aspas e operadores digitados são descartados.
+    """
+    return ' '.join(f'"{palavra}"*' for palavra in re.findall(r'\w+', termo))
+
+
+def _buscar_sqlite(termo, limite):
+    consulta = consulta_fts(termo)
+    if not consulta:
+        return []
+    with connection.cursor() as cursor:
+        # bm25 com peso maior para o nome do que para o email
+        cursor.execute(
+            f'SELECT rowid FROM {TABELA_FTS} WHERE {TABELA_FTS} MATCH %s '
+            f'ORDER BY bm25({TABELA_FTS}, 10.0, 1.0) LIMIT %s',
+            [consulta, limite]
+        )
+        ids = [linha[0] for linha in cursor.fetchall()]
+    return clientes_por_ids(ids)
+
+
+def clientes_por_ids(ids):
+    """Dicts com CAMPOS_CLIENTE na ordem de `ids`, ignorando os que não existem mais."""
+    clientes = {cliente['id']: cliente for cliente in Cliente.objects.filter(id__in=ids).values(*CAMPOS_CLIENTE)}
+    return [clientes[pk] for pk in ids if pk in clientes]
+
+
+def anexar_enderecos(clientes):
+    """
+    Adiciona a cada dict de cliente a lista 'enderecos' (dicts com
+    CAMPOS_ENDERECO), com uma única consulta para todos os clientes.
+    """
+    enderecos = {cliente['id']: [] for cliente in clientes}
+    if enderecos:
+        linhas = Endereco.objects.filter(cliente_id__in=enderecos).values('cliente_id', *CAMPOS_ENDERECO)
+        for endereco in linhas.order_by('id'):
+            enderecos[endereco.pop('cliente_id')].append(endereco)
+    for cliente in clientes:
+        cliente['enderecos'] = enderecos[cliente['id']]
+    return clientes
@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.db.models import Sum
+
+from .models import AtividadeDiaResumo
+
+
+# Quantidade de dias exibidos antes e depois da data base no calendário horizontal
+JANELA_CALENDARIO_DIAS = 30
+
+
+# Maior intervalo aceito pela API de calendário, em dias
+MAXIMO_DIAS_INTERVALO = 366
+
+
+def contar_atividades_por_dia(ambiente_id, inicio, fim, incluir_vazios=True):
+    """
+    Retorna um dicionário {data_iso: quantidade} com os dias entre
+    `inicio` e `fim` (inclusive), usando uma única consulta agrupada por data
+    sobre o resumo diário. Com `incluir_vazios`, dias sem atividades aparecem
+    com quantidade 0; sem ele, apenas os dias com atividades são retornados.
+    """
+    contagens = dict(
+        AtividadeDiaResumo.objects.filter(
+            ambiente_id=ambiente_id,
+            data_prevista__gte=inicio,
+            data_prevista__lte=fim,
+        )
+        .order_by()
+        .values('data_prevista')
+        .annotate(soma=Sum('total'))
+        .values_list('data_prevista', 'soma')
+    )
+
+    if not incluir_vazios:
+        return {data.isoformat(): total for data, total in sorted(contagens.items()) if total}
+
+    atividades_por_dia = {}
+    data = inicio
+    while data <= fim:
+        atividades_por_dia[data.isoformat()] = contagens.get(data, 0)
+        data += timedelta(days=1)
+    return atividades_por_dia
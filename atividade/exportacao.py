@@ -0,0 +1,162 @@
+import asyncio
+import concurrent.futures
+import csv
+import io
+import threading
+
+from django.db import connections
+from django.db.models import Prefetch
+
+from ambiente.models import Participante
+from .models import Atividade, Endereco
+from .paginacao import ORDENACAO_ATIVIDADES
+
+
+# Atividades lidas do cursor do banco por vez (e por rodada de prefetch)
+TAMANHO_CHUNK = 2000
+
+# Bytes acumulados antes de enviar um pedaço da resposta
+TAMANHO_BLOCO = 64 * 1024
+
+# Pedaços prontos à espera do cliente; limita a memória quando ele lê devagar
+MAXIMO_BLOCOS_PENDENTES = 8
+
+CABECALHO = [
+    'id', 'data_prevista', 'hora_prevista', 'status', 'descricao', 'valor', 'valor_recebido', 'paga',
+    'cliente', 'cliente_email', 'cliente_telefone', 'enderecos', 'participantes_alocados',
+]
+
+# csv: vírgula e ponto decimal; excel: o que o Excel em português abre direto
+FORMATOS = {
+    'csv': {'delimitador': ',', 'separador_decimal': '.', 'bom': ''},
+    'excel': {'delimitador': ';', 'separador_decimal': ',', 'bom': '﻿'},
+}
+
+
+def atividades_para_exportar(ambiente_id, chunk_size=TAMANHO_CHUNK):
+    """
+    Atividades do ambiente com cliente, endereços do cliente e participantes
+    alocados, lidas com iterator(): um cursor do lado do servidor no
+    PostgreSQL e os prefetches feitos a cada `chunk_size` linhas.
+    """
+    return Atividade.objects.filter(ambiente_id=ambiente_id).select_related('cliente').prefetch_related(
+        Prefetch('cliente__enderecos', queryset=Endereco.objects.order_by('id')),
+        Prefetch('participantes_alocados', queryset=Participante.objects.select_related('usuario').order_by('id')),
+    ).order_by(*ORDENACAO_ATIVIDADES).iterator(chunk_size=chunk_size)
+
+
+def _texto(valor):
+    """Evita que o Excel interprete como fórmula um texto digitado pelo usuário."""
+    valor = valor or ''
+    return f"'{valor}" if valor[:1] in ('=', '+', '-', '@', '\t', '\r') else valor
+
+
+def _endereco(endereco):
+    texto = endereco.rua
+    if endereco.numero:
+        texto += f', {endereco.numero}'
+    texto += f' - {endereco.cidade}/{endereco.estado}, {endereco.cep}'
+    if endereco.complemento:
+        texto += f' ({endereco.complemento})'
+    return texto
+
+
+def linha_atividade(atividade, separador_decimal='.'):
+    cliente = atividade.cliente
+    return [
+        atividade.id,
+        atividade.data_prevista.isoformat(),
+        atividade.hora_prevista.strftime('%H:%M'),
+        atividade.status,
+        _texto(atividade.descricao),
+        str(atividade.valor).replace('.', separador_decimal),
+        str(atividade.valor_recebido).replace('.', separador_decimal),
+        'sim' if atividade.is_paga else 'não',
+        _texto(cliente.nome) if cliente else '',
+        _texto(cliente.email) if cliente else '',
+        _texto(cliente.telefone) if cliente else '',
+        _texto(' | '.join(_endereco(endereco) for endereco in cliente.enderecos.all())) if cliente else '',
+        _texto(', '.join(participante.usuario.username for participante in atividade.participantes_alocados.all())),
+    ]
+
+
+def gerar_csv(atividades, formato='csv'):
+    """
+    Gera o CSV em pedaços de cerca de TAMANHO_BLOCO bytes. O cabeçalho sai
+    antes da primeira consulta, então a resposta começa imediatamente.
+    """
+    opcoes = FORMATOS[formato]
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=opcoes['delimitador'])
+    buffer.write(opcoes['bom'])
+    escritor.writerow(CABECALHO)
+    yield buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+
+    for atividade in atividades:
+        escritor.writerow(linha_atividade(atividade, opcoes['separador_decimal']))
+        if buffer.tell() >= TAMANHO_BLOCO:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def em_thread_dedicada(pedacos):
+    """
+    Consome o gerador síncrono `pedacos` em uma thread própria e entrega os
+    pedaços de forma assíncrona. No ASGI, um StreamingHttpResponse com
+    iterador síncrono é lido inteiro para a memória antes do envio; e o
+    cursor do servidor precisa de uma única conexão, logo de uma única
+    thread, do começo ao fim.
+    """
+    loop = asyncio.get_running_loop()
+    fila = asyncio.Queue(maxsize=MAXIMO_BLOCOS_PENDENTES)
+    parar = threading.Event()
+    fim = object()
+
+    def entregar(item):
+        """Espera espaço na fila; False se o cliente desconectou nesse meio tempo."""
+        if parar.is_set():
+            return False
+        futuro = asyncio.run_coroutine_threadsafe(fila.put(item), loop)
+        while True:
+            try:
+                futuro.result(timeout=1)
+                return True
+            except concurrent.futures.TimeoutError:
+                if parar.is_set():
+                    futuro.cancel()
+                    return False
+
+    def produzir():
+        try:
+            for pedaco in pedacos:
+                if not entregar(pedaco):
+                    break
+            else:
+                entregar(fim)
+        except BaseException as erro:
+            try:
+                entregar(erro)
+            except RuntimeError:
+                pass  # loop já encerrado
+        finally:
+            if hasattr(pedacos, 'close'):
+                pedacos.close()  # fecha o cursor do servidor
+            connections.close_all()
+
+    threading.Thread(target=produzir, daemon=True).start()
+    try:
+        while (item := await fila.get()) is not fim:
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # Cliente desconectou (ou erro): libera a thread, que pode estar
+        # esperando espaço na fila
+        parar.set()
+        while not fila.empty():
+            fila.get_nowait()
@@ -0,0 +1,172 @@
+import csv
+import io
+import time
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from . import indice_clientes
+from .models import Cliente, Endereco
+from .versoes import invalidar_clientes
+
+
+# Colunas aceitas no CSV; nome e email são obrigatórias
+COLUNAS_CLIENTE = ('nome', 'email', 'telefone', 'sobre')
+COLUNAS_ENDERECO = ('rua', 'numero', 'cidade', 'estado', 'cep', 'complemento')
+COLUNAS_OBRIGATORIAS = ('nome', 'email')
+ENDERECO_OBRIGATORIAS = ('rua', 'cidade', 'estado', 'cep')
+
+# Erros guardados para o relatório; os demais só entram na contagem
+MAXIMO_ERROS = 20
+
+
+class ErroImportacao(Exception):
+    """Arquivo que não pode ser importado (cabeçalho sem as colunas obrigatórias)."""
+
+
+class ResumoImportacao:
+    """Contagens de um lote ou, somadas, da importação inteira."""
+
+    CONTAGENS = ('linhas', 'criados', 'atualizados', 'enderecos', 'enderecos_repetidos', 'invalidas')
+
+    def __init__(self):
+        for nome in self.CONTAGENS:
+            setattr(self, nome, 0)
+        self.erros = []
+        self.segundos = 0.0
+
+    def somar(self, outro):
+        for nome in self.CONTAGENS:
+            setattr(self, nome, getattr(self, nome) + getattr(outro, nome))
+        self.erros.extend(outro.erros[:MAXIMO_ERROS - len(self.erros)])
+        self.segundos += outro.segundos
+
+    @property
+    def linhas_por_segundo(self):
+        return self.linhas / self.segundos if self.segundos else 0.0
+
+    def __str__(self):
+        return (
+            f'{self.linhas} linha(s) em {self.segundos:.1f}s ({self.linhas_por_segundo:.0f} linhas/s): '
+            f'{self.criados} cliente(s) criado(s), {self.atualizados} atualizado(s), '
+            f'{self.enderecos} endereço(s) criado(s), {self.enderecos_repetidos} repetido(s), '
+            f'{self.invalidas} linha(s) inválida(s).'
+        )
+
+
+def abrir_csv(arquivo, encoding='utf-8-sig'):
+    """Texto de um arquivo binário (upload), lido aos poucos."""
+    return io.TextIOWrapper(arquivo, encoding=encoding, newline='')
+
+
+def _limpar(model, colunas, linha, obrigatorias):
+    """Valores da linha validados pelos campos do model; levanta ValidationError."""
+    dados = {}
+    for coluna in colunas:
+        valor = (linha.get(coluna) or '').strip()
+        campo = model._meta.get_field(coluna)
+        if not valor and coluna not in obrigatorias:
+            dados[coluna] = None if campo.null else ''
+            continue
+        try:
+            dados[coluna] = campo.clean(valor, None)
+        except ValidationError as erro:
+            raise ValidationError(f"{coluna}: {' '.join(erro.messages)}")
+    return dados
+
+
+def validar_linha(linha):
+    """
+    Retorna (dados do cliente, dados do endereço ou None) de uma linha do
+    CSV, ou levanta ValidationError com a coluna inválida.
+    """
+    cliente = _limpar(Cliente, COLUNAS_CLIENTE, linha, COLUNAS_OBRIGATORIAS)
+    if not any((linha.get(coluna) or '').strip() for coluna in COLUNAS_ENDERECO):
+        return cliente, None
+    return cliente, _limpar(Endereco, COLUNAS_ENDERECO, linha, ENDERECO_OBRIGATORIAS)
+
+
+def importar_lote(linhas, campos_atualizados):
+    """
+    Valida e grava um lote de (número da linha, dict) em uma transação: um
+    upsert dos clientes pelo email e um bulk_create dos endereços que o
+    cliente ainda não tem. Retorna o ResumoImportacao do lote.
+    """
+    resumo = ResumoImportacao()
+    resumo.linhas = len(linhas)
+    clientes = {}
+    enderecos = []
+    for numero, linha in linhas:
+        try:
+            cliente, endereco = validar_linha(linha)
+        except ValidationError as erro:
+            resumo.invalidas += 1
+            if len(resumo.erros) < MAXIMO_ERROS:
+                resumo.erros.append(f"linha {numero}: {' '.join(erro.messages)}")
+            continue
+        # Email repetido no arquivo: vale a última linha, e os endereços se somam
+        clientes[cliente['email']] = cliente
+        if endereco:
+            enderecos.append((cliente['email'], endereco))
+
+    if clientes:
+        with transaction.atomic():
+            existentes = set(Cliente.objects.filter(email__in=clientes).values_list('email', flat=True))
+            Cliente.objects.bulk_create(
+                [Cliente(**dados) for dados in clientes.values()],
+                update_conflicts=True, unique_fields=['email'], update_fields=campos_atualizados,
+            )
+            ids = dict(Cliente.objects.filter(email__in=clientes).values_list('email', 'id'))
+            resumo.criados = len(clientes) - len(existentes)
+            resumo.atualizados = len(existentes)
+
+            cadastrados = set(
+                Endereco.objects.filter(cliente_id__in=ids.values()).values_list('cliente_id', *COLUNAS_ENDERECO)
+            )
+            novos = []
+            for email, dados in enderecos:
+                chave = (ids[email], *(dados[coluna] for coluna in COLUNAS_ENDERECO))
+                if chave in cadastrados:
+                    resumo.enderecos_repetidos += 1
+                    continue
+                cadastrados.add(chave)
+                novos.append(Endereco(cliente_id=ids[email], **dados))
+            Endereco.objects.bulk_create(novos)
+            resumo.enderecos = len(novos)
+
+            # bulk_create não dispara os signals de Cliente/Endereco
+            invalidar_clientes()
+            if indice_clientes.ATIVO:
+                transaction.on_commit(indice_clientes.invalidar_indices)
+
+    return resumo
+
+
+def importar_clientes(arquivo, batch_size=1000, delimitador=','):
+    """
+    Importa clientes e endereços de um CSV (arquivo de texto) lido em lotes
+    de `batch_size` linhas, gerando o ResumoImportacao de cada lote. Apenas
+    um lote fica em memória, qualquer que seja o tamanho do arquivo.
+
+    Um email já cadastrado atualiza o cliente com as colunas presentes no
+    arquivo; endereços iguais aos que o cliente já tem são ignorados, então
+    importar o mesmo arquivo de novo não duplica nada.
+    """
+    leitor = csv.DictReader(arquivo, delimiter=delimitador)
+    colunas = [coluna.strip() for coluna in leitor.fieldnames or []]
+    faltando = [coluna for coluna in COLUNAS_OBRIGATORIAS if coluna not in colunas]
+    if faltando:
+        raise ErroImportacao(f"Colunas obrigatórias ausentes no cabeçalho: {', '.join(faltando)}.")
+    leitor.fieldnames = colunas
+    campos_atualizados = [coluna for coluna in COLUNAS_CLIENTE if coluna in colunas and coluna != 'email']
+
+    linhas = ((leitor.line_num, linha) for linha in leitor)
+    while True:
+        inicio = time.monotonic()
+        lote = list(islice(linhas, batch_size))
+        if not lote:
+            return
+        resumo = importar_lote(lote, campos_atualizados)
+        resumo.segundos = time.monotonic() - inicio
+        yield resumo
@@ -0,0 +1,259 @@
+import threading
+import time
+import uuid
+from array import array
+from bisect import bisect_left
+from heapq import merge
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from .busca import normalizar
+from .models import Cliente
+
+
+# Índice de prefixos em memória para o autocomplete de clientes, um por
+# processo. Desativado por padrão: cada processo ocupa a memória do índice
+# (veja benchmark_busca_clientes --indice).
+ATIVO = getattr(settings, 'CLIENTES_INDICE_PREFIXOS', False)
+
+# Intervalo, em segundos, entre reconstruções completas a partir do banco.
+# Alterações e remoções feitas por outros processos aparecem depois dele.
+TEMPO_RECONSTRUCAO = getattr(settings, 'CLIENTES_INDICE_RECONSTRUCAO', 300)
+
+# Intervalo, em segundos, entre as consultas por clientes criados em outros processos
+INTERVALO_NOVOS = 1.0
+
+# Geração dos índices no cache compartilhado. Escritas em massa, que não
+# disparam os signals de Cliente, trocam a geração; cada processo a confere
+# a cada INTERVALO_NOVOS e reconstrói o seu índice quando ela muda
+CHAVE_GERACAO = 'clientes:indice:geracao'
+
+# Chaves maiores são truncadas; termos maiores vão para a busca no banco
+TAMANHO_MAXIMO_CHAVE = 64
+
+# Marcam se a chave é o começo do nome/email ou o começo de outra palavra do
+# nome; os primeiros aparecem antes na resposta
+INICIO, PALAVRA = '0', '1'
+
+
+def chaves_cliente(nome, email):
+    """
+    Chaves de um cliente: o nome e o email normalizados e o nome a partir de
+    cada palavra seguinte ('Ana de Souza' -> 'ana de souza', 'de souza', 'souza').
+    """
+    palavras = normalizar(nome or '').split()
+    chaves = {INICIO + ' '.join(palavras), INICIO + normalizar(email or '').strip()}
+    chaves.update(PALAVRA + ' '.join(palavras[i:]) for i in range(1, len(palavras)))
+    return {chave[:TAMANHO_MAXIMO_CHAVE + 1] for chave in chaves if len(chave) > 1}
+
+
+class _Base:
+    """
+    Chaves ordenadas concatenadas em uma única string, com os inícios e os
+    ids em arrays: cerca de len(chave) + 12 bytes por chave, sem um objeto
+    Python por entrada.
+    """
+
+    def __init__(self, entradas):
+        self.ids = array('q')
+        self.inicios = array('I', [0])
+        partes = []
+        for chave, pk in entradas:
+            partes.append(chave)
+            self.ids.append(pk)
+            self.inicios.append(self.inicios[-1] + len(chave))
+        self.texto = ''.join(partes)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def chave(self, i):
+        return self.texto[self.inicios[i]:self.inicios[i + 1]]
+
+    def entradas(self):
+        return ((self.chave(i), self.ids[i]) for i in range(len(self.ids)))
+
+    def com_prefixo(self, prefixo):
+        i = bisect_left(range(len(self.ids)), prefixo, key=self.chave)
+        while i < len(self.ids):
+            chave = self.chave(i)
+            if not chave.startswith(prefixo):
+                return
+            yield chave, self.ids[i]
+            i += 1
+
+
+def _com_prefixo(entradas, prefixo):
+    """Mesmo que _Base.com_prefixo, para uma lista ordenada de (chave, id)."""
+    i = bisect_left(entradas, (prefixo,))
+    while i < len(entradas) and entradas[i][0].startswith(prefixo):
+        yield entradas[i]
+        i += 1
+
+
+class IndicePrefixos:
+    """
+    Base imutável reconstruída do banco de tempos em tempos, mais um delta
+    pequeno com as alterações vindas dos signals de Cliente: as entradas
+    novas (`novas`, ordenadas) e os ids cujas entradas da base deixaram de
+    valer (`alterados`). O estado é trocado inteiro a cada alteração, então
+    as buscas leem sem lock.
+    """
+
+    # O delta é incorporado à base quando passa deste tamanho
+    LIMITE_DELTA = 2000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._estado = None
+        self._ultimo_id = 0
+        self._construido_em = 0.0
+        self._verificado_em = 0.0
+        self._reconstruindo = None
+        self._geracao = None
+
+    def __len__(self):
+        """Quantidade de chaves, incluindo as que o delta invalidou."""
+        if self._estado is None:
+            return 0
+        base, novas, _ = self._estado
+        return len(base) + len(novas)
+
+    def limpar(self):
+        with self._lock:
+            self._estado = None
+            self._ultimo_id = 0
+            self._reconstruindo = None
+
+    def buscar(self, termo, limite=10):
+        """
+        Ids dos clientes cujo nome, email ou alguma palavra do nome começa
+        com `termo`, em ordem alfabética, primeiro os que começam pelo nome
+        ou email. Retorna None quando o termo não cabe no índice.
+        """
+        prefixo = ' '.join(normalizar(termo).split())
+        if not prefixo or len(prefixo) > TAMANHO_MAXIMO_CHAVE:
+            return None
+        base, novas, alterados = self._atual()
+
+        encontrados = []
+        for tipo in (INICIO, PALAVRA):
+            da_base = (
+                (chave, pk) for chave, pk in base.com_prefixo(tipo + prefixo) if pk not in alterados
+            )
+            for _, pk in merge(da_base, _com_prefixo(novas, tipo + prefixo)):
+                if pk not in encontrados:
+                    encontrados.append(pk)
+                    if len(encontrados) == limite:
+                        return encontrados
+        return encontrados
+
+    def atualizar(self, pk, nome, email):
+        self._alterar(pk, sorted((chave, pk) for chave in chaves_cliente(nome, email)))
+
+    def remover(self, pk):
+        self._alterar(pk, [])
+
+    def _alterar(self, pk, entradas):
+        with self._lock:
+            if self._reconstruindo is not None:
+                self._reconstruindo.add(pk)
+            if self._estado is None:
+                return
+            base, novas, alterados = self._estado
+            novas = sorted([entrada for entrada in novas if entrada[1] != pk] + entradas)
+            self._estado = (base, novas, alterados | {pk})
+            if len(novas) + len(alterados) > max(self.LIMITE_DELTA, len(base) // 20):
+                self._estado = self._compactar(*self._estado)
+
+    def _compactar(self, base, novas, alterados):
+        da_base = ((chave, pk) for chave, pk in base.entradas() if pk not in alterados)
+        return _Base(merge(da_base, novas)), [], frozenset()
+
+    def _atual(self):
+        agora = time.monotonic()
+        if self._estado is None:
+            with self._lock:
+                if self._estado is None:
+                    # Lida antes da base: uma troca durante a leitura causa outra reconstrução
+                    self._geracao = cache.get(CHAVE_GERACAO)
+                    self._estado, self._ultimo_id = self._construir()
+                    self._construido_em = self._verificado_em = agora
+        elif agora - self._construido_em > TEMPO_RECONSTRUCAO and self._reconstruindo is None:
+            self._iniciar_reconstrucao(agora)
+        elif agora - self._verificado_em > INTERVALO_NOVOS:
+            self._verificado_em = agora
+            geracao = cache.get(CHAVE_GERACAO)
+            if geracao != self._geracao and self._reconstruindo is None:
+                self._geracao = geracao
+                self._iniciar_reconstrucao(agora)
+            else:
+                self._carregar_novos()
+        return self._estado
+
+    def _iniciar_reconstrucao(self, agora):
+        """Reconstrói a base em segundo plano; até terminar, as buscas usam a atual."""
+        self._construido_em = agora
+        threading.Thread(target=self._reconstruir, daemon=True).start()
+
+    def _construir(self):
+        entradas = []
+        ultimo_id = 0
+        clientes = Cliente.objects.order_by().values_list('id', 'nome', 'email')
+        for pk, nome, email in clientes.iterator(chunk_size=10000):
+            entradas.extend((chave, pk) for chave in chaves_cliente(nome, email))
+            ultimo_id = max(ultimo_id, pk)
+        entradas.sort()
+        return (_Base(entradas), [], frozenset()), ultimo_id
+
+    def _reconstruir(self):
+        with self._lock:
+            self._reconstruindo = pendentes = set()
+        try:
+            estado, ultimo_id = self._construir()
+            with self._lock:
+                if self._reconstruindo is not pendentes:
+                    return  # limpar() descartou o índice durante a reconstrução
+                self._reconstruindo = None
+                self._estado = estado
+                self._ultimo_id = max(self._ultimo_id, ultimo_id)
+            # Alterados por signals enquanto a base era lida
+            self._recarregar(Cliente.objects.filter(pk__in=pendentes), pendentes)
+        finally:
+            with self._lock:
+                if self._reconstruindo is pendentes:
+                    self._reconstruindo = None
+            connections.close_all()
+
+    def _carregar_novos(self):
+        """
+        Clientes criados em outros processos desde a última verificação. Um
+        id menor commitado depois de um maior só aparece na reconstrução.
+        """
+        existentes = self._recarregar(Cliente.objects.filter(pk__gt=self._ultimo_id))
+        if existentes:
+            self._ultimo_id = max(self._ultimo_id, *existentes)
+
+    def _recarregar(self, clientes, ids=()):
+        existentes = set()
+        for pk, nome, email in clientes.values_list('id', 'nome', 'email'):
+            existentes.add(pk)
+            self.atualizar(pk, nome, email)
+        for pk in set(ids) - existentes:
+            self.remover(pk)
+        return existentes
+
+
+indice = IndicePrefixos()
+
+
+def invalidar_indices():
+    """
+    Descarta o índice deste processo e troca a geração, para que os outros
+    processos reconstruam os seus. Para escritas que não disparam os
+    signals de Cliente, como bulk_create e update.
+    """
+    cache.set(CHAVE_GERACAO, uuid.uuid4().hex, None)
+    indice.limpar()
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from atividade.atrasos import marcar_atrasadas
+
+
+class Command(BaseCommand):
+    help = (
+        'Passa para Atrasado as atividades pendentes cuja data/hora prevista já '
+        'passou, em UPDATEs por lotes, mantendo o resumo diário. Roda em ciclos '
+        'a cada --intervalo segundos, ou uma vez com --uma-vez.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Atividades atualizadas por UPDATE.')
+        parser.add_argument('--intervalo', type=float, default=60.0, help='Segundos entre as execuções.')
+        parser.add_argument('--uma-vez', action='store_true', help='Executa uma vez e termina.')
+
+    def executar(self, batch_size):
+        inicio = timezone.now()
+        lotes = marcar_atrasadas(inicio, batch_size)
+        duracao = (timezone.now() - inicio).total_seconds()
+        self.stdout.write(
+            f'{inicio:%Y-%m-%d %H:%M:%S}: {sum(lotes)} atividade(s) marcada(s) como atrasada(s) '
+            f'em {len(lotes)} lote(s), {duracao:.2f}s'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                self.executar(options['batch_size'])
+                if options['uma_vez']:
+                    break
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,141 @@
+import random
+import statistics
+import time as relogio
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+
+from atividade.busca import CAMPOS_CLIENTE, buscar_clientes, normalizar
+from atividade.indice_clientes import IndicePrefixos
+from atividade.models import Cliente
+
+
+NOMES = ['João', 'José', 'Maria', 'Ana', 'Antônio', 'Francisca', 'Luís', 'Márcia', 'Sebastião', 'Conceição',
+         'Raimundo', 'Inês', 'Sílvia', 'Vinícius', 'Lúcia', 'Cláudio', 'Letícia', 'Fábio', 'Mônica', 'Joaquim']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Pereira', 'Conceição', 'Gonçalves', 'Araújo', 'Simões',
+              'Galvão', 'Falcão', 'Assunção', 'Magalhães', 'Brandão', 'Lima', 'Gomes', 'Ribeiro', 'Carvalho']
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _termos(valor):
+    termos = [termo.strip() for termo in valor.split(',') if termo.strip()]
+    if not termos:
+        raise CommandError('Informe ao menos um termo de busca.')
+    return termos
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara a latência da busca antiga de clientes (icontains em nome OR '
+        'email) com a atual (atividade.busca: trigramas no PostgreSQL, FTS5 no '
+        'SQLite), para cada termo. Com --indice, mede também o índice de '
+        'prefixos em memória e o quanto ele ocupa. Os clientes de teste são criados dentro de '
+        'uma transação desfeita no final: rode em um banco de benchmark, nunca '
+        'em produção.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=1000000, help='Clientes de teste criados antes de medir.')
+        parser.add_argument('--termos', type=_termos, default=['silva', 'joao', 'conceicao', 'mar', 'luis gal'],
+                            help='Termos buscados, separados por vírgula.')
+        parser.add_argument('--repeticoes', type=int, default=20, help='Execuções medidas de cada busca.')
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--indice', action='store_true',
+                            help='Mede também o índice de prefixos em memória (CLIENTES_INDICE_PREFIXOS).')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.popular(options['clientes'], options['batch_size'])
+                indice = self.medir_indice(options['clientes']) if options['indice'] else None
+                self.stdout.write(
+                    f"{'termo':>12} {'antiga p50':>11} {'antiga p95':>11} {'atual p50':>10} "
+                    f"{'atual p95':>10} {'antiga':>7} {'atual':>6}"
+                    + (f" {'índice p50 (µs)':>16} {'índice':>7}" if indice else '')
+                )
+                for termo in options['termos']:
+                    self.medir_termo(termo, options['repeticoes'], indice)
+                raise _Rollback
+        except _Rollback:
+            pass
+        self.stdout.write('Latências em ms (índice em µs); as colunas antiga, atual e índice são os resultados devolvidos.')
+
+    def medir_termo(self, termo, repeticoes, indice=None):
+        antiga = lambda: list(self.consulta_antiga(termo))  # noqa: E731
+        atual = lambda: buscar_clientes(termo, usar_indice=False)  # noqa: E731
+        tempos_antiga = self.cronometrar(antiga, repeticoes)
+        tempos_atual = self.cronometrar(atual, repeticoes)
+        linha = (
+            f'{termo:>12} {self.percentil(tempos_antiga, 50):>11.2f} {self.percentil(tempos_antiga, 95):>11.2f} '
+            f'{self.percentil(tempos_atual, 50):>10.2f} {self.percentil(tempos_atual, 95):>10.2f} '
+            f'{len(antiga()):>7} {len(atual()):>6}'
+        )
+        if indice:
+            # Só a busca dos ids; a resposta da API ainda lê os 10 clientes pela chave primária
+            tempos_indice = self.cronometrar(lambda: indice.buscar(termo), repeticoes)
+            linha += f' {self.percentil(tempos_indice, 50) * 1000:>16.1f} {len(indice.buscar(termo) or []):>7}'
+        self.stdout.write(linha)
+
+    def medir_indice(self, clientes):
+        indice = IndicePrefixos()
+        tracemalloc.start()
+        try:
+            inicio = relogio.perf_counter()
+            indice.buscar('a')  # constrói o índice
+            duracao = relogio.perf_counter() - inicio
+            ocupado, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        mb = 1024 * 1024
+        self.stdout.write(
+            f'Índice de prefixos: {len(indice)} chaves, {ocupado / mb:.1f} MB '
+            f'({ocupado * 100000 / max(clientes, 1) / mb:.1f} MB por 100 mil clientes), '
+            f'pico de {pico / mb:.1f} MB durante a construção, construído em {duracao:.1f}s.'
+        )
+        return indice
+
+    def consulta_antiga(self, termo):
+        return Cliente.objects.filter(
+            Q(nome__icontains=termo) | Q(email__icontains=termo)
+        ).values(*CAMPOS_CLIENTE).order_by('nome')[:10]
+
+    def cronometrar(self, consulta, repeticoes):
+        consulta()
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = relogio.perf_counter()
+            consulta()
+            tempos.append((relogio.perf_counter() - inicio) * 1000)
+        return tempos
+
+    def percentil(self, tempos, p):
+        if len(tempos) < 2:
+            return tempos[0]
+        return statistics.quantiles(tempos, n=100, method='inclusive')[p - 1]
+
+    def popular(self, quantidade, batch_size):
+        aleatorio = random.Random(0)
+        inicio = relogio.monotonic()
+        criados = 0
+        while criados < quantidade:
+            lote = []
+            for i in range(criados, min(criados + batch_size, quantidade)):
+                nome = f'{aleatorio.choice(NOMES)} {aleatorio.choice(SOBRENOMES)} {aleatorio.choice(SOBRENOMES)}'
+                lote.append(Cliente(
+                    nome=nome,
+                    email=f"{normalizar(nome.split()[0])}{i}@benchmark.exemplo",
+                    telefone='(83) 90000-0000',
+                    sobre='Cliente de benchmark',
+                ))
+            Cliente.objects.bulk_create(lote)
+            criados += len(lote)
+            self.stdout.write(f'{criados}/{quantidade} clientes criados', ending='\r')
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE atividade_cliente')
+        self.stdout.write(f'\n{criados} clientes criados em {relogio.monotonic() - inicio:.1f}s.')
@@ -0,0 +1,144 @@
+import random
+import time as relogio
+from datetime import time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from ambiente.models import Ambiente
+from atividade.models import STATUS_CHOICES, Atividade
+from atividade.resumo import reconstruir_resumo
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Mostra os planos de execução das consultas mais usadas de Atividade '
+        'sem e com os índices compostos/parciais. Os índices são removidos '
+        'dentro de uma transação que é desfeita no final: rode em um banco de '
+        'benchmark, nunca em produção.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quantidade', type=int, default=0,
+                            help='Cria esta quantidade de atividades de teste antes de medir.')
+        parser.add_argument('--ambientes', type=int, default=100,
+                            help='Quantidade de ambientes entre os quais as atividades criadas são distribuídas.')
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--ambiente', type=int, help='Ambiente usado nas consultas (padrão: o maior).')
+        parser.add_argument('--analyze', action='store_true',
+                            help='Executa as consultas (EXPLAIN ANALYZE, apenas PostgreSQL).')
+
+    def handle(self, *args, **options):
+        if options['quantidade']:
+            self.popular(options['quantidade'], options['ambientes'], options['batch_size'])
+
+        ambiente_id = options['ambiente'] or (
+            Atividade.objects.order_by().values('ambiente_id')
+            .annotate(total=Count('id')).order_by('-total')
+            .values_list('ambiente_id', flat=True).first()
+        )
+        if ambiente_id is None:
+            self.stderr.write('Nenhuma atividade encontrada. Use --quantidade para criar dados de teste.')
+            return
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE atividade_atividade')
+
+        explain_options = {'analyze': True} if options['analyze'] and connection.vendor == 'postgresql' else {}
+        consultas = self.consultas(ambiente_id)
+
+        depois = {nome: self.explicar(qs, 'depois', **explain_options) for nome, qs in consultas}
+        antes = {}
+        try:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    for index in Atividade._meta.indexes:
+                        cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
+                antes = {nome: self.explicar(qs, 'antes', **explain_options) for nome, qs in consultas}
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(f'Ambiente {ambiente_id}, {Atividade.objects.count()} atividades no total.\n')
+        for nome, _ in consultas:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'== {nome} =='))
+            self.stdout.write('-- antes (sem os índices compostos/parciais) --')
+            self.stdout.write(antes[nome])
+            self.stdout.write('-- depois --')
+            self.stdout.write(depois[nome] + '\n')
+
+    def explicar(self, queryset, fase, **options):
+        # O comentário com a fase muda o texto do SQL; sem ele o cache de
+        # statements do SQLite reaproveitaria o plano montado com os índices.
+        sql, params = queryset.query.sql_with_params()
+        prefixo = connection.ops.explain_query_prefix(**options)
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefixo} {sql} /* {fase} */', params)
+            return '\n'.join(' '.join(str(coluna) for coluna in linha) for linha in cursor.fetchall())
+
+    def consultas(self, ambiente_id):
+        hoje = timezone.localdate()
+        agora = timezone.localtime().time()
+        atividades = Atividade.objects.filter(ambiente_id=ambiente_id)
+        return [
+            ('listagem do dia', atividades.filter(data_prevista=hoje).order_by('hora_prevista', 'id')[:2]),
+            ('listagem da janela de 90 dias', atividades.filter(
+                data_prevista__gte=hoje - timedelta(days=30),
+                data_prevista__lte=hoje + timedelta(days=60),
+            ).order_by('data_prevista', 'hora_prevista', 'id')[:50]),
+            ('seek da paginação por cursor', atividades.filter(data_prevista__gte=hoje).filter(
+                Q(data_prevista__gt=hoje)
+                | Q(data_prevista=hoje, hora_prevista__gt=time(12, 0))
+                | Q(data_prevista=hoje, hora_prevista=time(12, 0), id__gt=0)
+            ).order_by('data_prevista', 'hora_prevista', 'id')[:50]),
+            ('contagem por dia do calendário', atividades.filter(
+                data_prevista__gte=hoje - timedelta(days=30),
+                data_prevista__lte=hoje + timedelta(days=30),
+            ).order_by().values('data_prevista').annotate(total=Count('id'))),
+            ('contagem por status', atividades.order_by().values('status').annotate(total=Count('id'))),
+            ('pendentes vencidas', Atividade.objects.filter(status='Pendente').filter(
+                Q(data_prevista__lt=hoje) | Q(data_prevista=hoje, hora_prevista__lt=agora)
+            ).values('id')[:1000]),
+        ]
+
+    def popular(self, quantidade, num_ambientes, batch_size):
+        usuario, _ = User.objects.get_or_create(username='benchmark_indices')
+        ambientes = list(Ambiente.objects.filter(usuario_administrador=usuario)[:num_ambientes])
+        for i in range(len(ambientes), num_ambientes):
+            ambientes.append(Ambiente.objects.create(nome=f'Benchmark {i}', usuario_administrador=usuario))
+
+        # Um ambiente concentra metade das atividades para simular um ambiente grande
+        pesos = [len(ambientes)] + [1] * (len(ambientes) - 1)
+        status = [valor for valor, _ in STATUS_CHOICES]
+        hoje = timezone.localdate()
+        inicio = relogio.monotonic()
+        criadas = 0
+        while criadas < quantidade:
+            lote = [
+                Atividade(
+                    valor=Decimal('10.00'),
+                    ambiente=ambiente,
+                    data_prevista=hoje + timedelta(days=random.randint(-365, 365)),
+                    hora_prevista=time(random.randint(0, 23), random.choice([0, 15, 30, 45])),
+                    status=random.choice(status),
+                    descricao='Atividade de benchmark',
+                )
+                for ambiente in random.choices(ambientes, weights=pesos, k=min(batch_size, quantidade - criadas))
+            ]
+            Atividade.objects.bulk_create(lote)
+            criadas += len(lote)
+            self.stdout.write(f'{criadas}/{quantidade} atividades criadas', ending='\r')
+
+        # bulk_create não dispara os signals do resumo diário
+        for ambiente in ambientes:
+            reconstruir_resumo(ambiente.id)
+        self.stdout.write(f'\n{criadas} atividades criadas em {relogio.monotonic() - inicio:.1f}s.')
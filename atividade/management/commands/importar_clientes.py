@@ -0,0 +1,44 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from atividade.importacao import ErroImportacao, ResumoImportacao, importar_clientes
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa clientes e endereços de um CSV com as colunas nome, email e, '
+        'opcionalmente, telefone, sobre, rua, numero, cidade, estado, cep e '
+        'complemento. O arquivo é lido em lotes; um email já cadastrado '
+        'atualiza o cliente e endereços repetidos são ignorados.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do CSV.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Linhas gravadas por transação.')
+        parser.add_argument('--delimitador', default=',', help='Separador de colunas do CSV.')
+        parser.add_argument('--encoding', default='utf-8-sig', help='Codificação do arquivo.')
+
+    def handle(self, *args, **options):
+        total = ResumoImportacao()
+        try:
+            with open(options['arquivo'], encoding=options['encoding'], newline='') as arquivo:
+                lotes = importar_clientes(arquivo, options['batch_size'], options['delimitador'])
+                for numero, lote in enumerate(lotes, start=1):
+                    total.somar(lote)
+                    self.stdout.write(
+                        f'lote {numero}: {lote.linhas} linha(s), {lote.linhas_por_segundo:.0f} linhas/s '
+                        f'({total.linhas} no total)'
+                    )
+        except (OSError, UnicodeDecodeError, csv.Error, ErroImportacao) as erro:
+            # Os lotes anteriores ao erro já foram gravados
+            raise CommandError(
+                f'Não foi possível importar {options["arquivo"]}: {erro} '
+                f'({total.linhas} linha(s) já importada(s)).'
+            )
+
+        for erro in total.erros:
+            self.stderr.write(erro)
+        if total.invalidas > len(total.erros):
+            self.stderr.write(f'... e mais {total.invalidas - len(total.erros)} linha(s) inválida(s).')
+        self.stdout.write(self.style.SUCCESS(f'Importação concluída: {total}'))
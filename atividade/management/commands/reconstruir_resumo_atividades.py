@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from atividade.resumo import reconstruir_resumo
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o resumo diário de atividades (ambiente, dia, status) a partir das atividades.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ambiente', type=int, help='Reconstrói apenas o ambiente informado.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Linhas por INSERT em lote.')
+
+    def handle(self, *args, **options):
+        gravados = reconstruir_resumo(options['ambiente'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Resumo reconstruído: {gravados} linha(s) gravada(s).'))
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def popular_resumo(apps, schema_editor):
+    Atividade = apps.get_model('atividade', 'Atividade')
+    AtividadeDiaResumo = apps.get_model('atividade', 'AtividadeDiaResumo')
+    contagens = (
+        Atividade.objects.order_by()
+        .values('ambiente_id', 'data_prevista', 'status')
+        .annotate(total=Count('id'))
+    )
+    AtividadeDiaResumo.objects.bulk_create(
+        (AtividadeDiaResumo(**linha) for linha in contagens.iterator()),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ambiente', '0007_notificacao'),
+        ('atividade', '0010_atividade_participantes_alocados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AtividadeDiaResumo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_prevista', models.DateField()),
+                ('status', models.CharField(choices=[('Pendente', 'Pendente'), ('Concluído', 'Concluído'), ('Atrasado', 'Atrasado')], max_length=50)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('ambiente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos_diarios', to='ambiente.ambiente')),
+            ],
+            options={
+                'verbose_name': 'Resumo diário de atividades',
+                'verbose_name_plural': 'Resumos diários de atividades',
+                'unique_together': {('ambiente', 'data_prevista', 'status')},
+            },
+        ),
+        migrations.RunPython(popular_resumo, migrations.RunPython.noop),
+    ]
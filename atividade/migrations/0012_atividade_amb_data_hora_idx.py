@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+from planit.db_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY não roda dentro de transação
+    atomic = False
+
+    dependencies = [
+        ('ambiente', '0007_notificacao'),
+        ('atividade', '0011_atividadediaresumo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='atividade',
+            index=models.Index(fields=['ambiente', 'data_prevista', 'hora_prevista', 'id'], name='atividade_amb_data_hora_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+from planit.db_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY não roda dentro de transação
+    atomic = False
+
+    dependencies = [
+        ('ambiente', '0007_notificacao'),
+        ('atividade', '0012_atividade_amb_data_hora_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='atividade',
+            index=models.Index(fields=['ambiente', 'status'], name='atividade_amb_status_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='atividade',
+            index=models.Index(condition=models.Q(('status', 'Pendente')), fields=['data_prevista', 'hora_prevista'], name='atividade_pendente_prev_idx'),
+        ),
+    ]
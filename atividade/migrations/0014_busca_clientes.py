@@ -0,0 +1,93 @@
+# Generated by Django 5.2.8 on 2026-10-17 09:12
+
+from django.contrib.postgres.operations import TrigramExtension, UnaccentExtension
+from django.db import migrations
+
+
+# unaccent() é STABLE e não pode aparecer em um índice; a função com o
+# dicionário fixo é IMMUTABLE e é a usada por atividade.busca
+POSTGRES = [
+    (
+        "CREATE OR REPLACE FUNCTION planit_unaccent(text) RETURNS text "
+        "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+        "AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$",
+        "DROP FUNCTION IF EXISTS planit_unaccent(text)",
+    ),
+    (
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS cliente_nome_trgm_idx ON atividade_cliente "
+        "USING gin (planit_unaccent(lower(nome)) gin_trgm_ops)",
+        "DROP INDEX CONCURRENTLY IF EXISTS cliente_nome_trgm_idx",
+    ),
+    (
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS cliente_email_trgm_idx ON atividade_cliente "
+        "USING gin (lower(email) gin_trgm_ops)",
+        "DROP INDEX CONCURRENTLY IF EXISTS cliente_email_trgm_idx",
+    ),
+]
+
+# Tabela FTS5 de conteúdo externo mantida por triggers. O SQLite recria a
+# tabela (e perde os triggers) em alguns ALTER TABLE: uma migration futura
+# que altere atividade_cliente precisa recriar os triggers.
+SQLITE = [
+    (
+        "CREATE VIRTUAL TABLE atividade_cliente_busca USING fts5("
+        "nome, email, content='atividade_cliente', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2')",
+        "DROP TABLE IF EXISTS atividade_cliente_busca",
+    ),
+    (
+        "CREATE TRIGGER atividade_cliente_busca_ai AFTER INSERT ON atividade_cliente BEGIN "
+        "INSERT INTO atividade_cliente_busca(rowid, nome, email) VALUES (new.id, new.nome, new.email); "
+        "END",
+        "DROP TRIGGER IF EXISTS atividade_cliente_busca_ai",
+    ),
+    (
+        "CREATE TRIGGER atividade_cliente_busca_ad AFTER DELETE ON atividade_cliente BEGIN "
+        "INSERT INTO atividade_cliente_busca(atividade_cliente_busca, rowid, nome, email) "
+        "VALUES ('delete', old.id, old.nome, old.email); "
+        "END",
+        "DROP TRIGGER IF EXISTS atividade_cliente_busca_ad",
+    ),
+    (
+        "CREATE TRIGGER atividade_cliente_busca_au AFTER UPDATE ON atividade_cliente BEGIN "
+        "INSERT INTO atividade_cliente_busca(atividade_cliente_busca, rowid, nome, email) "
+        "VALUES ('delete', old.id, old.nome, old.email); "
+        "INSERT INTO atividade_cliente_busca(rowid, nome, email) VALUES (new.id, new.nome, new.email); "
+        "END",
+        "DROP TRIGGER IF EXISTS atividade_cliente_busca_au",
+    ),
+    (
+        "INSERT INTO atividade_cliente_busca(atividade_cliente_busca) VALUES ('rebuild')",
+        None,
+    ),
+]
+
+
+def _comandos(schema_editor):
+    return {'postgresql': POSTGRES, 'sqlite': SQLITE}.get(schema_editor.connection.vendor, [])
+
+
+def criar_busca(apps, schema_editor):
+    for criar, _ in _comandos(schema_editor):
+        schema_editor.execute(criar)
+
+
+def remover_busca(apps, schema_editor):
+    for _, remover in reversed(_comandos(schema_editor)):
+        if remover:
+            schema_editor.execute(remover)
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY não roda dentro de transação
+    atomic = False
+
+    dependencies = [
+        ('atividade', '0013_indices_status_pendentes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        UnaccentExtension(),
+        migrations.RunPython(criar_busca, remover_busca),
+    ]
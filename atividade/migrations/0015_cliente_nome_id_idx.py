@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:57
+
+from django.db import migrations, models
+
+from planit.db_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY não roda dentro de transação
+    atomic = False
+
+    dependencies = [
+        ('atividade', '0014_busca_clientes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='cliente',
+            index=models.Index(fields=['nome', 'id'], name='cliente_nome_id_idx'),
+        ),
+    ]
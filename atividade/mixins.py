@@ -1,30 +1,56 @@
-from django.shortcuts import redirect, get_object_or_404
+from django.shortcuts import redirect
 from django.contrib import messages
-from django.core.exceptions import PermissionDenied
-from ambiente.models import Ambiente, Participante
+from ambiente.models import Ambiente
+from ambiente.permissoes import permissoes_atividades, resolver_permissoes
+from planit.identidade import mapa_da_requisicao
+
+
+def usuario_tem_acesso_ambiente(user, ambiente, request=None):
+    """Administrador ou participante do ambiente"""
+    return resolver_permissoes(user, ambiente, request)['acesso']
 
 
 class AmbientePermissionMixin:
     """Mixin para verificar se o usuário tem permissão para acessar um ambiente"""
+
+    mensagem_sem_permissao_acao = 'Você não tem permissão para realizar esta ação neste ambiente.'
+
+    @property
+    def mapa_identidade(self):
+        return mapa_da_requisicao(self.request)
+
+    def get_ambiente(self, ambiente_id):
+        """Ambiente da requisição, buscado no banco uma única vez (404 se não existir)"""
+        return self.mapa_identidade.obter_ou_404(Ambiente, ambiente_id)
+
+    def get_object(self, queryset=None):
+        pk = self.kwargs.get(self.pk_url_kwarg)
+        if queryset is not None or pk is None:
+            return super().get_object(queryset)
+        return self.mapa_identidade.obter_ou_404(self.model, pk, self.get_queryset())
     
     def verificar_permissao_ambiente(self, ambiente):
-        user = self.request.user
-        return user == ambiente.usuario_administrador or user in ambiente.usuarios_participantes.all()
+        return usuario_tem_acesso_ambiente(self.request.user, ambiente, self.request)
+
+    def verificar_permissao_acao(self, ambiente):
+        """Permissão específica da view (criar, editar, deletar); por padrão, liberada"""
+        return True
     
     def dispatch(self, request, *args, **kwargs):
         ambiente = None
+        mapa = mapa_da_requisicao(request)
         
         if 'ambiente_id' in kwargs:
-            ambiente = get_object_or_404(Ambiente, id=kwargs['ambiente_id'])
+            ambiente = mapa.obter_ou_404(Ambiente, kwargs['ambiente_id'])
         elif request.GET.get('ambiente_id'):
             try:
-                ambiente = Ambiente.objects.get(id=request.GET.get('ambiente_id'))
+                ambiente = mapa.obter(Ambiente, request.GET.get('ambiente_id'))
             except Ambiente.DoesNotExist:
                 messages.error(request, 'Ambiente não encontrado.')
                 return redirect('lista_ambientes')
         elif hasattr(self, 'get_object'):
             try:
-                obj = self.model.objects.get(pk=kwargs.get(self.pk_url_kwarg or 'pk'))
+                obj = mapa.obter(self.model, kwargs.get(self.pk_url_kwarg or 'pk'), self.get_queryset())
                 if hasattr(obj, 'ambiente'):
                     ambiente = obj.ambiente
             except self.model.DoesNotExist:
@@ -33,6 +59,10 @@ class AmbientePermissionMixin:
         if ambiente and not self.verificar_permissao_ambiente(ambiente):
             messages.error(request, 'Você não tem permissão para acessar este ambiente.')
             return redirect('lista_ambientes')
+
+        if ambiente and not self.verificar_permissao_acao(ambiente):
+            messages.error(request, self.mensagem_sem_permissao_acao)
+            return redirect('atividades_por_ambiente', ambiente_id=ambiente.id)
         
         return super().dispatch(request, *args, **kwargs)
 
@@ -40,34 +70,7 @@ class AmbientePermissionMixin:
 class AtividadePermissionMixin:
     
     def get_user_permissions(self, ambiente):
-        user = self.request.user
-        
-        if user == ambiente.usuario_administrador:
-            return {
-                'pode_visualizar_atividades': True,
-                'pode_criar_atividades': True,
-                'pode_editar_atividades': True,
-                'pode_deletar_atividades': True
-            }
-        
-        try:
-            participante = Participante.objects.get(usuario=user, ambiente=ambiente)
-            if participante.role:
-                return {
-                    'pode_visualizar_atividades': participante.role.pode_visualizar_atividades,
-                    'pode_criar_atividades': participante.role.pode_criar_atividades,
-                    'pode_editar_atividades': participante.role.pode_editar_atividades,
-                    'pode_deletar_atividades': participante.role.pode_deletar_atividades
-                }
-        except Participante.DoesNotExist:
-            pass
-
-        return {
-            'pode_visualizar_atividades': False,
-            'pode_criar_atividades': False,
-            'pode_editar_atividades': False,
-            'pode_deletar_atividades': False
-        }
+        return permissoes_atividades(self.request.user, ambiente, self.request)
     
     def verificar_permissao_criar(self, ambiente):
         perms = self.get_user_permissions(ambiente)
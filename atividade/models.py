@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, FileExtensionValidator
 import os
 
@@ -21,8 +21,52 @@ class Atividade(models.Model):
     responsaveis = models.ManyToManyField('auth.User', related_name='atividades_responsaveis', blank=True)
     participantes_alocados = models.ManyToManyField('ambiente.Participante', related_name='atividades_alocadas', blank=True)
 
+    class Meta:
+        indexes = [
+            # Listagem por ambiente ordenada por (data_prevista, hora_prevista, id),
+            # usada pela paginação por cursor
+            models.Index(fields=['ambiente', 'data_prevista', 'hora_prevista', 'id'], name='atividade_amb_data_hora_idx'),
+            # Filtros e contagens por status dentro de um ambiente
+            models.Index(fields=['ambiente', 'status'], name='atividade_amb_status_idx'),
+            # Busca de pendentes vencidas (transição para Atrasado)
+            models.Index(
+                fields=['data_prevista', 'hora_prevista'],
+                condition=models.Q(status='Pendente'),
+                name='atividade_pendente_prev_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.descricao[:50]
+
+    def save(self, *args, **kwargs):
+        # O resumo diário é ajustado pelos signals na mesma transação do save
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
+
+class AtividadeDiaResumo(models.Model):
+    """
+    Quantidade de atividades por ambiente, dia e status.
+    Mantido pelos signals de Atividade e reconstruível com
+    `python manage.py reconstruir_resumo_atividades`.
+    """
+    ambiente = models.ForeignKey('ambiente.Ambiente', on_delete=models.CASCADE, related_name='resumos_diarios')
+    data_prevista = models.DateField()
+    status = models.CharField(max_length=50, choices=STATUS_CHOICES)
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['ambiente', 'data_prevista', 'status']
+        verbose_name = 'Resumo diário de atividades'
+        verbose_name_plural = 'Resumos diários de atividades'
+
+    def __str__(self):
+        return f"{self.ambiente_id} - {self.data_prevista} - {self.status}: {self.total}"
     
 class Referencia(models.Model):
     tipo = models.CharField(max_length=100)
@@ -54,6 +98,12 @@ class Cliente(models.Model):
     telefone = models.CharField(max_length=20)
     sobre = models.TextField()
 
+    class Meta:
+        indexes = [
+            # Paginação por cursor da API de clientes (ORDENACAO_CLIENTES)
+            models.Index(fields=['nome', 'id'], name='cliente_nome_id_idx'),
+        ]
+
     def __str__(self):
         return self.nome
 
@@ -0,0 +1,140 @@
+import base64
+from datetime import date, time
+
+from django.db.models import Q
+
+
+# Ordenação da listagem de atividades; coincide com o índice
+# (ambiente_id, data_prevista, hora_prevista, id) de Atividade
+ORDENACAO_ATIVIDADES = ('data_prevista', 'hora_prevista', 'id')
+
+# Ordenação da listagem de clientes; coincide com o índice cliente_nome_id_idx
+ORDENACAO_CLIENTES = ('nome', 'id')
+
+PROXIMA = 'n'
+ANTERIOR = 'p'
+
+
+def codificar_cursor(atividade, direcao):
+    valor = f'{direcao}|{atividade.data_prevista.isoformat()}|{atividade.hora_prevista.isoformat()}|{atividade.pk}'
+    return base64.urlsafe_b64encode(valor.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Retorna (direcao, data_prevista, hora_prevista, id) ou levanta ValueError."""
+    try:
+        preenchimento = '=' * (-len(cursor) % 4)
+        valor = base64.urlsafe_b64decode(cursor + preenchimento).decode()
+        direcao, data_str, hora_str, pk = valor.split('|')
+        if direcao not in (PROXIMA, ANTERIOR):
+            raise ValueError(direcao)
+        return direcao, date.fromisoformat(data_str), time.fromisoformat(hora_str), int(pk)
+    except (UnicodeDecodeError, ValueError, TypeError) as erro:
+        raise ValueError('Cursor inválido') from erro
+
+
+class PaginaCursor:
+    """Página de uma paginação por cursor (keyset), sem COUNT(*)."""
+
+    def __init__(self, itens, proximo_cursor=None, cursor_anterior=None):
+        self.itens = itens
+        self.proximo_cursor = proximo_cursor
+        self.cursor_anterior = cursor_anterior
+
+    @property
+    def tem_proxima(self):
+        return self.proximo_cursor is not None
+
+    @property
+    def tem_anterior(self):
+        return self.cursor_anterior is not None
+
+
+def paginar_por_cursor(queryset, cursor, tamanho):
+    """
+    Busca `tamanho` atividades depois (ou antes) da posição do cursor com um
+    seek em (data_prevista, hora_prevista, id), em vez de OFFSET. Um cursor
+    vazio ou inválido retorna a primeira página.
+    """
+    direcao, posicao = PROXIMA, None
+    if cursor:
+        try:
+            direcao, *posicao = decodificar_cursor(cursor)
+        except ValueError:
+            direcao, posicao = PROXIMA, None
+
+    if posicao and direcao == PROXIMA:
+        data, hora, pk = posicao
+        queryset = queryset.filter(data_prevista__gte=data).filter(
+            Q(data_prevista__gt=data)
+            | Q(data_prevista=data, hora_prevista__gt=hora)
+            | Q(data_prevista=data, hora_prevista=hora, id__gt=pk)
+        )
+    elif posicao:
+        data, hora, pk = posicao
+        queryset = queryset.filter(data_prevista__lte=data).filter(
+            Q(data_prevista__lt=data)
+            | Q(data_prevista=data, hora_prevista__lt=hora)
+            | Q(data_prevista=data, hora_prevista=hora, id__lt=pk)
+        )
+
+    if direcao == PROXIMA:
+        queryset = queryset.order_by(*ORDENACAO_ATIVIDADES)
+    else:
+        queryset = queryset.order_by(*(f'-{campo}' for campo in ORDENACAO_ATIVIDADES))
+
+    itens = list(queryset[:tamanho + 1])
+    tem_mais = len(itens) > tamanho
+    itens = itens[:tamanho]
+    if direcao == ANTERIOR:
+        itens.reverse()
+
+    if not itens:
+        return PaginaCursor(itens)
+
+    if direcao == PROXIMA:
+        tem_proxima, tem_anterior = tem_mais, posicao is not None
+    else:
+        tem_proxima, tem_anterior = True, tem_mais
+
+    return PaginaCursor(
+        itens,
+        proximo_cursor=codificar_cursor(itens[-1], PROXIMA) if tem_proxima else None,
+        cursor_anterior=codificar_cursor(itens[0], ANTERIOR) if tem_anterior else None,
+    )
+
+
+def codificar_cursor_cliente(cliente):
+    valor = f"{cliente['nome']}|{cliente['id']}"
+    return base64.urlsafe_b64encode(valor.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor_cliente(cursor):
+    """Retorna (nome, id) ou levanta ValueError."""
+    try:
+        preenchimento = '=' * (-len(cursor) % 4)
+        valor = base64.urlsafe_b64decode(cursor + preenchimento).decode()
+        nome, pk = valor.rsplit('|', 1)
+        return nome, int(pk)
+    except (UnicodeDecodeError, ValueError, TypeError) as erro:
+        raise ValueError('Cursor inválido') from erro
+
+
+def paginar_clientes(queryset, cursor, tamanho):
+    """
+    Busca os `tamanho` clientes (dicts de um queryset com values()) seguintes
+    ao cursor, com um seek em (nome, id) em vez de OFFSET. Um cursor vazio ou
+    inválido retorna a primeira página.
+    """
+    if cursor:
+        try:
+            nome, pk = decodificar_cursor_cliente(cursor)
+        except ValueError:
+            pass
+        else:
+            queryset = queryset.filter(nome__gte=nome).filter(Q(nome__gt=nome) | Q(nome=nome, id__gt=pk))
+
+    itens = list(queryset.order_by(*ORDENACAO_CLIENTES)[:tamanho + 1])
+    tem_mais = len(itens) > tamanho
+    itens = itens[:tamanho]
+    return PaginaCursor(itens, proximo_cursor=codificar_cursor_cliente(itens[-1]) if tem_mais else None)
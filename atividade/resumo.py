@@ -0,0 +1,97 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+
+from ambiente.dashboard import invalidar_dashboard_ambiente
+from ambiente.models import Ambiente
+
+from .models import Atividade, AtividadeDiaResumo
+
+
+def ajustar_resumo(ambiente_id, data_prevista, status, delta):
+    """
+    Soma `delta` à contagem (ambiente, dia, status) do resumo diário,
+    criando a linha quando ela ainda não existe.
+    """
+    if not delta:
+        return
+    invalidar_dashboard_ambiente(ambiente_id)
+
+    resumos = AtividadeDiaResumo.objects.filter(
+        ambiente_id=ambiente_id,
+        data_prevista=data_prevista,
+        status=status
+    )
+    if resumos.update(total=Greatest(F('total') + delta, 0)) or delta < 0:
+        return
+
+    try:
+        with transaction.atomic():
+            AtividadeDiaResumo.objects.create(
+                ambiente_id=ambiente_id,
+                data_prevista=data_prevista,
+                status=status,
+                total=delta
+            )
+    except IntegrityError:
+        # Outra transação criou a linha entre o UPDATE e o INSERT
+        resumos.update(total=F('total') + delta)
+
+
+def reconstruir_resumo(ambiente_id=None, batch_size=1000):
+    """
+    Recalcula o resumo diário a partir de atividade_atividade.
+    Usado para reparar a tabela caso ela fique inconsistente.
+    Retorna a quantidade de linhas de resumo gravadas.
+    """
+    atividades = Atividade.objects.all()
+    resumos = AtividadeDiaResumo.objects.all()
+    if ambiente_id is not None:
+        atividades = atividades.filter(ambiente_id=ambiente_id)
+        resumos = resumos.filter(ambiente_id=ambiente_id)
+
+    contagens = (
+        atividades.order_by()
+        .values('ambiente_id', 'data_prevista', 'status')
+        .annotate(total=Count('id'))
+    )
+
+    gravados = 0
+    with transaction.atomic():
+        if ambiente_id is not None:
+            invalidar_dashboard_ambiente(ambiente_id)
+        else:
+            invalidar_dashboard_ambiente(*Ambiente.objects.values_list('id', flat=True))
+        resumos.delete()
+        lote = []
+        for linha in contagens.iterator(chunk_size=batch_size):
+            lote.append(AtividadeDiaResumo(**linha))
+            if len(lote) >= batch_size:
+                AtividadeDiaResumo.objects.bulk_create(lote)
+                gravados += len(lote)
+                lote = []
+        if lote:
+            AtividadeDiaResumo.objects.bulk_create(lote)
+            gravados += len(lote)
+    return gravados
+
+
+def _soma_resumo(status=None):
+    resumos = AtividadeDiaResumo.objects.filter(ambiente=OuterRef('pk'))
+    if status:
+        resumos = resumos.filter(status=status)
+    total = resumos.order_by().values('ambiente').annotate(soma=Sum('total')).values('soma')
+    return Coalesce(Subquery(total), 0)
+
+
+def anotar_contagens_status(ambientes):
+    """
+    Anota num_atividades, num_pendentes, num_concluidas e num_atrasadas
+    em um queryset de Ambiente lendo o resumo diário, sem varrer as atividades.
+    """
+    return ambientes.annotate(
+        num_atividades=_soma_resumo(),
+        num_pendentes=_soma_resumo('Pendente'),
+        num_concluidas=_soma_resumo('Concluído'),
+        num_atrasadas=_soma_resumo('Atrasado')
+    )
@@ -16,4 +16,13 @@ class EnderecoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Endereco 
         fields = '__all__'
-        read_only_fields = ['id']
\ No newline at end of file
+        read_only_fields = ['id']
+
+class EnderecoResumoSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Endereco
+        fields = ['id', 'rua', 'numero', 'cidade', 'estado', 'cep', 'complemento']
+
+class ClienteComEnderecosSerializer(ClienteSerializer):
+    """Cliente com os endereços embutidos, usado com ?expand=enderecos"""
+    enderecos = EnderecoResumoSerializer(many=True, read_only=True)
@@ -0,0 +1,73 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import indice_clientes
+from .models import Atividade, Cliente, Endereco
+from .resumo import ajustar_resumo
+from .versoes import invalidar_clientes
+
+
+@receiver(pre_save, sender=Atividade)
+def guardar_estado_anterior(sender, instance, raw=False, **kwargs):
+    """
+    Guarda ambiente, data e status atuais no banco para comparar no post_save.
+    A linha fica travada até o fim do save (Atividade.save é atômico): um save
+    concorrente espera, em vez de ler o mesmo estado anterior e ajustar o
+    resumo duas vezes.
+    """
+    instance._resumo_anterior = None
+    if raw or instance.pk is None:
+        return
+    instance._resumo_anterior = Atividade.objects.select_for_update().filter(pk=instance.pk).values_list(
+        'ambiente_id', 'data_prevista', 'status'
+    ).first()
+
+
+@receiver(post_save, sender=Atividade)
+def atualizar_resumo_ao_salvar(sender, instance, created, raw=False, **kwargs):
+    """
+    Mantém o resumo diário quando uma atividade é criada, remarcada
+    ou muda de status.
+    """
+    if raw:
+        return
+    atual = (instance.ambiente_id, instance.data_prevista, instance.status)
+    anterior = getattr(instance, '_resumo_anterior', None)
+    if anterior == atual:
+        return
+    if anterior:
+        ajustar_resumo(*anterior, -1)
+    ajustar_resumo(*atual, 1)
+
+
+@receiver(post_delete, sender=Atividade)
+def atualizar_resumo_ao_deletar(sender, instance, **kwargs):
+    ajustar_resumo(instance.ambiente_id, instance.data_prevista, instance.status, -1)
+
+
+@receiver(post_save, sender=Cliente)
+def indexar_cliente(sender, instance, raw=False, **kwargs):
+    """Mantém o índice de prefixos do autocomplete depois do commit."""
+    if raw or not indice_clientes.ATIVO:
+        return
+    pk, nome, email = instance.pk, instance.nome, instance.email
+    transaction.on_commit(lambda: indice_clientes.indice.atualizar(pk, nome, email))
+
+
+@receiver(post_delete, sender=Cliente)
+def desindexar_cliente(sender, instance, **kwargs):
+    if not indice_clientes.ATIVO:
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: indice_clientes.indice.remover(pk))
+
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+@receiver(post_save, sender=Endereco)
+@receiver(post_delete, sender=Endereco)
+def trocar_versao_clientes(sender, raw=False, **kwargs):
+    """Invalida os ETags da API de clientes, que também embute os endereços."""
+    if not raw:
+        invalidar_clientes()
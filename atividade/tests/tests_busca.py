@@ -0,0 +1,245 @@
+from unittest.mock import Mock, patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from atividade.busca import buscar_clientes, consulta_fts, normalizar
+from atividade.indice_clientes import CHAVE_GERACAO, IndicePrefixos, chaves_cliente, indice
+from atividade.models import Cliente, Endereco
+
+
+class BuscaClientesTestCase(TestCase):
+
+    def setUp(self):
+        self.jose = Cliente.objects.create(nome='José da Conceição', email='jose@exemplo.com')
+        self.maria = Cliente.objects.create(nome='Maria Araújo', email='maria.araujo@exemplo.com')
+        self.ana = Cliente.objects.create(nome='Ana Souza', email='contato.jose@empresa.com')
+
+    def nomes(self, termo, **kwargs):
+        return [cliente['nome'] for cliente in buscar_clientes(termo, **kwargs)]
+
+    def test_normalizar(self):
+        self.assertEqual(normalizar('João CONCEIÇÃO'), 'joao conceicao')
+
+    def test_consulta_fts_descarta_operadores(self):
+        self.assertEqual(consulta_fts('ana sou'), '"ana"* "sou"*')
+        self.assertEqual(consulta_fts('"ana" OR -x*'), '"ana"* "OR"* "x"*')
+        self.assertEqual(consulta_fts('"*'), '')
+
+    def test_ignora_acentos_e_maiusculas(self):
+        self.assertEqual(self.nomes('conceicao'), ['José da Conceição'])
+        self.assertEqual(self.nomes('ARAUJO'), ['Maria Araújo'])
+        self.assertEqual(self.nomes('araújo'), ['Maria Araújo'])
+
+    def test_prefixo_e_varias_palavras(self):
+        self.assertEqual(self.nomes('conc'), ['José da Conceição'])
+        self.assertEqual(self.nomes('ana sou'), ['Ana Souza'])
+        self.assertEqual(self.nomes('ana silva'), [])
+
+    def test_busca_no_email(self):
+        self.assertEqual(self.nomes('empresa'), ['Ana Souza'])
+
+    def test_nome_mais_relevante_que_email(self):
+        self.assertEqual(self.nomes('jose'), ['José da Conceição', 'Ana Souza'])
+
+    def test_limite(self):
+        self.assertEqual(len(buscar_clientes('exemplo', limite=1)), 1)
+
+    def test_acompanha_alteracoes_e_remocoes(self):
+        self.maria.nome = 'Maria Simões'
+        self.maria.save()
+        self.assertEqual(self.nomes('araujo'), ['Maria Simões'])  # ainda no email
+        self.assertEqual(self.nomes('simoes'), ['Maria Simões'])
+        self.jose.delete()
+        self.assertEqual(self.nomes('conceicao'), [])
+
+    def test_termo_vazio_ou_sem_palavras(self):
+        self.assertEqual(buscar_clientes('   '), [])
+        self.assertEqual(buscar_clientes('"*'), [])
+
+    def test_campos_devolvidos(self):
+        cliente = buscar_clientes('ana')[0]
+        self.assertEqual(set(cliente), {'id', 'nome', 'email', 'telefone', 'sobre'})
+
+
+class ClienteBuscaAPITestCase(TestCase):
+
+    def setUp(self):
+        self.api_client = APIClient()
+        User.objects.create_user(username='busca_api_user', password='123456')
+        self.api_client.login(username='busca_api_user', password='123456')
+        self.cliente = Cliente.objects.create(nome='Sebastião Galvão', email='sebastiao@exemplo.com')
+        Cliente.objects.create(nome='Outro Cliente', email='outro@exemplo.com')
+
+    def test_busca_sem_acento(self):
+        response = self.api_client.get(reverse('cliente-list'), {'search': 'galvao'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([cliente['id'] for cliente in response.json()], [self.cliente.id])
+
+    def test_listagem_sem_busca(self):
+        response = self.api_client.get(reverse('cliente-list'))
+        self.assertEqual([cliente['nome'] for cliente in response.json()], ['Outro Cliente', 'Sebastião Galvão'])
+
+    def test_detalhe_do_cliente(self):
+        response = self.api_client.get(reverse('cliente-detail', args=[self.cliente.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['nome'], 'Sebastião Galvão')
+        self.assertNotIn('enderecos', response.json())
+
+    def criar_enderecos(self):
+        outro = Cliente.objects.get(nome='Outro Cliente')
+        for cliente, rua in ((self.cliente, 'Rua A'), (self.cliente, 'Rua B'), (outro, 'Rua C')):
+            Endereco.objects.create(rua=rua, numero='10', cidade='João Pessoa', estado='PB', cep='58000-000',
+                                    cliente=cliente)
+
+    def consultas_de_enderecos(self, url, params):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.api_client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), sum('atividade_endereco' in consulta['sql'] for consulta in consultas)
+
+    def test_expand_enderecos_na_listagem(self):
+        self.criar_enderecos()
+        clientes, consultas = self.consultas_de_enderecos(reverse('cliente-list'), {'expand': 'enderecos'})
+        self.assertEqual(consultas, 1)
+        self.assertEqual([len(cliente['enderecos']) for cliente in clientes], [1, 2])
+        self.assertEqual(
+            clientes[1]['enderecos'][0],
+            {'id': clientes[1]['enderecos'][0]['id'], 'rua': 'Rua A', 'numero': '10', 'cidade': 'João Pessoa',
+             'estado': 'PB', 'cep': '58000-000', 'complemento': None}
+        )
+
+    def test_expand_enderecos_na_busca(self):
+        self.criar_enderecos()
+        clientes, consultas = self.consultas_de_enderecos(
+            reverse('cliente-list'), {'search': 'galvao', 'expand': 'enderecos'}
+        )
+        self.assertEqual(consultas, 1)
+        self.assertEqual([endereco['rua'] for endereco in clientes[0]['enderecos']], ['Rua A', 'Rua B'])
+
+    def test_expand_enderecos_no_detalhe(self):
+        self.criar_enderecos()
+        cliente, consultas = self.consultas_de_enderecos(
+            reverse('cliente-detail', args=[self.cliente.id]), {'expand': 'enderecos'}
+        )
+        self.assertEqual(consultas, 1)
+        self.assertEqual([endereco['rua'] for endereco in cliente['enderecos']], ['Rua A', 'Rua B'])
+
+    def test_sem_expand_nao_consulta_enderecos(self):
+        self.criar_enderecos()
+        clientes, consultas = self.consultas_de_enderecos(reverse('cliente-list'), {'expand': 'outro'})
+        self.assertEqual(consultas, 0)
+        self.assertNotIn('enderecos', clientes[0])
+
+
+class IndicePrefixosTestCase(TestCase):
+
+    def setUp(self):
+        self.indice = IndicePrefixos()
+        self.ana = Cliente.objects.create(nome='Ana de Souza', email='ana@exemplo.com')
+        self.souza = Cliente.objects.create(nome='Souza Lima', email='contato@lima.com')
+        self.joao = Cliente.objects.create(nome='João Simões', email='joao.simoes@exemplo.com')
+
+    def test_chaves_cliente(self):
+        self.assertEqual(
+            chaves_cliente('Ana de Souza', 'Ana@Exemplo.com'),
+            {'0ana de souza', '0ana@exemplo.com', '1de souza', '1souza'}
+        )
+
+    def test_busca_por_prefixo(self):
+        self.assertEqual(self.indice.buscar('JOAO s'), [self.joao.id])
+        self.assertEqual(self.indice.buscar('simões'), [self.joao.id])
+        self.assertEqual(self.indice.buscar('contato@'), [self.souza.id])
+        self.assertEqual(self.indice.buscar('ana de s'), [self.ana.id])
+        self.assertEqual(self.indice.buscar('xyz'), [])
+        self.assertIsNone(self.indice.buscar('   '))
+        self.assertIsNone(self.indice.buscar('a' * 65))
+
+    def test_comeco_do_nome_antes_das_outras_palavras(self):
+        self.assertEqual(self.indice.buscar('souza'), [self.souza.id, self.ana.id])
+        self.assertEqual(self.indice.buscar('souza', limite=1), [self.souza.id])
+
+    def test_alteracoes_incrementais(self):
+        self.indice.buscar('a')  # constrói a base
+        self.indice.atualizar(self.ana.id, 'Ana Brandão', 'ana@exemplo.com')
+        novo = Cliente.objects.create(nome='Brandão Neto', email='neto@exemplo.com')
+        self.indice.atualizar(novo.id, novo.nome, novo.email)
+        self.indice.remover(self.joao.id)
+
+        self.assertEqual(self.indice.buscar('brandao'), [novo.id, self.ana.id])
+        self.assertEqual(self.indice.buscar('ana de'), [])
+        self.assertEqual(self.indice.buscar('joao'), [])
+
+    def test_compacta_o_delta(self):
+        self.indice.buscar('a')
+        self.indice.LIMITE_DELTA = 2
+        self.indice.atualizar(self.ana.id, 'Ana Brandão', 'ana@exemplo.com')
+        _, novas, alterados = self.indice._estado
+        self.assertEqual((novas, alterados), ([], frozenset()))
+        self.assertEqual(len(self.indice), 9)
+        self.indice.remover(self.joao.id)
+        self.assertEqual(self.indice.buscar('brandao'), [self.ana.id])
+        self.assertEqual(self.indice.buscar('ana de'), [])
+        self.assertEqual(self.indice.buscar('joao'), [])
+
+    def test_carrega_clientes_de_outros_processos(self):
+        self.indice.buscar('a')
+        # bulk_create não dispara signals, como uma criação em outro processo
+        novo, = Cliente.objects.bulk_create([Cliente(nome='Inês Falcão', email='ines@exemplo.com')])
+        with patch('atividade.indice_clientes.INTERVALO_NOVOS', 0):
+            self.assertEqual(self.indice.buscar('falcao'), [novo.id])
+
+    @patch('atividade.indice_clientes.connections')
+    @patch('atividade.indice_clientes.INTERVALO_NOVOS', 0)
+    def test_reconstroi_quando_a_geracao_muda(self, _):
+        self.addCleanup(cache.delete, CHAVE_GERACAO)
+        self.indice.buscar('a')
+        # Renomeado sem signals, como na importação feita em outro processo
+        Cliente.objects.filter(pk=self.ana.pk).update(nome='Ana Brandão')
+        with patch('atividade.indice_clientes.threading.Thread') as thread:
+            thread.side_effect = lambda target, daemon: Mock(start=target)
+            self.assertEqual(self.indice.buscar('ana de'), [self.ana.id])
+            thread.assert_not_called()
+
+            cache.set(CHAVE_GERACAO, 'outra geração', None)
+            self.assertEqual(self.indice.buscar('brandao'), [self.ana.id])
+            self.assertEqual(self.indice.buscar('ana de'), [])
+            thread.assert_called_once()
+
+
+@patch('atividade.indice_clientes.ATIVO', True)
+class BuscaComIndiceTestCase(TestCase):
+
+    def setUp(self):
+        indice.limpar()
+        self.addCleanup(indice.limpar)
+        self.cliente = Cliente.objects.create(nome='Ana de Souza', email='ana@exemplo.com')
+
+    def test_responde_pelo_indice(self):
+        self.assertEqual(buscar_clientes('ana de')[0]['id'], self.cliente.id)
+        with self.assertNumQueries(1):  # apenas os clientes, pela chave primária
+            self.assertEqual(buscar_clientes('souz')[0]['nome'], 'Ana de Souza')
+
+    def test_banco_quando_o_indice_nao_encontra(self):
+        buscar_clientes('ana')
+        # As palavras fora de ordem não são prefixo de nenhuma chave
+        self.assertEqual([cliente['id'] for cliente in buscar_clientes('souza ana')], [self.cliente.id])
+
+    def test_signals_atualizam_o_indice(self):
+        buscar_clientes('ana')
+        with self.captureOnCommitCallbacks(execute=True):
+            novo = Cliente.objects.create(nome='Raimundo Galvão', email='raimundo@exemplo.com')
+            self.cliente.nome = 'Ana Magalhães'
+            self.cliente.save()
+        self.assertEqual(indice.buscar('galvao'), [novo.id])
+        self.assertEqual(indice.buscar('magalhaes'), [self.cliente.id])
+        self.assertEqual(indice.buscar('ana de'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            novo.delete()
+        self.assertEqual(indice.buscar('galvao'), [])
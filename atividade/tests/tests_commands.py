@@ -0,0 +1,174 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from ambiente.models import Ambiente
+from atividade.atrasos import marcar_atrasadas, marcar_lote_atrasado
+from atividade.models import Atividade, AtividadeDiaResumo, Cliente
+
+
+class BenchmarkIndicesCommandTestCase(TestCase):
+    """Testes para o comando benchmark_indices_atividade"""
+
+    def indices_atividade(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Atividade._meta.db_table)
+        return {nome for nome, info in constraints.items() if info['index']}
+
+    def test_benchmark_mostra_planos(self):
+        out = StringIO()
+        call_command('benchmark_indices_atividade', quantidade=40, ambientes=3, batch_size=15, stdout=out)
+        saida = out.getvalue()
+        self.assertEqual(Atividade.objects.count(), 40)
+        self.assertIn('== listagem do dia ==', saida)
+        self.assertIn('-- antes', saida)
+        self.assertIn('-- depois --', saida)
+
+    def test_benchmark_mantem_indices(self):
+        call_command('benchmark_indices_atividade', quantidade=10, ambientes=1, stdout=StringIO())
+        indices = self.indices_atividade()
+        for index in Atividade._meta.indexes:
+            self.assertIn(index.name, indices)
+
+    def test_benchmark_popula_resumo(self):
+        call_command('benchmark_indices_atividade', quantidade=25, ambientes=2, stdout=StringIO())
+        total = sum(AtividadeDiaResumo.objects.values_list('total', flat=True))
+        self.assertEqual(total, 25)
+
+    def test_benchmark_sem_dados(self):
+        err = StringIO()
+        call_command('benchmark_indices_atividade', stdout=StringIO(), stderr=err)
+        self.assertIn('Nenhuma atividade', err.getvalue())
+
+
+class AtualizarAtrasadasCommandTestCase(TestCase):
+    """Testes para o comando atualizar_atrasadas"""
+
+    def setUp(self):
+        usuario = User.objects.create_user(username='atrasos_admin', password='123456')
+        self.ambiente = Ambiente.objects.create(nome='Amb Atrasos', usuario_administrador=usuario)
+        self.agora = timezone.make_aware(datetime(2026, 3, 10, 12, 0))
+        self.ontem = self.agora.date() - timedelta(days=1)
+
+    def criar(self, data, hora, status='Pendente'):
+        return Atividade.objects.create(
+            valor=Decimal('10'), ambiente=self.ambiente, status=status,
+            data_prevista=data, hora_prevista=hora
+        )
+
+    def resumo(self, status):
+        return AtividadeDiaResumo.objects.filter(ambiente=self.ambiente, status=status).aggregate(
+            total=Sum('total'))['total'] or 0
+
+    def test_marca_apenas_pendentes_vencidas(self):
+        vencidas = [self.criar(self.ontem, time(9, 0)) for _ in range(3)]
+        vencida_hoje = self.criar(self.agora.date(), time(11, 59))
+        futura_hoje = self.criar(self.agora.date(), time(12, 30))
+        concluida = self.criar(self.ontem, time(9, 0), status='Concluído')
+
+        lotes = marcar_atrasadas(self.agora, batch_size=2)
+        self.assertEqual(lotes, [2, 2])
+        for atividade in vencidas + [vencida_hoje]:
+            atividade.refresh_from_db()
+            self.assertEqual(atividade.status, 'Atrasado')
+        futura_hoje.refresh_from_db()
+        concluida.refresh_from_db()
+        self.assertEqual(futura_hoje.status, 'Pendente')
+        self.assertEqual(concluida.status, 'Concluído')
+        self.assertEqual(marcar_atrasadas(self.agora), [])
+
+    def test_mantem_resumo_consistente(self):
+        for _ in range(3):
+            self.criar(self.ontem, time(9, 0))
+        self.criar(self.agora.date(), time(18, 0))
+        marcar_atrasadas(self.agora)
+        self.assertEqual(self.resumo('Pendente'), 1)
+        self.assertEqual(self.resumo('Atrasado'), 3)
+
+        AtividadeDiaResumo.objects.all().delete()
+        call_command('reconstruir_resumo_atividades', stdout=StringIO())
+        self.assertEqual(self.resumo('Pendente'), 1)
+        self.assertEqual(self.resumo('Atrasado'), 3)
+
+    def test_um_update_por_lote(self):
+        for _ in range(4):
+            self.criar(self.ontem, time(9, 0))
+        AtividadeDiaResumo.objects.create(ambiente=self.ambiente, data_prevista=self.ontem,
+                                          status='Atrasado', total=0)
+        # SAVEPOINT, SELECT, UPDATE das atividades, UPDATE do resumo Pendente,
+        # UPDATE do resumo Atrasado (já existente) e RELEASE
+        with self.assertNumQueries(6):
+            self.assertEqual(marcar_lote_atrasado(self.agora), 4)
+
+    def resumo_por_dia(self):
+        return sorted(AtividadeDiaResumo.objects.filter(total__gt=0).values_list('data_prevista', 'status', 'total'))
+
+    def editar_durante_o_lote(self, atualizar):
+        """Simula outra requisição editando atividades entre o SELECT e o UPDATE do lote"""
+        concluida, remarcada = Atividade.objects.order_by('id')[:2]
+
+        def editar_e_atualizar(*args):
+            concluida.status = 'Concluído'
+            concluida.save()
+            remarcada.data_prevista = self.ontem - timedelta(days=1)
+            remarcada.save()
+            return atualizar(*args)
+        return editar_e_atualizar
+
+    def verificar_edicao_concorrente(self, funcao, atualizadas):
+        from atividade import atrasos
+
+        for _ in range(4):
+            self.criar(self.ontem, time(9, 0))
+        original = getattr(atrasos, funcao)
+        with patch.object(atrasos, funcao, self.editar_durante_o_lote(original)):
+            self.assertEqual(marcar_lote_atrasado(self.agora), atualizadas)
+
+        resumo = self.resumo_por_dia()
+        AtividadeDiaResumo.objects.all().delete()
+        call_command('reconstruir_resumo_atividades', stdout=StringIO())
+        self.assertEqual(resumo, self.resumo_por_dia())
+        self.assertEqual(self.resumo('Atrasado'), atualizadas)
+
+    def test_edicao_concorrente_com_returning(self):
+        # A remarcada continua vencida e é marcada já com a nova data
+        self.verificar_edicao_concorrente('_atualizar_retornando', 3)
+
+    def test_edicao_concorrente_sem_returning(self):
+        # A remarcada saiu do grupo (ambiente, dia) lido e fica para o próximo lote
+        with patch.object(connection.features, 'can_return_columns_from_insert', False):
+            self.verificar_edicao_concorrente('_atualizar_por_grupo', 2)
+
+    def test_comando_uma_vez(self):
+        self.criar(self.ontem, time(9, 0))
+        out = StringIO()
+        call_command('atualizar_atrasadas', uma_vez=True, stdout=out)
+        self.assertIn('1 atividade(s) marcada(s) como atrasada(s) em 1 lote(s)', out.getvalue())
+        self.assertEqual(Atividade.objects.get().status, 'Atrasado')
+
+
+class BenchmarkBuscaClientesCommandTestCase(TestCase):
+    """Testes para o comando benchmark_busca_clientes"""
+
+    def test_mede_e_desfaz_os_dados(self):
+        out = StringIO()
+        call_command('benchmark_busca_clientes', clientes=50, termos=['silva', 'joao'], repeticoes=2, stdout=out)
+        saida = out.getvalue()
+        self.assertIn('50 clientes criados', saida)
+        self.assertIn('atual p95', saida)
+        self.assertIn('joao', saida)
+        self.assertFalse(Cliente.objects.exists())
+
+    def test_relatorio_do_indice(self):
+        out = StringIO()
+        call_command('benchmark_busca_clientes', clientes=50, termos=['maria'], repeticoes=2, indice=True, stdout=out)
+        saida = out.getvalue()
+        self.assertIn('MB por 100 mil clientes', saida)
+        self.assertIn('índice p50 (µs)', saida)
@@ -0,0 +1,143 @@
+import asyncio
+import csv
+import io
+import threading
+from datetime import date, time
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.shortcuts import resolve_url
+from django.urls import reverse
+
+from ambiente.models import Ambiente, Participante
+from atividade.exportacao import CABECALHO, em_thread_dedicada, gerar_csv
+from atividade.models import Atividade, Cliente, Endereco
+
+
+class ExportarAtividadesTestCase(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='export_admin', password='123456')
+        self.client.login(username='export_admin', password='123456')
+        self.ambiente = Ambiente.objects.create(nome='Ambiente Exportação', usuario_administrador=self.admin)
+        self.url = reverse('exportar_atividades', args=[self.ambiente.id])
+        self.cliente = Cliente.objects.create(nome='Maria Souza', email='maria@exemplo.com', telefone='8399', sobre='')
+        Endereco.objects.create(cliente=self.cliente, rua='Rua A', numero='10', cidade='JP', estado='PB', cep='58000')
+        Endereco.objects.create(cliente=self.cliente, rua='Rua B', cidade='JP', estado='PB', cep='58001')
+        self.atividade = self.criar_atividade(descricao='Poda', cliente=self.cliente, hora=time(9, 30))
+        self.ambiente.usuarios_participantes.add(User.objects.create_user(username='export_membro', password='123456'))
+        self.atividade.participantes_alocados.add(Participante.objects.get(ambiente=self.ambiente))
+
+    def criar_atividade(self, descricao, cliente=None, hora=time(10, 0)):
+        return Atividade.objects.create(
+            descricao=descricao, valor=Decimal('150.50'), ambiente=self.ambiente, cliente=cliente,
+            data_prevista=date(2026, 3, 1), hora_prevista=hora,
+        )
+
+    def ler(self, response, delimitador=','):
+        conteudo = b''.join(response.streaming_content).decode('utf-8-sig')
+        return list(csv.reader(io.StringIO(conteudo), delimiter=delimitador))
+
+    def test_exporta_atividades_com_cliente_enderecos_e_participantes(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="atividades-ambiente-exportacao-', response['Content-Disposition'])
+        cabecalho, linha = self.ler(response)
+        self.assertEqual(cabecalho, CABECALHO)
+        self.assertEqual(linha, [
+            str(self.atividade.id), '2026-03-01', '09:30', 'Pendente', 'Poda', '150.50', '0.00', 'não',
+            'Maria Souza', 'maria@exemplo.com', '8399',
+            'Rua A, 10 - JP/PB, 58000 | Rua B - JP/PB, 58001', 'export_membro',
+        ])
+
+    def test_apenas_atividades_do_ambiente_em_ordem(self):
+        outro = Ambiente.objects.create(nome='Outro', usuario_administrador=self.admin)
+        Atividade.objects.create(
+            descricao='De outro ambiente', valor=Decimal('1'), ambiente=outro,
+            data_prevista=date(2026, 3, 1), hora_prevista=time(8, 0),
+        )
+        self.criar_atividade('Sem cliente', hora=time(8, 0))
+        linhas = self.ler(self.client.get(self.url))[1:]
+        self.assertEqual([linha[4] for linha in linhas], ['Sem cliente', 'Poda'])
+        self.assertEqual(linhas[0][8:], [''] * 5)
+
+    def test_formato_excel(self):
+        conteudo = b''.join(self.client.get(self.url + '?formato=excel').streaming_content)
+        self.assertTrue(conteudo.startswith('﻿'.encode()))
+        linha = self.ler(self.client.get(self.url + '?formato=excel'), ';')[1]
+        self.assertEqual(linha[5], '150,50')
+
+    def test_texto_que_parece_formula_e_escapado(self):
+        self.criar_atividade('=HYPERLINK("http://exemplo")', hora=time(11, 0))
+        linha = self.ler(self.client.get(self.url))[2]
+        self.assertEqual(linha[4], '\'=HYPERLINK("http://exemplo")')
+
+    def test_consultas_nao_crescem_com_as_atividades(self):
+        def contar():
+            with CaptureQueriesContext(connection) as consultas:
+                self.ler(self.client.get(self.url))
+            return len(consultas)
+
+        antes = contar()
+        for i in range(20):
+            atividade = self.criar_atividade(f'Extra {i}', cliente=self.cliente)
+            atividade.participantes_alocados.add(*self.atividade.participantes_alocados.all())
+        self.assertEqual(contar(), antes)
+
+    def test_sem_acesso_ao_ambiente(self):
+        User.objects.create_user(username='export_intruso', password='123456')
+        self.client.login(username='export_intruso', password='123456')
+        response = self.client.get(self.url)
+        self.assertRedirects(response, reverse('lista_ambientes'), fetch_redirect_response=False)
+
+    def test_exige_login(self):
+        self.client.logout()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith(resolve_url(settings.LOGIN_URL)))
+
+
+class EmThreadDedicadaTestCase(TestCase):
+
+    def consumir(self, pedacos, quantos=None):
+        async def consumir():
+            recebidos = []
+            gerador = em_thread_dedicada(pedacos)
+            async for pedaco in gerador:
+                recebidos.append(pedaco)
+                if len(recebidos) == quantos:
+                    break
+            await gerador.aclose()
+            return recebidos
+        return asyncio.run(consumir())
+
+    def test_entrega_os_pedacos_em_ordem(self):
+        pedacos = self.consumir(gerar_csv(iter([])))
+        self.assertEqual(pedacos, [(','.join(CABECALHO) + '\r\n').encode()])
+        self.assertEqual(self.consumir(iter([b'a', b'b', b'c'])), [b'a', b'b', b'c'])
+
+    def test_repassa_o_erro_do_gerador(self):
+        def falha():
+            yield b'a'
+            raise ValueError('falhou')
+        with self.assertRaises(ValueError):
+            self.consumir(falha())
+
+    def test_cliente_desconectado_encerra_a_thread(self):
+        encerrado = threading.Event()
+
+        def infinito():
+            try:
+                while True:
+                    yield b'x'
+            finally:
+                encerrado.set()
+
+        self.assertEqual(self.consumir(infinito(), quantos=2), [b'x', b'x'])
+        self.assertTrue(encerrado.wait(5))
+
@@ -0,0 +1,175 @@
+import io
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+
+from atividade.busca import buscar_clientes
+from atividade.importacao import ErroImportacao, ResumoImportacao, importar_clientes
+from atividade.indice_clientes import CHAVE_GERACAO
+from atividade.models import Cliente, Endereco
+from atividade.versoes import versao_clientes
+
+
+CABECALHO = 'nome,email,telefone,rua,numero,cidade,estado,cep\n'
+
+
+def importar(conteudo, **kwargs):
+    total = ResumoImportacao()
+    lotes = list(importar_clientes(io.StringIO(conteudo), **kwargs))
+    for lote in lotes:
+        total.somar(lote)
+    return total, lotes
+
+
+class ImportacaoClientesTestCase(TestCase):
+
+    def test_cria_clientes_e_enderecos(self):
+        total, _ = importar(
+            CABECALHO
+            + 'José Simões,jose@exemplo.com,8399999,Rua A,10,João Pessoa,PB,58000-000\n'
+            + 'Ana Lima,ana@exemplo.com,,,,,,\n'
+        )
+        self.assertEqual((total.linhas, total.criados, total.atualizados, total.enderecos), (2, 2, 0, 1))
+        jose = Cliente.objects.get(email='jose@exemplo.com')
+        self.assertEqual((jose.nome, jose.telefone), ('José Simões', '8399999'))
+        endereco = jose.enderecos.get()
+        self.assertEqual((endereco.rua, endereco.numero, endereco.complemento), ('Rua A', '10', None))
+        self.assertFalse(Cliente.objects.get(email='ana@exemplo.com').enderecos.exists())
+        # A busca (FTS5 no SQLite) enxerga os clientes importados
+        self.assertEqual(buscar_clientes('simoes')[0]['email'], 'jose@exemplo.com')
+
+    def test_upsert_pelo_email_sem_duplicar_enderecos(self):
+        cliente = Cliente.objects.create(nome='Nome Antigo', email='jose@exemplo.com', telefone='1', sobre='Sobre')
+        Endereco.objects.create(rua='Rua A', numero='10', cidade='João Pessoa', estado='PB', cep='58000-000',
+                                cliente=cliente)
+        conteudo = (
+            CABECALHO
+            + 'Nome Novo,jose@exemplo.com,2,Rua A,10,João Pessoa,PB,58000-000\n'
+            + 'Nome Novo,jose@exemplo.com,2,Rua B,,Campina Grande,PB,58400-000\n'
+        )
+        total, _ = importar(conteudo)
+        self.assertEqual((total.criados, total.atualizados, total.enderecos, total.enderecos_repetidos), (0, 1, 1, 1))
+        cliente.refresh_from_db()
+        # Colunas ausentes no arquivo (sobre) não são alteradas
+        self.assertEqual((cliente.nome, cliente.telefone, cliente.sobre), ('Nome Novo', '2', 'Sobre'))
+
+        total, _ = importar(conteudo)
+        self.assertEqual((total.enderecos, total.enderecos_repetidos), (0, 2))
+        self.assertEqual(Endereco.objects.count(), 2)
+        self.assertEqual(Cliente.objects.count(), 1)
+
+    def test_email_repetido_no_arquivo_vale_a_ultima_linha(self):
+        total, _ = importar(
+            CABECALHO
+            + 'Primeira,rep@exemplo.com,,Rua A,,Cidade,PB,1\n'
+            + 'Segunda,rep@exemplo.com,,Rua B,,Cidade,PB,2\n'
+        )
+        self.assertEqual((total.criados, total.enderecos), (1, 2))
+        self.assertEqual(Cliente.objects.get().nome, 'Segunda')
+
+    def test_linhas_invalidas_sao_ignoradas(self):
+        total, _ = importar(
+            CABECALHO
+            + 'Válido,ok@exemplo.com,,,,,,\n'
+            + ',vazio@exemplo.com,,,,,,\n'
+            + 'Email Ruim,nao-e-email,,,,,,\n'
+            + 'Sem Cidade,cidade@exemplo.com,,Rua A,,,PB,1\n'
+            + 'Telefone,tel@exemplo.com,' + '9' * 30 + ',,,,,\n'
+        )
+        self.assertEqual((total.linhas, total.criados, total.invalidas), (5, 1, 4))
+        self.assertEqual([erro.split(':')[0] for erro in total.erros], ['linha 3', 'linha 4', 'linha 5', 'linha 6'])
+        self.assertIn('email', total.erros[1])
+        self.assertIn('cidade', total.erros[2])
+        self.assertEqual(list(Cliente.objects.values_list('email', flat=True)), ['ok@exemplo.com'])
+
+    def test_lotes(self):
+        linhas = ''.join(f'Cliente {i},c{i}@exemplo.com,,,,,,\n' for i in range(5))
+        total, lotes = importar(CABECALHO + linhas, batch_size=2)
+        self.assertEqual([lote.linhas for lote in lotes], [2, 2, 1])
+        self.assertEqual(total.criados, 5)
+        self.assertGreater(total.linhas_por_segundo, 0)
+
+    def test_delimitador_e_cabecalho(self):
+        total, _ = importar('nome ; email\nAna;ana@exemplo.com\n', delimitador=';')
+        self.assertEqual(total.criados, 1)
+        with self.assertRaises(ErroImportacao):
+            importar('nome,telefone\nAna,1\n')
+
+    def test_troca_a_versao_da_api(self):
+        versao = versao_clientes()
+        importar(CABECALHO + 'Ana,ana@exemplo.com,,,,,,\n')
+        self.assertNotEqual(versao_clientes(), versao)
+
+    @patch('atividade.indice_clientes.ATIVO', True)
+    def test_troca_a_geracao_do_indice(self):
+        self.addCleanup(cache.delete, CHAVE_GERACAO)
+        geracao = cache.get(CHAVE_GERACAO)
+        with self.captureOnCommitCallbacks(execute=True):
+            importar(CABECALHO + 'Ana,ana@exemplo.com,,,,,,\n')
+        self.assertNotEqual(cache.get(CHAVE_GERACAO), geracao)
+
+
+class ImportarClientesCommandTestCase(TestCase):
+
+    def arquivo(self, conteudo):
+        descritor, caminho = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(descritor, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(conteudo)
+        self.addCleanup(os.remove, caminho)
+        return caminho
+
+    def test_importa_e_relata(self):
+        caminho = self.arquivo(CABECALHO + 'Ana,ana@exemplo.com,,,,,,\nRuim,ruim,,,,,,\nBia,bia@exemplo.com,,,,,,\n')
+        out, err = io.StringIO(), io.StringIO()
+        call_command('importar_clientes', caminho, batch_size=2, stdout=out, stderr=err)
+        self.assertIn('lote 1: 2 linha(s)', out.getvalue())
+        self.assertIn('lote 2: 1 linha(s)', out.getvalue())
+        self.assertIn('linhas/s', out.getvalue())
+        self.assertIn('2 cliente(s) criado(s)', out.getvalue())
+        self.assertIn('linha 3: email', err.getvalue())
+        self.assertEqual(Cliente.objects.count(), 2)
+
+    def test_arquivo_invalido(self):
+        with self.assertRaises(CommandError):
+            call_command('importar_clientes', self.arquivo('nome\nAna\n'), stdout=io.StringIO())
+        with self.assertRaises(CommandError):
+            call_command('importar_clientes', '/nao/existe.csv', stdout=io.StringIO())
+
+
+class ImportarClientesAdminTestCase(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='import_admin', password='123456', email='a@a.com')
+        self.client.login(username='import_admin', password='123456')
+        self.url = reverse('admin:atividade_cliente_importar')
+
+    def test_link_na_listagem(self):
+        response = self.client.get(reverse('admin:atividade_cliente_changelist'))
+        self.assertContains(response, self.url)
+
+    def test_upload(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        arquivo = SimpleUploadedFile('clientes.csv', (CABECALHO + 'Inês,ines@exemplo.com,,Rua A,,Cidade,PB,1\n').encode())
+        response = self.client.post(self.url, {'arquivo': arquivo, 'delimitador': ','}, follow=True)
+        self.assertRedirects(response, reverse('admin:atividade_cliente_changelist'))
+        self.assertContains(response, 'Importação concluída')
+        self.assertEqual(Cliente.objects.get().enderecos.count(), 1)
+
+    def test_upload_sem_colunas_obrigatorias(self):
+        arquivo = SimpleUploadedFile('clientes.csv', b'nome\nAna\n')
+        response = self.client.post(self.url, {'arquivo': arquivo, 'delimitador': ','}, follow=True)
+        self.assertContains(response, 'Importação interrompida')
+        self.assertFalse(Cliente.objects.exists())
+
+    def test_exige_permissao(self):
+        User.objects.create_user(username='staff_sem_permissao', password='123456', is_staff=True)
+        self.client.login(username='staff_sem_permissao', password='123456')
+        self.assertEqual(self.client.get(self.url).status_code, 403)
@@ -4,8 +4,12 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth.models import User
 from decimal import Decimal
 from datetime import date, time, timedelta
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.db.models import QuerySet
 
-from atividade.models import Atividade, Referencia, Cliente, Endereco
+from atividade.models import Atividade, AtividadeDiaResumo, Referencia, Cliente, Endereco
 from ambiente.models import Ambiente, Participante, Role
 
 
@@ -372,3 +376,85 @@ class AtividadeModelsAdicionaisTestCase(TestCase):
             data_prevista=date.today(), hora_prevista=time(23, 59)
         )
         self.assertEqual(atividade.hora_prevista, time(23, 59))
+
+
+
+class AtividadeDiaResumoTestCase(TestCase):
+    """Testes para o resumo diário mantido pelos signals de Atividade"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='resumo_user', password='123')
+        self.ambiente = Ambiente.objects.create(nome='Amb Resumo', usuario_administrador=self.user)
+        self.hoje = date.today()
+
+    def criar_atividade(self, **kwargs):
+        dados = {
+            'valor': Decimal('10'), 'ambiente': self.ambiente,
+            'data_prevista': self.hoje, 'hora_prevista': time(10, 0)
+        }
+        dados.update(kwargs)
+        return Atividade.objects.create(**dados)
+
+    def total(self, data, status='Pendente'):
+        resumo = AtividadeDiaResumo.objects.filter(
+            ambiente=self.ambiente, data_prevista=data, status=status
+        ).first()
+        return resumo.total if resumo else 0
+
+    def test_resumo_criacao(self):
+        self.criar_atividade()
+        self.criar_atividade()
+        self.assertEqual(self.total(self.hoje), 2)
+
+    def test_resumo_remarcacao(self):
+        atividade = self.criar_atividade()
+        amanha = self.hoje + timedelta(days=1)
+        atividade.data_prevista = amanha
+        atividade.save()
+        self.assertEqual(self.total(self.hoje), 0)
+        self.assertEqual(self.total(amanha), 1)
+
+    def test_resumo_mudanca_status(self):
+        atividade = self.criar_atividade()
+        atividade.status = 'Concluído'
+        atividade.save()
+        self.assertEqual(self.total(self.hoje, 'Pendente'), 0)
+        self.assertEqual(self.total(self.hoje, 'Concluído'), 1)
+
+    def test_resumo_save_sem_mudanca(self):
+        atividade = self.criar_atividade()
+        atividade.descricao = 'Nova descrição'
+        atividade.save()
+        self.assertEqual(self.total(self.hoje), 1)
+
+    def test_resumo_trava_o_estado_anterior(self):
+        atividade = self.criar_atividade()
+        atividade.status = 'Concluído'
+        with patch.object(QuerySet, 'select_for_update', autospec=True,
+                          side_effect=QuerySet.select_for_update) as travar:
+            atividade.save()
+        travar.assert_called_once()
+        self.assertEqual(self.total(self.hoje, 'Concluído'), 1)
+
+    def test_resumo_delete(self):
+        atividade = self.criar_atividade()
+        self.criar_atividade()
+        atividade.delete()
+        self.assertEqual(self.total(self.hoje), 1)
+
+    def test_resumo_delete_ambiente(self):
+        self.criar_atividade()
+        self.ambiente.delete()
+        self.assertFalse(AtividadeDiaResumo.objects.exists())
+
+    def test_reconstruir_resumo_command(self):
+        self.criar_atividade()
+        self.criar_atividade(status='Atrasado')
+        AtividadeDiaResumo.objects.all().delete()
+        Atividade.objects.filter(status='Pendente').update(status='Concluído')
+        out = StringIO()
+        call_command('reconstruir_resumo_atividades', stdout=out)
+        self.assertEqual(self.total(self.hoje, 'Concluído'), 1)
+        self.assertEqual(self.total(self.hoje, 'Atrasado'), 1)
+        self.assertEqual(self.total(self.hoje, 'Pendente'), 0)
+        self.assertIn('2 linha(s)', out.getvalue())
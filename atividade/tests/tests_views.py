@@ -1,9 +1,13 @@
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.urls import reverse
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.utils import timezone
-from datetime import date, time
-from unittest.mock import patch
+from datetime import date, time, timedelta
+import json
+from unittest.mock import ANY, patch
 from django.core.files.uploadedfile import SimpleUploadedFile
 from decimal import Decimal
 from rest_framework.test import APIClient
@@ -11,6 +15,7 @@ from rest_framework import status
 
 from atividade.models import Atividade, Cliente, Endereco, Referencia
 from ambiente.models import Ambiente, Participante, Role
+from atividade.versoes import CHAVE_VERSAO_CLIENTES, TEMPO_VERSAO_CLIENTES
 
 
 class AtividadeViewsTestCase(TestCase):
@@ -139,6 +144,29 @@ class AtividadeViewsTestCase(TestCase):
         response = self.client.get(url)
         self.assertIn('atividades', response.context)
 
+    @patch('atividade.views.AtividadePermissionMixin.get_user_permissions', return_value={})
+    def test_atividades_por_ambiente_contagem_por_dia(self, _):
+        Atividade.objects.create(
+            descricao='Amanhã', valor=Decimal('10.00'), ambiente=self.ambiente,
+            data_prevista=date.today() + timedelta(days=1), hora_prevista=time(9, 0)
+        )
+        url = reverse('atividades_por_ambiente', kwargs={'ambiente_id': self.ambiente.id})
+        response = self.client.get(url)
+        atividades_por_dia = json.loads(response.context['atividades_por_dia'])
+        self.assertEqual(len(atividades_por_dia), 61)
+        self.assertEqual(atividades_por_dia[date.today().isoformat()], 1)
+        self.assertEqual(atividades_por_dia[(date.today() + timedelta(days=1)).isoformat()], 1)
+        self.assertEqual(atividades_por_dia[(date.today() - timedelta(days=1)).isoformat()], 0)
+
+    @patch('atividade.views.AtividadePermissionMixin.get_user_permissions', return_value={})
+    def test_atividades_por_ambiente_orcamento_consultas(self, _):
+        # O calendário não pode voltar a fazer uma contagem por dia (61 consultas)
+        url = reverse('atividades_por_ambiente', kwargs={'ambiente_id': self.ambiente.id})
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(consultas), 15)
+
     def test_atividades_por_ambiente_sem_login(self):
         self.client.logout()
         url = reverse('atividades_por_ambiente', kwargs={'ambiente_id': self.ambiente.id})
@@ -434,6 +462,96 @@ class ClienteAPITestCase(TestCase):
         self.assertIn(response.status_code, [201, 400, 405])
 
 
+class ClienteAPIPaginacaoTestCase(TestCase):
+    """Paginação por cursor e ETag da API de clientes"""
+
+    def setUp(self):
+        cache.clear()
+        self.api_client = APIClient()
+        User.objects.create_user(username='cliente_pag_user', password='123456')
+        self.api_client.login(username='cliente_pag_user', password='123456')
+        # Dois clientes com o mesmo nome: o id desempata a ordenação
+        for nome, email in [('Carla', 'c1@e.com'), ('Ana', 'a@e.com'), ('Bruno', 'b@e.com'),
+                            ('Carla', 'c2@e.com'), ('Daniel', 'd@e.com')]:
+            Cliente.objects.create(nome=nome, email=email)
+
+    def proxima_url(self, response):
+        link = response.get('Link')
+        if not link:
+            return None
+        self.assertTrue(link.endswith('>; rel="next"'))
+        return link[1:link.index('>')]
+
+    def test_percorre_as_paginas_por_cursor(self):
+        url = reverse('cliente-list') + '?page_size=2'
+        emails = []
+        paginas = 0
+        while url:
+            response = self.api_client.get(url)
+            self.assertEqual(response.status_code, 200)
+            emails += [cliente['email'] for cliente in response.json()]
+            url = self.proxima_url(response)
+            paginas += 1
+        self.assertEqual(paginas, 3)
+        self.assertEqual(emails, ['a@e.com', 'b@e.com', 'c1@e.com', 'c2@e.com', 'd@e.com'])
+
+    def test_cursor_invalido_retorna_a_primeira_pagina(self):
+        response = self.api_client.get(reverse('cliente-list'), {'cursor': 'invalido', 'page_size': 1})
+        self.assertEqual([cliente['nome'] for cliente in response.json()], ['Ana'])
+
+    def test_page_size_limitado(self):
+        response = self.api_client.get(reverse('cliente-list'), {'page_size': 'abc'})
+        self.assertEqual(len(response.json()), 5)
+        self.assertIsNone(response.get('Link'))
+        response = self.api_client.get(reverse('cliente-list'), {'search': 'carla', 'page_size': 1})
+        self.assertEqual(len(response.json()), 1)
+
+    def test_304_sem_consultar_clientes(self):
+        url = reverse('cliente-list') + '?page_size=2'
+        response = self.api_client.get(url)
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse(any('atividade_cliente' in consulta['sql'] for consulta in consultas))
+
+        outra = self.api_client.get(reverse('cliente-list') + '?page_size=3')
+        self.assertNotEqual(outra['ETag'], etag)
+
+    def test_alteracoes_trocam_o_etag(self):
+        url = reverse('cliente-list')
+        detalhe = reverse('cliente-detail', args=[Cliente.objects.get(email='a@e.com').id])
+        etag = self.api_client.get(url)['ETag']
+        etag_detalhe = self.api_client.get(detalhe)['ETag']
+        self.assertEqual(self.api_client.get(detalhe, HTTP_IF_NONE_MATCH=etag_detalhe).status_code, 304)
+
+        cliente = Cliente.objects.get(email='b@e.com')
+        cliente.nome = 'Bruna'
+        cliente.save()
+        response = self.api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Bruna', [cliente['nome'] for cliente in response.json()])
+        self.assertEqual(self.api_client.get(detalhe, HTTP_IF_NONE_MATCH=etag_detalhe).status_code, 200)
+
+        etag = response['ETag']
+        Endereco.objects.create(rua='Rua', cidade='C', estado='PB', cep='1', cliente=cliente)
+        self.assertEqual(self.api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_versao_expira(self):
+        # Outro processo, com outro cache, só vê a troca quando a versão expira
+        url = reverse('cliente-list')
+        cache.delete(CHAVE_VERSAO_CLIENTES)
+        with patch.object(cache, 'add', wraps=cache.add) as adicionar:
+            etag = self.api_client.get(url)['ETag']
+        adicionar.assert_called_once_with(CHAVE_VERSAO_CLIENTES, ANY, TEMPO_VERSAO_CLIENTES)
+        self.assertEqual(self.api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        cache.delete(CHAVE_VERSAO_CLIENTES)
+        self.assertEqual(self.api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
 class EnderecoAPITestCase(TestCase):
     """Testes para API de Endereco"""
 
@@ -466,3 +584,393 @@ class EnderecoAPITestCase(TestCase):
         response = self.api_client.get(url)
         self.assertIn(response.status_code, [200, 404])
 
+
+
+class CalendarioAPITestCase(TestCase):
+    """Testes para a API de contagem de atividades por dia"""
+
+    def setUp(self):
+        self.api_client = APIClient()
+        self.user = User.objects.create_user(username='calendario_api_user', password='123456')
+        self.outro = User.objects.create_user(username='calendario_api_outro', password='123456')
+        self.api_client.login(username='calendario_api_user', password='123456')
+        self.ambiente = Ambiente.objects.create(nome='Amb Calendário', usuario_administrador=self.user)
+        self.hoje = date.today()
+        for dias in [0, 0, 5]:
+            Atividade.objects.create(
+                descricao='Cal', valor=Decimal('10'), ambiente=self.ambiente,
+                data_prevista=self.hoje + timedelta(days=dias), hora_prevista=time(10, 0)
+            )
+        self.url = reverse('ambiente-calendario-list', kwargs={'ambiente_id': self.ambiente.id})
+
+    def test_calendario_contagens(self):
+        inicio = self.hoje - timedelta(days=1)
+        fim = self.hoje + timedelta(days=10)
+        response = self.api_client.get(self.url, {'inicio': inicio.isoformat(), 'fim': fim.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['dias'], {
+            self.hoje.isoformat(): 2,
+            (self.hoje + timedelta(days=5)).isoformat(): 1,
+        })
+
+    def test_calendario_cabecalhos_cache(self):
+        response = self.api_client.get(self.url)
+        self.assertIn('ETag', response)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('max-age', response['Cache-Control'])
+
+    def test_calendario_etag_304(self):
+        etag = self.api_client.get(self.url)['ETag']
+        response = self.api_client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_calendario_etag_muda_com_atividade(self):
+        etag = self.api_client.get(self.url)['ETag']
+        Atividade.objects.create(
+            descricao='Nova', valor=Decimal('10'), ambiente=self.ambiente,
+            data_prevista=self.hoje, hora_prevista=time(11, 0)
+        )
+        response = self.api_client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_calendario_sem_permissao(self):
+        self.api_client.login(username='calendario_api_outro', password='123456')
+        response = self.api_client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+
+    def test_calendario_participante(self):
+        self.ambiente.usuarios_participantes.add(self.outro)
+        self.api_client.login(username='calendario_api_outro', password='123456')
+        response = self.api_client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_calendario_ambiente_inexistente(self):
+        url = reverse('ambiente-calendario-list', kwargs={'ambiente_id': 99999})
+        response = self.api_client.get(url)
+        self.assertEqual(response.status_code, 404)
+
+    def test_calendario_data_invalida(self):
+        response = self.api_client.get(self.url, {'inicio': '2025-13-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_calendario_intervalo_invertido(self):
+        response = self.api_client.get(self.url, {'inicio': '2025-02-01', 'fim': '2025-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_calendario_intervalo_muito_grande(self):
+        response = self.api_client.get(self.url, {'inicio': '2024-01-01', 'fim': '2025-06-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_calendario_sem_login(self):
+        self.api_client.logout()
+        response = self.api_client.get(self.url)
+        self.assertIn(response.status_code, [401, 403])
+
+
+class AtividadesPaginacaoCursorTestCase(TestCase):
+    """Testes para a paginação por cursor da listagem de atividades"""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='cursor_user', password='123456')
+        self.client.login(username='cursor_user', password='123456')
+        self.ambiente = Ambiente.objects.create(nome='Amb Cursor', usuario_administrador=self.user)
+        self.hoje = date.today()
+        self.atividades = [
+            Atividade.objects.create(
+                descricao=f'Cursor {hora}', valor=Decimal('10'), ambiente=self.ambiente,
+                data_prevista=self.hoje, hora_prevista=time(hora, 0)
+            )
+            for hora in [8, 9, 9, 10, 11]
+        ]
+        self.url = reverse('atividades_por_ambiente', kwargs={'ambiente_id': self.ambiente.id})
+
+    def ids(self, response):
+        return [atividade.id for atividade in response.context['atividades']]
+
+    def test_cursor_primeira_pagina(self):
+        response = self.client.get(self.url, {'cursor': '', 'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.ids(response), [a.id for a in self.atividades[:2]])
+        self.assertFalse(response.context['pagina_cursor'].tem_anterior)
+        self.assertTrue(response.context['pagina_cursor'].tem_proxima)
+
+    def test_cursor_percorre_todas_paginas(self):
+        vistos = []
+        cursor = ''
+        while cursor is not None:
+            response = self.client.get(self.url, {'cursor': cursor, 'page_size': 2})
+            vistos.extend(self.ids(response))
+            cursor = response.context['pagina_cursor'].proximo_cursor
+        self.assertEqual(vistos, [a.id for a in self.atividades])
+
+    def test_cursor_pagina_anterior(self):
+        primeira = self.client.get(self.url, {'cursor': '', 'page_size': 2})
+        segunda = self.client.get(self.url, {'cursor': primeira.context['pagina_cursor'].proximo_cursor, 'page_size': 2})
+        volta = self.client.get(self.url, {'cursor': segunda.context['pagina_cursor'].cursor_anterior, 'page_size': 2})
+        self.assertEqual(self.ids(volta), self.ids(primeira))
+        self.assertFalse(volta.context['pagina_cursor'].tem_anterior)
+
+    def test_cursor_sem_count(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(self.url, {'cursor': '', 'page_size': 2})
+        self.assertFalse(any(
+            'COUNT(' in consulta['sql'] and '"atividade_atividade"' in consulta['sql']
+            for consulta in consultas.captured_queries
+        ))
+
+    def test_cursor_invalido_volta_primeira_pagina(self):
+        response = self.client.get(self.url, {'cursor': 'invalido!', 'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.ids(response), [a.id for a in self.atividades[:2]])
+
+    def test_page_size_configuravel(self):
+        response = self.client.get(self.url, {'page_size': 3})
+        self.assertEqual(len(response.context['atividades']), 3)
+        self.assertEqual(response.context['mostrando_fim'], 3)
+
+    def test_page_size_limite(self):
+        response = self.client.get(self.url, {'page_size': 1000})
+        self.assertEqual(response.context['paginator'].per_page, 50)
+
+
+class MapaIdentidadeTestCase(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.admin = User.objects.create_user(username='mapa_admin', password='123456')
+        self.leitor = User.objects.create_user(username='mapa_leitor', password='123456')
+        self.ambiente = Ambiente.objects.create(nome='Amb Mapa', usuario_administrador=self.admin)
+        self.ambiente.usuarios_participantes.add(self.leitor)
+        self.atividade = Atividade.objects.create(
+            descricao='Atividade Mapa', valor=Decimal('10'), ambiente=self.ambiente,
+            data_prevista=date.today(), hora_prevista=time(9, 0)
+        )
+
+    def consultas_por_pk(self, consultas, tabela):
+        return [
+            consulta['sql'] for consulta in consultas.captured_queries
+            if consulta['sql'].startswith('SELECT') and f'FROM "{tabela}"' in consulta['sql']
+            and f'"{tabela}"."id" = ' in consulta['sql']
+        ]
+
+    def test_mapa_reaproveita_instancia(self):
+        from planit.identidade import MapaIdentidade
+        mapa = MapaIdentidade()
+        with self.assertNumQueries(1):
+            primeira = mapa.obter(Ambiente, self.ambiente.id)
+            segunda = mapa.obter(Ambiente, str(self.ambiente.id))
+        self.assertIs(primeira, segunda)
+        self.assertEqual(mapa.relatorio()['consultas'], 1)
+        self.assertEqual(mapa.relatorio()['reaproveitados'], 1)
+
+    def test_mapa_registra_relacionados(self):
+        from planit.identidade import MapaIdentidade
+        mapa = MapaIdentidade()
+        atividade = mapa.obter(Atividade, self.atividade.id, Atividade.objects.select_related('ambiente'))
+        with self.assertNumQueries(0):
+            self.assertIs(mapa.obter(Ambiente, self.ambiente.id), atividade.ambiente)
+
+    def test_mapa_memoriza_ausencia(self):
+        from planit.identidade import MapaIdentidade
+        mapa = MapaIdentidade()
+        with self.assertRaises(Ambiente.DoesNotExist):
+            mapa.obter(Ambiente, 99999)
+        with self.assertNumQueries(0):
+            with self.assertRaises(Ambiente.DoesNotExist):
+                mapa.obter(Ambiente, 99999)
+            with self.assertRaises(Ambiente.DoesNotExist):
+                mapa.obter(Ambiente, 'abc')
+
+    def test_editar_carrega_atividade_uma_vez(self):
+        self.client.login(username='mapa_admin', password='123456')
+        url = reverse('editar_atividade', kwargs={'atividade_id': self.atividade.id})
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.consultas_por_pk(consultas, 'atividade_atividade')), 1)
+        self.assertEqual(len(self.consultas_por_pk(consultas, 'ambiente_ambiente')), 0)
+
+    def test_atividades_por_ambiente_carrega_ambiente_uma_vez(self):
+        self.client.login(username='mapa_admin', password='123456')
+        url = reverse('atividades_por_ambiente', kwargs={'ambiente_id': self.ambiente.id})
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.consultas_por_pk(consultas, 'ambiente_ambiente')), 1)
+
+    def test_relatorio_no_cabecalho_com_debug(self):
+        self.client.login(username='mapa_admin', password='123456')
+        url = reverse('editar_atividade', kwargs={'atividade_id': self.atividade.id})
+        with self.settings(DEBUG=True):
+            response = self.client.get(url)
+        self.assertIn('reaproveitados=', response['X-Mapa-Identidade'])
+        self.assertIn('atividade.Atividade=1/', response['X-Mapa-Identidade'])
+
+    def test_relatorio_ausente_sem_debug(self):
+        self.client.login(username='mapa_admin', password='123456')
+        url = reverse('editar_atividade', kwargs={'atividade_id': self.atividade.id})
+        response = self.client.get(url)
+        self.assertNotIn('X-Mapa-Identidade', response)
+
+    def test_middleware_sync_e_async(self):
+        import asyncio
+        from asgiref.sync import iscoroutinefunction
+        from django.http import HttpResponse
+        from django.test import AsyncRequestFactory
+        from planit.identidade import MapaIdentidade, MapaIdentidadeMiddleware
+
+        self.assertFalse(iscoroutinefunction(MapaIdentidadeMiddleware(lambda request: HttpResponse())))
+
+        async def get_response(request):
+            return HttpResponse()
+
+        middleware = MapaIdentidadeMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = AsyncRequestFactory().get('/')
+        self.assertEqual(asyncio.run(middleware(request)).status_code, 200)
+        self.assertIsInstance(request.mapa_identidade, MapaIdentidade)
+
+    def test_leitor_nao_edita(self):
+        self.client.login(username='mapa_leitor', password='123456')
+        url = reverse('editar_atividade', kwargs={'atividade_id': self.atividade.id})
+        response = self.client.get(url)
+        self.assertRedirects(
+            response,
+            reverse('atividades_por_ambiente', kwargs={'ambiente_id': self.ambiente.id}),
+            fetch_redirect_response=False
+        )
+
+    def test_leitor_nao_deleta(self):
+        self.client.login(username='mapa_leitor', password='123456')
+        url = reverse('deletar_atividade', kwargs={'atividade_id': self.atividade.id})
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Atividade.objects.filter(id=self.atividade.id).exists())
+
+    def test_leitor_nao_cria(self):
+        self.client.login(username='mapa_leitor', password='123456')
+        url = reverse('criar_atividade') + f'?ambiente_id={self.ambiente.id}'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+
+
+class AlocacaoNotificacoesTestCase(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.admin = User.objects.create_user(username='aloc_admin', password='123456')
+        self.client.login(username='aloc_admin', password='123456')
+        self.ambiente = Ambiente.objects.create(nome='Amb Alocação', usuario_administrador=self.admin)
+        self.ambiente.usuarios_participantes.add(*[
+            User.objects.create_user(username=f'aloc_{i}', password='123456') for i in range(8)
+        ])
+        self.participantes = list(Participante.objects.filter(ambiente=self.ambiente))
+
+    def dados(self, participantes):
+        return {
+            'descricao': 'Atividade alocada',
+            'valor': '10.00',
+            'valor_recebido': '0.00',
+            'data_prevista': date.today().isoformat(),
+            'hora_prevista': '10:00',
+            'status': 'Pendente',
+            'participantes': [p.id for p in participantes],
+            'referencia-TOTAL_FORMS': '0',
+            'referencia-INITIAL_FORMS': '0',
+            'endereco-TOTAL_FORMS': '0',
+            'endereco-INITIAL_FORMS': '0',
+        }
+
+    def inserts(self, consultas, tabela):
+        return [
+            c['sql'] for c in consultas.captured_queries
+            if c['sql'].startswith('INSERT') and f'"{tabela}"' in c['sql']
+        ]
+
+    def test_criar_enfileira_e_worker_notifica(self):
+        from ambiente.fila_notificacoes import processar_lote
+        from ambiente.models import EventoNotificacao, Notificacao
+        url = reverse('criar_atividade') + f'?ambiente_id={self.ambiente.id}'
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.post(url, self.dados(self.participantes))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.inserts(consultas, 'ambiente_notificacao'), [])
+        self.assertEqual(len(self.inserts(consultas, 'ambiente_eventonotificacao')), 1)
+        self.assertEqual(processar_lote(), (1, 0))
+        self.assertEqual(Notificacao.objects.count(), 8)
+        self.assertEqual(EventoNotificacao.objects.get().status, EventoNotificacao.STATUS_CONCLUIDO)
+
+    def test_editar_enfileira_apenas_novos(self):
+        from ambiente.fila_notificacoes import processar_lote
+        from ambiente.models import Notificacao
+        atividade = Atividade.objects.create(
+            descricao='Atividade alocada', valor=Decimal('10'), ambiente=self.ambiente,
+            data_prevista=date.today(), hora_prevista=time(10, 0)
+        )
+        atividade.participantes_alocados.set(self.participantes[:3])
+        url = reverse('editar_atividade', kwargs={'atividade_id': atividade.id})
+        response = self.client.post(url, self.dados(self.participantes))
+        self.assertEqual(response.status_code, 302)
+        processar_lote()
+        self.assertEqual(
+            set(Notificacao.objects.values_list('usuario_id', flat=True)),
+            {p.usuario_id for p in self.participantes[3:]}
+        )
+
+    def test_falha_depois_de_enfileirar_desfaz_atividade_e_evento(self):
+        from django.db import DatabaseError
+        from ambiente.models import EventoNotificacao
+        url = reverse('criar_atividade') + f'?ambiente_id={self.ambiente.id}'
+        with patch('atividade.views.ReferenciaFormSet.save', side_effect=DatabaseError('falhou')):
+            with self.assertRaises(DatabaseError):
+                self.client.post(url, self.dados(self.participantes))
+        self.assertFalse(Atividade.objects.filter(ambiente=self.ambiente).exists())
+        self.assertFalse(EventoNotificacao.objects.exists())
+
+    def test_falha_ao_editar_desfaz_alocacao_e_evento(self):
+        from django.db import DatabaseError
+        from ambiente.models import EventoNotificacao
+        atividade = Atividade.objects.create(
+            descricao='Atividade alocada', valor=Decimal('10'), ambiente=self.ambiente,
+            data_prevista=date.today(), hora_prevista=time(10, 0)
+        )
+        atividade.participantes_alocados.set(self.participantes[:3])
+        url = reverse('editar_atividade', kwargs={'atividade_id': atividade.id})
+        with patch('atividade.views.ReferenciaFormSet.save', side_effect=DatabaseError('falhou')):
+            with self.assertRaises(DatabaseError):
+                self.client.post(url, self.dados(self.participantes))
+        self.assertEqual(set(atividade.participantes_alocados.all()), set(self.participantes[:3]))
+        self.assertFalse(EventoNotificacao.objects.exists())
+
+    def test_membro_removido_nao_e_listado_nem_alocado(self):
+        from ambiente.fila_notificacoes import processar_lote
+        from ambiente.models import Notificacao
+        removido = self.participantes[0]
+        self.ambiente.usuarios_participantes.remove(removido.usuario)
+
+        url = reverse('criar_atividade') + f'?ambiente_id={self.ambiente.id}'
+        self.assertNotIn(removido, self.client.get(url).context['participantes_ambiente'])
+        response = self.client.post(url, self.dados([removido, self.participantes[1]]))
+        self.assertEqual(response.status_code, 302)
+        atividade = Atividade.objects.get(ambiente=self.ambiente)
+        self.assertEqual(list(atividade.participantes_alocados.all()), [self.participantes[1]])
+
+        url = reverse('editar_atividade', kwargs={'atividade_id': atividade.id})
+        self.assertNotIn(removido, self.client.get(url).context['participantes_ambiente'])
+        self.client.post(url, self.dados([removido, self.participantes[1]]))
+        self.assertEqual(list(atividade.participantes_alocados.all()), [self.participantes[1]])
+
+        processar_lote()
+        self.assertFalse(Notificacao.objects.filter(usuario=removido.usuario).exists())
+
+    def test_removido_depois_de_enfileirar_nao_e_notificado(self):
+        from ambiente.fila_notificacoes import processar_lote
+        from ambiente.models import Notificacao
+        url = reverse('criar_atividade') + f'?ambiente_id={self.ambiente.id}'
+        self.client.post(url, self.dados(self.participantes[:2]))
+        self.ambiente.usuarios_participantes.remove(self.participantes[0].usuario)
+        processar_lote()
+        self.assertEqual(
+            list(Notificacao.objects.values_list('usuario_id', flat=True)), [self.participantes[1].usuario_id]
+        )
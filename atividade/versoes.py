@@ -0,0 +1,36 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+CHAVE_VERSAO_CLIENTES = 'clientes:versao'
+
+# Tempo, em segundos, que uma versão vale. Com um cache por processo, é o
+# atraso máximo para um processo ver a troca feita em outro
+TEMPO_VERSAO_CLIENTES = getattr(settings, 'CLIENTES_VERSAO_TIMEOUT', 60)
+
+
+def versao_clientes():
+    """
+    Versão atual da tabela de clientes (e seus endereços), trocada a cada
+    alteração. Entra no ETag das respostas da API de clientes.
+    """
+    versao = cache.get(CHAVE_VERSAO_CLIENTES)
+    if versao is None:
+        cache.add(CHAVE_VERSAO_CLIENTES, uuid.uuid4().hex, TEMPO_VERSAO_CLIENTES)
+        versao = cache.get(CHAVE_VERSAO_CLIENTES, '')
+    return versao
+
+
+def invalidar_clientes():
+    """
+    Troca a versão agora e de novo no commit: uma leitura feita antes do
+    commit não fica com a versão nova.
+    """
+    def trocar():
+        cache.set(CHAVE_VERSAO_CLIENTES, uuid.uuid4().hex, TEMPO_VERSAO_CLIENTES)
+
+    trocar()
+    transaction.on_commit(trocar)
@@ -1,10 +1,13 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
+from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, View
 from django.urls import reverse_lazy
 from django.utils import timezone
-from django.http import JsonResponse, FileResponse, Http404
-from django.db.models import Q
+from django.http import JsonResponse, FileResponse, Http404, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.text import slugify
 from datetime import timedelta, datetime
+from django.db import transaction
+from django.db.models import Prefetch
 import os
 import mimetypes
 from .models import Atividade, Cliente, Referencia, Endereco
@@ -14,25 +17,106 @@ import json
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from .mixins import AmbientePermissionMixin, AtividadePermissionMixin
-from rest_framework import viewsets, permissions
-from .serializers import ClienteSerializer, EnderecoSerializer
+from .calendario import JANELA_CALENDARIO_DIAS, MAXIMO_DIAS_INTERVALO, contar_atividades_por_dia
+from .paginacao import paginar_clientes, paginar_por_cursor
+from .versoes import versao_clientes
+from .exportacao import FORMATOS, atividades_para_exportar, em_thread_dedicada, gerar_csv
+from .busca import CAMPOS_CLIENTE, CAMPOS_ENDERECO, anexar_enderecos, buscar_clientes
+from rest_framework import viewsets, permissions, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+import hashlib
+from functools import partial
+from .serializers import ClienteComEnderecosSerializer, ClienteSerializer, EnderecoSerializer
 from django.contrib import messages
-from ambiente.models import Participante, Role
+from ambiente.models import Participante
+from ambiente.fila_notificacoes import enfileirar_alocacao_atividade
+from ambiente.permissoes import PodeAcessarAmbiente
 
 class ClienteViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Clientes para o autocomplete do formulário de atividade.
+
+    GET /api/clientes/?cursor=...&page_size=20 pagina por (nome, id); o
+    cursor da próxima página vem no cabeçalho Link (rel="next"). Com
+    ?search=termo, retorna os `page_size` (padrão 10) mais relevantes.
+    As respostas têm ETag derivado da versão da tabela de clientes e voltam
+    304, sem consultar nem serializar, enquanto nada mudar.
+    """
     queryset = Cliente.objects.all()
     serializer_class = ClienteSerializer
     permission_classes = [permissions.IsAuthenticated]
+    page_size = 20
+    page_size_busca = 10
+    max_page_size = 100
+
+    def expandir_enderecos(self):
+        """?expand=enderecos embute os endereços de cada cliente na resposta"""
+        return 'enderecos' in self.request.query_params.get('expand', '').split(',')
+
+    def get_page_size(self, padrao):
+        try:
+            page_size = int(self.request.query_params.get('page_size', padrao))
+        except ValueError:
+            return padrao
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_serializer_class(self):
+        if self.expandir_enderecos():
+            return ClienteComEnderecosSerializer
+        return super().get_serializer_class()
 
     def get_queryset(self):
-        """Permitir busca por nome ou email via parâmetro 'search'"""
         queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = queryset.values(*CAMPOS_CLIENTE)
+        elif self.expandir_enderecos():
+            queryset = queryset.prefetch_related(
+                Prefetch('enderecos', queryset=Endereco.objects.only(*CAMPOS_ENDERECO, 'cliente_id').order_by('id'))
+            )
+        return queryset
+
+    def resposta_condicional(self, request, montar):
+        """Responde 304 se If-None-Match traz o ETag atual; senão, a resposta de `montar()`."""
+        chave = f'{versao_clientes()}|{request.get_full_path()}'
+        etag = quote_etag(hashlib.md5(chave.encode()).hexdigest())
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = montar()
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Cookie'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        """Permitir busca por nome ou email via parâmetro 'search'"""
+        return self.resposta_condicional(request, self.montar_listagem)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.resposta_condicional(request, partial(super().retrieve, request, *args, **kwargs))
+
+    def montar_listagem(self):
         search = self.request.query_params.get('search', '').strip()
+        proximo_cursor = None
         if search:
-            queryset = queryset.filter(Q(nome__icontains=search) | Q(email__icontains=search))
-        limit = 10 if search else 20
-        queryset = queryset.values('id', 'nome', 'email', 'telefone', 'sobre').order_by('nome')[:limit]
-        return queryset
+            clientes = buscar_clientes(search, limite=self.get_page_size(self.page_size_busca))
+        else:
+            pagina = paginar_clientes(
+                self.get_queryset(), self.request.query_params.get('cursor'), self.get_page_size(self.page_size)
+            )
+            clientes, proximo_cursor = pagina.itens, pagina.proximo_cursor
+        if self.expandir_enderecos():
+            clientes = anexar_enderecos(clientes)
+
+        response = Response(self.get_serializer(clientes, many=True).data)
+        if proximo_cursor:
+            proxima = replace_query_param(self.request.build_absolute_uri(), 'cursor', proximo_cursor)
+            response['Link'] = f'<{proxima}>; rel="next"'
+        return response
 
 class EnderecoViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = EnderecoSerializer
@@ -44,11 +128,74 @@ class EnderecoViewSet(viewsets.ReadOnlyModelViewSet):
             'id', 'rua', 'cidade', 'estado', 'cep', 'complemento'
         )
 
+class CalendarioAmbienteViewSet(viewsets.ViewSet):
+    """
+    Contagem de atividades por dia de um ambiente, para o calendário horizontal.
+
+    GET /api/ambientes/<id>/calendario/?inicio=AAAA-MM-DD&fim=AAAA-MM-DD
+    Retorna apenas os dias com atividades e responde 304 quando o ETag
+    enviado em If-None-Match ainda é válido.
+    """
+    permission_classes = [permissions.IsAuthenticated, PodeAcessarAmbiente]
+    cache_max_age = 60
+
+    def _parse_data(self, nome, padrao):
+        valor = self.request.query_params.get(nome)
+        if not valor:
+            return padrao
+        try:
+            return datetime.strptime(valor, '%Y-%m-%d').date()
+        except ValueError:
+            raise ValidationError({nome: 'Data inválida, use o formato AAAA-MM-DD.'})
+
+    def list(self, request, ambiente_id=None):
+        hoje = timezone.now().date()
+        inicio = self._parse_data('inicio', hoje - timedelta(days=JANELA_CALENDARIO_DIAS))
+        fim = self._parse_data('fim', inicio + timedelta(days=2 * JANELA_CALENDARIO_DIAS))
+        if fim < inicio:
+            raise ValidationError({'fim': 'A data final deve ser igual ou posterior à inicial.'})
+        if (fim - inicio).days >= MAXIMO_DIAS_INTERVALO:
+            raise ValidationError({'fim': f'O intervalo máximo é de {MAXIMO_DIAS_INTERVALO} dias.'})
+
+        dados = {
+            'inicio': inicio.isoformat(),
+            'fim': fim.isoformat(),
+            'dias': contar_atividades_por_dia(int(ambiente_id), inicio, fim, incluir_vazios=False),
+        }
+        etag = quote_etag(hashlib.md5(json.dumps(dados, sort_keys=True).encode()).hexdigest())
+
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(dados)
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, max_age=self.cache_max_age)
+        patch_vary_headers(response, ['Cookie'])
+        return response
+
 class AtividadesPorAmbienteView(LoginRequiredMixin, AmbientePermissionMixin, AtividadePermissionMixin, ListView):
     model = Atividade
     template_name = 'atividade/atividades_por_ambiente.html'
     context_object_name = 'atividades'
     paginate_by = 2
+    max_paginate_by = 50
+
+    def modo_cursor(self):
+        """Paginação por cursor (keyset) quando a URL traz o parâmetro `cursor`"""
+        return 'cursor' in self.request.GET
+
+    def get_paginate_by(self, queryset):
+        try:
+            page_size = int(self.request.GET.get('page_size', self.paginate_by))
+        except ValueError:
+            return self.paginate_by
+        return max(1, min(page_size, self.max_paginate_by))
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.modo_cursor():
+            return super().paginate_queryset(queryset, page_size)
+        self.pagina_cursor = paginar_por_cursor(queryset, self.request.GET.get('cursor'), page_size)
+        return (None, None, self.pagina_cursor.itens, True)
 
     def get_queryset(self):
         ambiente_id = self.kwargs.get('ambiente_id')
@@ -91,7 +238,7 @@ class AtividadesPorAmbienteView(LoginRequiredMixin, AmbientePermissionMixin, Ati
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         ambiente_id = self.kwargs.get('ambiente_id')
-        ambiente = get_object_or_404(Ambiente, id=ambiente_id)
+        ambiente = self.get_ambiente(ambiente_id)
         context['ambiente'] = ambiente
         
         permissoes = self.get_user_permissions(ambiente)
@@ -110,28 +257,35 @@ class AtividadesPorAmbienteView(LoginRequiredMixin, AmbientePermissionMixin, Ati
         if selected_date_str:
             context['selected_date'] = selected_date_str
         
-        atividades_por_dia = {}
-        for i in range(-30, 31):
-            data = base_date + timedelta(days=i)
-            count = Atividade.objects.filter(
-                ambiente__id=ambiente_id,
-                data_prevista=data
-            ).count()
-            atividades_por_dia[data.isoformat()] = count
-        
+        atividades_por_dia = contar_atividades_por_dia(
+            ambiente_id,
+            base_date - timedelta(days=JANELA_CALENDARIO_DIAS),
+            base_date + timedelta(days=JANELA_CALENDARIO_DIAS)
+        )
+
         context['atividades_por_dia'] = json.dumps(atividades_por_dia)
         context['base_date'] = base_date.isoformat()
+        context['janela_calendario_dias'] = JANELA_CALENDARIO_DIAS
         
         page_obj = context.get('page_obj')
         if page_obj:
+            per_page = page_obj.paginator.per_page
             context['total_atividades'] = page_obj.paginator.count
-            context['mostrando_inicio'] = (page_obj.number - 1) * self.paginate_by + 1
-            context['mostrando_fim'] = min(page_obj.number * self.paginate_by, page_obj.paginator.count)
+            context['mostrando_inicio'] = (page_obj.number - 1) * per_page + 1
+            context['mostrando_fim'] = min(page_obj.number * per_page, page_obj.paginator.count)
+
+        if self.modo_cursor():
+            context['pagina_cursor'] = self.pagina_cursor
+            filtros = self.request.GET.copy()
+            filtros.pop('cursor', None)
+            filtros.pop('page', None)
+            context['filtros_cursor'] = filtros.urlencode()
         
         return context
 
 class AtividadeDetailView(LoginRequiredMixin, AmbientePermissionMixin, AtividadePermissionMixin, DetailView):
     model = Atividade
+    queryset = Atividade.objects.select_related('ambiente', 'cliente')
     template_name = 'atividade/detalhe.html'
     context_object_name = 'atividade'
     pk_url_kwarg = 'atividade_id'
@@ -158,22 +312,10 @@ class AtividadeCreateView(LoginRequiredMixin, AmbientePermissionMixin, Atividade
     template_name = 'atividade/form.html'
     success_url = reverse_lazy('lista_atividades')
     
-    def dispatch(self, request, *args, **kwargs):
-        response = super().dispatch(request, *args, **kwargs)
-        if isinstance(response, JsonResponse) or hasattr(response, 'status_code'):
-            return response
-        
-        ambiente_id = request.GET.get('ambiente_id')
-        if ambiente_id:
-            try:
-                ambiente = Ambiente.objects.get(id=ambiente_id)
-                if not self.verificar_permissao_criar(ambiente):
-                    messages.error(request, 'Você não tem permissão para criar atividades neste ambiente.')
-                    return redirect('atividades_por_ambiente', ambiente_id=ambiente_id)
-            except Ambiente.DoesNotExist:
-                pass
-        
-        return response
+    mensagem_sem_permissao_acao = 'Você não tem permissão para criar atividades neste ambiente.'
+
+    def verificar_permissao_acao(self, ambiente):
+        return self.verificar_permissao_criar(ambiente)
     
     def get_success_url(self):
         ambiente_id = self.request.GET.get('ambiente_id')
@@ -189,7 +331,7 @@ class AtividadeCreateView(LoginRequiredMixin, AmbientePermissionMixin, Atividade
         ambiente_id = self.request.GET.get('ambiente_id')
         if ambiente_id:
             try:
-                ambiente = Ambiente.objects.get(id=ambiente_id)
+                ambiente = self.mapa_identidade.obter(Ambiente, ambiente_id)
                 context['ambiente'] = ambiente
             except Ambiente.DoesNotExist:
                 return reverse_lazy('lista_atividades')
@@ -218,23 +360,16 @@ class AtividadeCreateView(LoginRequiredMixin, AmbientePermissionMixin, Atividade
             context['referencia_formset'] = ReferenciaFormSet(prefix='referencia')
         
         if ambiente_id:
-            
-            ambiente_obj = Ambiente.objects.get(id=ambiente_id)
-            for user in ambiente_obj.usuarios_participantes.all():
-                role_leitor = Role.objects.filter(ambiente=ambiente_obj, nome=Role.LEITOR).first()
-                Participante.objects.get_or_create(
-                    usuario=user,
-                    ambiente=ambiente_obj,
-                    defaults={'role': role_leitor}
-                )
-            
+            # Participante de quem saiu do ambiente é mantido, mas não pode ser alocado
             context['participantes_ambiente'] = Participante.objects.filter(
-                ambiente_id=ambiente_id
+                ambiente_id=ambiente_id, usuario__ambientes_participantes=ambiente_id
             ).select_related('usuario', 'role')
         
         return context
     
+    @transaction.atomic
     def form_valid(self, form):
+        # Atividade, alocações e evento do outbox gravados juntos ou nenhum deles
         ambiente_id = self.request.GET.get('ambiente_id')
         
         context = self.get_context_data()
@@ -247,7 +382,7 @@ class AtividadeCreateView(LoginRequiredMixin, AmbientePermissionMixin, Atividade
             return self.form_invalid(form)
         
         try:
-            ambiente = Ambiente.objects.get(id=ambiente_id)
+            ambiente = self.mapa_identidade.obter(Ambiente, ambiente_id)
         except Ambiente.DoesNotExist:
             form.add_error(None, 'Ambiente inválido')
             return self.form_invalid(form)
@@ -298,32 +433,18 @@ class AtividadeCreateView(LoginRequiredMixin, AmbientePermissionMixin, Atividade
         participantes_ids = self.request.POST.getlist('participantes')
         novos_participantes = []
         if participantes_ids:
-            from ambiente.models import Participante
-            participantes = Participante.objects.filter(
+            participantes = list(Participante.objects.filter(
                 id__in=participantes_ids,
-                ambiente=ambiente
-            )
+                ambiente=ambiente,
+                usuario__ambientes_participantes=ambiente
+            ))
             self.object.participantes_alocados.set(participantes)
-            novos_participantes = list(participantes)
+            novos_participantes = participantes
         else:
             self.object.participantes_alocados.clear()
         
         if novos_participantes:
-            from ambiente.models import Notificacao
-            from django.urls import reverse
-            
-            descricao_curta = (self.object.descricao[:50] + '...') if self.object.descricao and len(self.object.descricao) > 50 else (self.object.descricao or 'Sem descrição')
-            
-            for participante in novos_participantes:
-                Notificacao.objects.create(
-                    usuario=participante.usuario,
-                    tipo=Notificacao.TIPO_ALOCACAO_ATIVIDADE,
-                    titulo=f'Você foi alocado em uma atividade',
-                    mensagem=f'Você foi alocado na atividade "{descricao_curta}" no ambiente "{ambiente.nome}".',
-                    link=reverse('detalhe_atividade', kwargs={'atividade_id': self.object.id}),
-                    atividade=self.object,
-                    ambiente=ambiente
-                )
+            enfileirar_alocacao_atividade(self.object, novos_participantes)
         
         referencia_formset.instance = self.object
         referencia_formset.save()
@@ -340,20 +461,11 @@ class AtividadeUpdateView(LoginRequiredMixin, AmbientePermissionMixin, Atividade
     form_class = AtividadeForm
     template_name = 'atividade/form.html'
     pk_url_kwarg = 'atividade_id'
-    
-    def dispatch(self, request, *args, **kwargs):
-        # Primeiro executa o dispatch do AmbientePermissionMixin
-        response = super().dispatch(request, *args, **kwargs)
-        if isinstance(response, JsonResponse) or hasattr(response, 'status_code'):
-            return response
-        
-        # Verificar permissão de editar
-        atividade = self.get_object()
-        if not self.verificar_permissao_editar(atividade.ambiente):
-            messages.error(request, 'Você não tem permissão para editar atividades neste ambiente.')
-            return redirect('atividades_por_ambiente', ambiente_id=atividade.ambiente.id)
-        
-        return response
+    queryset = Atividade.objects.select_related('ambiente', 'cliente')
+    mensagem_sem_permissao_acao = 'Você não tem permissão para editar atividades neste ambiente.'
+
+    def verificar_permissao_acao(self, ambiente):
+        return self.verificar_permissao_editar(ambiente)
     
     def get_success_url(self):
         atividade = self.get_object()
@@ -385,23 +497,17 @@ class AtividadeUpdateView(LoginRequiredMixin, AmbientePermissionMixin, Atividade
         context['atividade'] = atividade
         context['ambiente'] = atividade.ambiente
         
-        for user in atividade.ambiente.usuarios_participantes.all():
-            role_leitor = Role.objects.filter(ambiente=atividade.ambiente, nome=Role.LEITOR).first()
-            Participante.objects.get_or_create(
-                usuario=user,
-                ambiente=atividade.ambiente,
-                defaults={'role': role_leitor}
-            )
-        
         context['participantes_ambiente'] = Participante.objects.filter(
-            ambiente=atividade.ambiente
+            ambiente=atividade.ambiente, usuario__ambientes_participantes=atividade.ambiente
         ).select_related('usuario', 'role')
         
         context['participantes_alocados'] = list(atividade.participantes_alocados.values_list('id', flat=True))
         
         return context
     
+    @transaction.atomic
     def form_valid(self, form):
+        # Atividade, alocações e evento do outbox gravados juntos ou nenhum deles
         context = self.get_context_data()
         cliente_form = context['cliente_form']
         endereco_formset = context['endereco_formset']
@@ -453,38 +559,23 @@ class AtividadeUpdateView(LoginRequiredMixin, AmbientePermissionMixin, Atividade
         participantes_ids = self.request.POST.getlist('participantes')
         # Filter out empty strings
         participantes_ids = [pid for pid in participantes_ids if pid]
-        participantes_antigos = set(self.object.participantes_alocados.all())
+        ids_antigos = set(self.object.participantes_alocados.values_list('id', flat=True))
         novos_participantes = []
         
         if participantes_ids:
-            from ambiente.models import Participante
-            participantes = Participante.objects.filter(
+            participantes = list(Participante.objects.filter(
                 id__in=participantes_ids,
-                ambiente=self.object.ambiente
-            )
+                ambiente=self.object.ambiente,
+                usuario__ambientes_participantes=self.object.ambiente
+            ))
             self.object.participantes_alocados.set(participantes)
             
-            participantes_atuais = set(participantes)
-            novos_participantes = list(participantes_atuais - participantes_antigos)
+            novos_participantes = [p for p in participantes if p.id not in ids_antigos]
         else:
             self.object.participantes_alocados.clear()
         
         if novos_participantes:
-            from ambiente.models import Notificacao
-            from django.urls import reverse
-            
-            descricao_curta = (self.object.descricao[:50] + '...') if self.object.descricao and len(self.object.descricao) > 50 else (self.object.descricao or 'Sem descrição')
-            
-            for participante in novos_participantes:
-                Notificacao.objects.create(
-                    usuario=participante.usuario,
-                    tipo=Notificacao.TIPO_ALOCACAO_ATIVIDADE,
-                    titulo=f'Você foi alocado em uma atividade',
-                    mensagem=f'Você foi alocado na atividade "{descricao_curta}" no ambiente "{self.object.ambiente.nome}".',
-                    link=reverse('detalhe_atividade', kwargs={'atividade_id': self.object.id}),
-                    atividade=self.object,
-                    ambiente=self.object.ambiente
-                )
+            enfileirar_alocacao_atividade(self.object, novos_participantes)
         
         referencia_formset.instance = self.object
         referencia_formset.save()
@@ -502,20 +593,11 @@ class AtividadeDeleteView(LoginRequiredMixin, AmbientePermissionMixin, Atividade
     context_object_name = 'atividade'
     pk_url_kwarg = 'atividade_id'
     success_url = reverse_lazy('lista_atividades')
-    
-    def dispatch(self, request, *args, **kwargs):
-        # Primeiro executa o dispatch do AmbientePermissionMixin
-        response = super().dispatch(request, *args, **kwargs)
-        if isinstance(response, JsonResponse) or hasattr(response, 'status_code'):
-            return response
-        
-        # Verificar permissão de deletar
-        atividade = self.get_object()
-        if not self.verificar_permissao_deletar(atividade.ambiente):
-            messages.error(request, 'Você não tem permissão para deletar atividades neste ambiente.')
-            return redirect('atividades_por_ambiente', ambiente_id=atividade.ambiente.id)
-        
-        return response
+    queryset = Atividade.objects.select_related('ambiente')
+    mensagem_sem_permissao_acao = 'Você não tem permissão para deletar atividades neste ambiente.'
+
+    def verificar_permissao_acao(self, ambiente):
+        return self.verificar_permissao_deletar(ambiente)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -529,6 +611,34 @@ class AtividadeDeleteView(LoginRequiredMixin, AmbientePermissionMixin, Atividade
         atividade = self.get_object()
         return reverse_lazy('atividades_por_ambiente', kwargs={'ambiente_id': atividade.ambiente.id})
 
+class ExportarAtividadesView(LoginRequiredMixin, AmbientePermissionMixin, AtividadePermissionMixin, View):
+    """
+    Todas as atividades do ambiente em CSV, com cliente, endereços e
+    participantes alocados. A resposta é gerada enquanto as linhas são lidas
+    do banco: o download começa na hora e a memória não cresce com o número
+    de atividades. `?formato=excel` usa ';' e vírgula decimal.
+    """
+    mensagem_sem_permissao_acao = 'Você não tem permissão para exportar as atividades deste ambiente.'
+
+    def verificar_permissao_acao(self, ambiente):
+        return self.verificar_permissao_visualizar(ambiente)
+
+    def get(self, request, ambiente_id):
+        ambiente = self.get_ambiente(ambiente_id)
+        formato = request.GET.get('formato', 'csv')
+        if formato not in FORMATOS:
+            formato = 'csv'
+
+        pedacos = gerar_csv(atividades_para_exportar(ambiente.id), formato)
+        if isinstance(request, ASGIRequest):
+            pedacos = em_thread_dedicada(pedacos)
+        resposta = StreamingHttpResponse(pedacos, content_type='text/csv; charset=utf-8')
+        nome = f"atividades-{slugify(ambiente.nome) or ambiente.id}-{timezone.localdate():%Y-%m-%d}.csv"
+        resposta['Content-Disposition'] = f'attachment; filename="{nome}"'
+        resposta['Cache-Control'] = 'no-store'
+        return resposta
+
+
 @login_required
 def download_referencia(request, referencia_id: int):
     referencia = get_object_or_404(Referencia, id=referencia_id)
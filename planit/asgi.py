@@ -3,6 +3,10 @@ ASGI config for planit project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+O stream de notificações (ambiente/notificacoes/stream/) mantém a conexão
+aberta; sirva o projeto por aqui (uvicorn planit.asgi:application) para que
+cada aba ociosa custe apenas uma conexão no event loop, e não uma thread.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -14,3 +18,11 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'planit.settings')
 
 application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.DEBUG:
+    # O uvicorn não serve os arquivos estáticos (o admin) como o runserver
+    from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler  # noqa: E402
+
+    application = ASGIStaticFilesHandler(application)
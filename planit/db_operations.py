@@ -0,0 +1,36 @@
+from django.db import NotSupportedError, migrations
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    """
+    AddIndex que no PostgreSQL usa CREATE INDEX CONCURRENTLY, sem bloquear
+    escritas na tabela durante a criação. Nos outros bancos se comporta como
+    AddIndex. A migration que usa esta operação precisa de `atomic = False`.
+    """
+
+    def _usar_concurrently(self, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return False
+        if schema_editor.connection.in_atomic_block:
+            raise NotSupportedError(
+                'CREATE INDEX CONCURRENTLY não pode rodar dentro de uma transação. '
+                'Defina atomic = False na migration.'
+            )
+        return True
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if not self._usar_concurrently(schema_editor):
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, concurrently=True)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if not self._usar_concurrently(schema_editor):
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, concurrently=True)
+
+    def describe(self):
+        return super().describe() + ' (concurrently no PostgreSQL)'
@@ -0,0 +1,146 @@
+import logging
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import Http404
+
+
+logger = logging.getLogger(__name__)
+
+_AUSENTE = object()
+
+
+class MapaIdentidade:
+    """
+    Mapa de identidade com escopo de uma requisição: cada linha
+    (modelo, pk) é buscada no banco no máximo uma vez e as chamadas
+    seguintes recebem a mesma instância.
+    """
+
+    def __init__(self):
+        self._objetos = {}
+        self.consultas = Counter()
+        self.reaproveitados = Counter()
+
+    def _chave(self, model, pk):
+        if pk is None:
+            return None
+        try:
+            return model._meta.label, model._meta.pk.to_python(pk)
+        except ValidationError:
+            return None
+
+    def registrar(self, obj):
+        """Guarda `obj` e os objetos relacionados já carregados por select_related."""
+        chave = self._chave(type(obj), obj.pk)
+        if chave is None:
+            return obj
+        self._objetos[chave] = obj
+        for field in obj._meta.concrete_fields:
+            if field.is_relation and field.is_cached(obj):
+                relacionado = field.get_cached_value(obj)
+                chave_relacionado = relacionado and self._chave(type(relacionado), relacionado.pk)
+                if chave_relacionado:
+                    self._objetos.setdefault(chave_relacionado, relacionado)
+        return obj
+
+    def descartar(self, model, pk):
+        self._objetos.pop(self._chave(model, pk), None)
+
+    def obter(self, model, pk, queryset=None):
+        """
+        Retorna a instância de `model` com a chave `pk`, consultando o banco
+        apenas na primeira vez. Levanta `model.DoesNotExist` quando a linha
+        não existe (ausências também são memorizadas).
+        """
+        chave = self._chave(model, pk)
+        if chave is None:
+            raise model.DoesNotExist(f'{model._meta.object_name} com chave inválida: {pk!r}')
+
+        obj = self._objetos.get(chave, _AUSENTE)
+        if obj is _AUSENTE:
+            self.consultas[chave[0]] += 1
+            queryset = model._default_manager.all() if queryset is None else queryset
+            try:
+                obj = self.registrar(queryset.get(pk=chave[1]))
+            except model.DoesNotExist:
+                self._objetos[chave] = obj = None
+        else:
+            self.reaproveitados[chave[0]] += 1
+
+        if obj is None:
+            raise model.DoesNotExist(f'{model._meta.object_name} {pk!r} não encontrado.')
+        return obj
+
+    def obter_ou_404(self, model, pk, queryset=None):
+        try:
+            return self.obter(model, pk, queryset)
+        except model.DoesNotExist:
+            raise Http404(f'{model._meta.object_name} não encontrado.')
+
+    def relatorio(self):
+        """Consultas feitas e cargas repetidas evitadas, por modelo."""
+        modelos = sorted(set(self.consultas) | set(self.reaproveitados))
+        return {
+            'consultas': sum(self.consultas.values()),
+            'reaproveitados': sum(self.reaproveitados.values()),
+            'por_modelo': {
+                modelo: {
+                    'consultas': self.consultas[modelo],
+                    'reaproveitados': self.reaproveitados[modelo],
+                }
+                for modelo in modelos
+            },
+        }
+
+
+def mapa_da_requisicao(request):
+    """Retorna o mapa de identidade da requisição, criando-o se necessário."""
+    mapa = getattr(request, 'mapa_identidade', None)
+    if mapa is None:
+        mapa = request.mapa_identidade = MapaIdentidade()
+    return mapa
+
+
+class MapaIdentidadeMiddleware:
+    """
+    Cria um mapa de identidade por requisição. Com DEBUG ativo, o
+    relatório de cargas evitadas vai para o log e para o cabeçalho
+    X-Mapa-Identidade da resposta.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            # Sob ASGI a cadeia segue assíncrona, sem passar por uma thread
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        mapa = request.mapa_identidade = MapaIdentidade()
+        return self.relatar(request, mapa, self.get_response(request))
+
+    async def __acall__(self, request):
+        mapa = request.mapa_identidade = MapaIdentidade()
+        return self.relatar(request, mapa, await self.get_response(request))
+
+    def relatar(self, request, mapa, response):
+        if settings.DEBUG and (mapa.consultas or mapa.reaproveitados):
+            relatorio = mapa.relatorio()
+            detalhes = ', '.join(
+                f"{modelo}={dados['consultas']}/{dados['reaproveitados']}"
+                for modelo, dados in relatorio['por_modelo'].items()
+            )
+            response['X-Mapa-Identidade'] = (
+                f"consultas={relatorio['consultas']}; "
+                f"reaproveitados={relatorio['reaproveitados']}; {detalhes}"
+            )
+            logger.debug('Mapa de identidade %s %s: %s', request.method, request.path, relatorio)
+        return response
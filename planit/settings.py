@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'ambiente',
     'atividade',
@@ -50,6 +51,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'planit.identidade.MapaIdentidadeMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -66,8 +68,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
-                'ambiente.context_processors.invitations_processor',
-                'ambiente.context_processors.notificacoes_processor',
+                'ambiente.context_processors.pendencias_processor',
             ],
         },
     },
@@ -102,6 +103,45 @@ else:
     }
 
 
+# Cache (permissões resolvidas, entre outros). Em produção com mais de um
+# processo, aponte CACHE_BACKEND/CACHE_LOCATION para um cache compartilhado
+# (Redis ou Memcached) para que a invalidação valha para todos os workers e
+# para os comandos dos serviços worker e atrasos; o Docker-compose.yml usa o
+# serviço redis. O LocMemCache padrão só serve para um processo.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'planit'),
+    }
+}
+
+PERMISSOES_CACHE_TIMEOUT = int(os.environ.get('PERMISSOES_CACHE_TIMEOUT', '300'))
+PENDENCIAS_CACHE_TIMEOUT = int(os.environ.get('PENDENCIAS_CACHE_TIMEOUT', '300'))
+DASHBOARD_CACHE_TIMEOUT = int(os.environ.get('DASHBOARD_CACHE_TIMEOUT', '300'))
+CLIENTES_VERSAO_TIMEOUT = int(os.environ.get('CLIENTES_VERSAO_TIMEOUT', '60'))
+
+# Stream de notificações (SSE). No PostgreSQL os avisos passam por
+# LISTEN/NOTIFY, alcançando também os publicados pelo worker de notificações.
+# Só funciona servido por ASGI (uvicorn); sob WSGI a página não abre o stream.
+NOTIFICACOES_SSE = os.environ.get('NOTIFICACOES_SSE', 'true').lower() == 'true'
+EVENTOS_BARRAMENTO = os.environ.get(
+    'EVENTOS_BARRAMENTO',
+    'ambiente.eventos.BarramentoPostgres'
+    if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql'
+    else 'ambiente.eventos.BarramentoLocal'
+)
+EVENTOS_HEARTBEAT = int(os.environ.get('EVENTOS_HEARTBEAT', '15'))
+
+# Retenção aplicada pelo comando purgar_notificacoes (0 desativa a política)
+NOTIFICACOES_RETENCAO_LIDAS_DIAS = int(os.environ.get('NOTIFICACOES_RETENCAO_LIDAS_DIAS', '90'))
+NOTIFICACOES_MAXIMO_POR_USUARIO = int(os.environ.get('NOTIFICACOES_MAXIMO_POR_USUARIO', '1000'))
+NOTIFICACOES_RETENCAO_EVENTOS_DIAS = int(os.environ.get('NOTIFICACOES_RETENCAO_EVENTOS_DIAS', '30'))
+
+# Índice de prefixos em memória (por processo) para o autocomplete de clientes
+CLIENTES_INDICE_PREFIXOS = os.environ.get('CLIENTES_INDICE_PREFIXOS', 'false').lower() == 'true'
+CLIENTES_INDICE_RECONSTRUCAO = int(os.environ.get('CLIENTES_INDICE_RECONSTRUCAO', '300'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 